@@ -0,0 +1,15 @@
+import { readFile } from 'node:fs/promises';
+import type { Knex } from 'knex';
+
+const upUrl = new URL('./init_product_batch_idempotency.sql', import.meta.url);
+const downUrl = new URL('./down_product_batch_idempotency.sql', import.meta.url);
+
+export async function up(knex: Knex): Promise<void> {
+	const sql = await readFile(upUrl.pathname, { encoding: 'utf-8' });
+	await knex.schema.raw(sql);
+}
+
+export async function down(knex: Knex): Promise<void> {
+	const sql = await readFile(downUrl.pathname, { encoding: 'utf-8' });
+	await knex.schema.raw(sql);
+}
@@ -0,0 +1,22 @@
+import { readFile } from 'node:fs/promises';
+import type { Knex } from 'knex';
+
+const upUrl = new URL('./init_products_batch_index.sql', import.meta.url);
+const downUrl = new URL('./down_products_batch_index.sql', import.meta.url);
+
+// CREATE INDEX CONCURRENTLY cannot run in a transaction, it builds the index
+// without blocking the writes of running imports
+export const config = { transaction: false };
+
+export async function up(knex: Knex): Promise<void> {
+	const sql = await readFile(upUrl.pathname, { encoding: 'utf-8' });
+	// a query of several statements runs as one transaction, so each is sent on its own
+	for (const statement of sql.split(';').filter((statement) => statement.trim())) {
+		await knex.schema.raw(statement);
+	}
+}
+
+export async function down(knex: Knex): Promise<void> {
+	const sql = await readFile(downUrl.pathname, { encoding: 'utf-8' });
+	await knex.schema.raw(sql);
+}
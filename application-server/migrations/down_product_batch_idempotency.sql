@@ -0,0 +1,9 @@
+-- product batch idempotency indexes
+DROP INDEX IF EXISTS idx_product_batchs_content_hash;
+DROP INDEX IF EXISTS idx_product_batchs_idempotency_key;
+
+-- columns
+ALTER TABLE product_batchs DROP COLUMN IF EXISTS idempotency_key;
+ALTER TABLE product_batchs DROP COLUMN IF EXISTS content_hash;
+ALTER TABLE product_batchs DROP COLUMN IF EXISTS issues;
+ALTER TABLE product_batchs DROP COLUMN IF EXISTS imported;
@@ -0,0 +1,2 @@
+-- products batch index
+DROP INDEX CONCURRENTLY IF EXISTS idx_products_batch_id;
@@ -0,0 +1,11 @@
+-- result of the import, NULL while it is still running
+ALTER TABLE product_batchs ADD COLUMN IF NOT EXISTS imported INTEGER;
+ALTER TABLE product_batchs ADD COLUMN IF NOT EXISTS issues JSONB;
+
+-- SHA-256 of the uploaded file and the client Idempotency-Key header
+ALTER TABLE product_batchs ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE product_batchs ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_product_batchs_content_hash ON product_batchs (content_hash, strategy);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_product_batchs_idempotency_key ON product_batchs (idempotency_key);
@@ -0,0 +1,4 @@
+-- per-batch summary, export and deletion, id orders the rows of a batch
+-- an interrupted CONCURRENTLY build leaves an INVALID index behind, that IF NOT EXISTS would keep
+DROP INDEX CONCURRENTLY IF EXISTS idx_products_batch_id;
+CREATE INDEX CONCURRENTLY idx_products_batch_id ON products (batch_id, id);
@@ -78,7 +78,7 @@ export function ImportProductForm({
 			</div>
 
 			<FileInput
-				accept="text/csv"
+				accept="text/csv,.csv,.csv.gz,.csv.zst,.zip"
 				file={data.file}
 				onFile={file => handleValue('file', file)}
 				wrapper={{ className: Style.file_input }}
@@ -72,7 +72,7 @@ export function ImportProductScreen(): JSX.Element {
 						Batch id: <code>{importResult.batch.id}</code>
 					</span>
 					<span>Total imported: {importResult.imported}</span>
-					<span>Errors found: {importResult.issues.length}</span>
+					<span>Errors found: {importResult.issue_summary.total}</span>
 
 					<Link to={`/?batchid=${importResult.batch.id}`} className={Style.products_link}>
 						Go to imported products
@@ -82,7 +82,13 @@ export function ImportProductScreen(): JSX.Element {
 
 			{importResult && importResult.issues.length !== 0 ? (
 				<div className={Style.alert_container}>
-					<p className={Style.success_message}>Errors reported:</p>
+					<p className={Style.success_message}>
+						Errors reported
+						{importResult.issue_summary.truncated
+							? ` (first ${importResult.issues.length} of ${importResult.issue_summary.total})`
+							: ''}
+						:
+					</p>
 					<ul>
 						{importResult.issues.map(issue => (
 							<li>
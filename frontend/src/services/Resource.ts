@@ -79,9 +79,25 @@ export interface ProductBatchResource {
 
 export type ImportProductStrategy = 'partial' | 'atomic';
 
+export interface ImportIssueSummary {
+	readonly total: number;
+	readonly by_type: Record<string, number>;
+	readonly by_column: Record<string, number>;
+	/**
+	 * `issues` only holds the first issues found, all of them are in `issues_url`
+	 */
+	readonly truncated: boolean;
+	/**
+	 * An atomic import stopped reading the file, `total` only counts the rows read
+	 */
+	readonly aborted: boolean;
+}
+
 export interface ImportProductResource {
 	readonly batch: ProductBatchResource;
 	readonly issues: Array<ValidationIssue>;
+	readonly issue_summary: ImportIssueSummary;
+	readonly issues_url: string;
 	readonly imported: number;
 	readonly strategy: ImportProductStrategy;
 }
@@ -3,22 +3,49 @@ from flask_cors import CORS
 from werkzeug.exceptions import RequestEntityTooLarge
 from .config import Config
 from .routes.products import products_bp
+from .routes.metrics import metrics_bp
+from .routes.health import health_bp
+from .routes.uploads import uploads_bp
 from .routes.base import handle_http_error, handle_file_too_large
 from .errors.app_error import HttpBaseError
 from .extensions.database import init_db, close_db
+from .extensions.schema import check_schema
+from .extensions.jobs import init_jobs
+from .extensions.uploads import init_uploads
+from .extensions.exchange import init_exchange
+from .extensions.parsing import init_parse_pool
+from .extensions.metrics import init_metrics
+from .extensions.admission import init_admission
+from .extensions.profiling import init_profiling
+from .services.content_hash import HashingRequest
 
-def create_app():
+def create_app(config: dict | None = None):
 	app = Flask(__name__, static_folder=None)
+	app.request_class = HashingRequest
 	app.config.from_object(Config)
+	if config is not None:
+		app.config.update(config)
 
 	CORS(app)
 
 	init_db(app)
+	check_schema(app)
 	app.teardown_appcontext(close_db)
+	init_metrics(app)
+	init_admission(app)
+	init_profiling(app)
+
+	init_jobs(app)
+	init_uploads(app)
+	init_exchange(app)
+	init_parse_pool(app)
 
 	app.register_error_handler(RequestEntityTooLarge, handle_file_too_large)
 	app.register_error_handler(HttpBaseError, handle_http_error)
 	
 	app.register_blueprint(products_bp, url_prefix="/api/import")
+	app.register_blueprint(uploads_bp, url_prefix="/api/import")
+	app.register_blueprint(metrics_bp)
+	app.register_blueprint(health_bp)
 
 	return app
@@ -0,0 +1,79 @@
+from flask import Flask
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from psycopg_pool import PoolTimeout
+from quart import Quart, Response, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from . import create_app
+from .routes.products_async import products_async_bp
+from .routes.base import handle_http_error, handle_file_too_large
+from .errors.app_error import HttpBaseError
+from .errors.service import ServiceError, ServiceErrorType
+from .extensions.async_database import init_async_db
+from .extensions.metrics import register_pool_gauges
+
+IMPORT_PATH = "/api/import/product"
+
+
+def create_asgi_app(config: dict | None = None):
+	"""
+	Async serving mode: the import endpoint runs on an asyncio app with its
+	own connection pool, every other route on the Flask app of `create_app`.
+	"""
+	app = create_app(config)
+	import_app = create_import_app(app)
+	return ImportDispatcher(import_app, AsyncioWSGIMiddleware(app, max_body_size=app.config["MAX_CONTENT_LENGTH"]))
+
+
+def create_import_app(app: Flask) -> Quart:
+	import_app = Quart(__name__)
+	import_app.config["MAX_CONTENT_LENGTH"] = app.config["MAX_CONTENT_LENGTH"]
+	import_app.extensions["flask_app"] = app
+
+	init_async_db(import_app, app.config)
+	# reported by the health endpoint of the Flask app
+	app.extensions["async_db_pool"] = import_app.extensions["async_db_pool"]
+	register_pool_gauges(app.extensions["metrics"], import_app.extensions["async_db_pool"], "db_async_pool")
+
+	import_app.register_error_handler(RequestEntityTooLarge, handle_file_too_large)
+	import_app.register_error_handler(HttpBaseError, handle_http_error)
+	import_app.register_error_handler(PoolTimeout, handle_pool_timeout)
+	import_app.after_request(allow_any_origin)
+
+	import_app.register_blueprint(products_async_bp, url_prefix="/api/import")
+
+	return import_app
+
+
+async def handle_pool_timeout(error: PoolTimeout):
+	# as `get_db` reports it on the Flask app
+	current_app.logger.error("no async database connection available")
+	return handle_http_error(ServiceError(ServiceErrorType.UNAVAILABLE))
+
+
+async def allow_any_origin(response: Response) -> Response:
+	# same CORS policy as the Flask app, preflight requests are answered by it
+	if "Origin" in request.headers:
+		response.headers["Access-Control-Allow-Origin"] = "*"
+	return response
+
+
+class ImportDispatcher:
+	"""
+	ASGI app sending import requests and the lifespan events to the async
+	app, and everything else to the Flask app, run in threads by the WSGI
+	middleware.
+	"""
+	def __init__(self, import_app: Quart, wsgi_app: AsyncioWSGIMiddleware) -> None:
+		self.import_app = import_app
+		self.wsgi_app = wsgi_app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] == "lifespan" or is_import_request(scope):
+			await self.import_app(scope, receive, send)
+		else:
+			await self.wsgi_app(scope, receive, send)
+
+
+def is_import_request(scope) -> bool:
+	return scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == IMPORT_PATH
@@ -1,2 +1,48 @@
+import os
+import tempfile
+
+
+USD_EXCHANGE_RATE_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json"
+
+
 class Config:
-	MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
+	MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))  # 16 MB
+	IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))  # rows per written chunk
+	IMPORT_QUEUE_SIZE = int(os.getenv("IMPORT_QUEUE_SIZE", 4))  # parsed chunks buffered ahead of the writer
+	IMPORT_PARALLEL_THRESHOLD = int(os.getenv("IMPORT_PARALLEL_THRESHOLD", 8 * 1024 * 1024))  # uploads parsed across processes from this size
+	IMPORT_ASYNC_PARALLEL_THRESHOLD = int(os.getenv("IMPORT_ASYNC_PARALLEL_THRESHOLD", 0))  # same on the async server, whose event loop shares the GIL with a parser thread
+	IMPORT_PARALLEL_WORKERS = int(os.getenv("IMPORT_PARALLEL_WORKERS", os.cpu_count() or 1))  # parser processes, 1 disables parallel parsing
+	IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))  # background import jobs running at once
+	IMPORT_MAX_CONCURRENT = int(os.getenv("IMPORT_MAX_CONCURRENT", 6))  # import requests running at once, below DB_POOL_MAX_SIZE to leave connections for jobs
+	IMPORT_MAX_INFLIGHT_BYTES = int(os.getenv("IMPORT_MAX_INFLIGHT_BYTES", 64 * 1024 * 1024))  # 64 MB, upload bytes across the running import requests
+	IMPORT_ADMISSION_QUEUE_SIZE = int(os.getenv("IMPORT_ADMISSION_QUEUE_SIZE", 16))  # import requests waiting for admission, more are rejected with 429
+	IMPORT_ADMISSION_TIMEOUT = float(os.getenv("IMPORT_ADMISSION_TIMEOUT", 10))  # seconds a request waits for admission before failing with 503
+	IMPORT_JOB_RETENTION = int(os.getenv("IMPORT_JOB_RETENTION", 1000))  # finished jobs kept for status queries
+	IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "product-imports"))
+	IMPORT_MAX_DECOMPRESSED_SIZE = int(os.getenv("IMPORT_MAX_DECOMPRESSED_SIZE", 256 * 1024 * 1024))  # 256 MB, size of a compressed upload once decompressed
+	IMPORT_FIELD_CACHE_SIZE = int(os.getenv("IMPORT_FIELD_CACHE_SIZE", 4096))  # distinct prices and dates memoized per import and column, 0 disables
+	IMPORT_ISSUE_SAMPLES = int(os.getenv("IMPORT_ISSUE_SAMPLES", 100))  # issues returned with an import, the rest are counted and logged
+	IMPORT_ISSUE_RETENTION = float(os.getenv("IMPORT_ISSUE_RETENTION", 24 * 60 * 60))  # seconds the issue log of an import is kept
+	IMPORT_ATOMIC_MAX_ISSUES = int(os.getenv("IMPORT_ATOMIC_MAX_ISSUES", 100))  # issues after which an atomic import is rejected without reading the rest
+	IMPORT_DELETE_CHUNK_SIZE = int(os.getenv("IMPORT_DELETE_CHUNK_SIZE", 10000))  # products deleted per transaction when deleting a batch
+	IMPORT_STALE_BATCH_AGE = float(os.getenv("IMPORT_STALE_BATCH_AGE", 60 * 60))  # seconds before an unfinished batch no longer blocks a repeated upload
+	IMPORT_UPLOAD_MAX_SIZE = int(os.getenv("IMPORT_UPLOAD_MAX_SIZE", 2 * 1024 * 1024 * 1024))  # 2 GB, across all chunks of an upload session
+	IMPORT_UPLOAD_IDLE_TIMEOUT = float(os.getenv("IMPORT_UPLOAD_IDLE_TIMEOUT", 15 * 60))  # seconds an import waits for the next chunk
+	IMPORT_UPLOAD_WORKERS = int(os.getenv("IMPORT_UPLOAD_WORKERS", 4))  # chunked uploads parsed at once while their chunks arrive, apart from the import workers
+	IMPORT_UPLOAD_RETENTION = float(os.getenv("IMPORT_UPLOAD_RETENTION", 24 * 60 * 60))  # seconds an upload session is kept after its last change, unless imported
+	IMPORT_PROFILE_DIR = os.getenv("IMPORT_PROFILE_DIR")  # enables profiling imports sent with an X-Import-Profile header, profiles are saved there
+	IMPORT_PROFILE_INTERVAL = float(os.getenv("IMPORT_PROFILE_INTERVAL", 0.005))  # seconds between stack samples of a sampled import
+	DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 4))  # connections kept open, opened at startup
+	DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+	DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds a request waits for a connection before failing with 503
+	DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 60 * 60))  # seconds before a connection is replaced
+	DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", 10 * 60))  # seconds an idle connection above min size is kept
+	DB_POOL_RECONNECT_TIMEOUT = float(os.getenv("DB_POOL_RECONNECT_TIMEOUT", 5 * 60))  # seconds spent reconnecting before giving up
+	DB_POOL_OPEN_TIMEOUT = float(os.getenv("DB_POOL_OPEN_TIMEOUT", 10))  # seconds startup waits for the pool to warm up
+	DB_PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD", 5))  # executions before a query is prepared, the import statements are prepared right away
+	EXCHANGE_RATE_URL = os.getenv("EXCHANGE_RATE_URL", USD_EXCHANGE_RATE_URL)
+	EXCHANGE_RATE_TIMEOUT = float(os.getenv("EXCHANGE_RATE_TIMEOUT", 5))  # seconds
+	EXCHANGE_RATE_TTL = float(os.getenv("EXCHANGE_RATE_TTL", 15 * 60))  # seconds a rate is served without refreshing
+	EXCHANGE_RATE_MAX_STALE = float(os.getenv("EXCHANGE_RATE_MAX_STALE", 24 * 60 * 60))  # seconds a rate is served while refreshing
+	EXCHANGE_RATE_SNAPSHOT_PATH = os.getenv("EXCHANGE_RATE_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "exchange-rate-usd.json"))
+	EXCHANGE_RATE_SOURCE = None  # replaces the HTTP API, e.g. with a StaticExchangeRateSource
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional
 from ulid import ULID
 
 
@@ -12,6 +12,14 @@ class ImportStrategy(Enum):
 	ATOMIC = "atomic"
 	PARTIAL = "partial"
 
+class ImportMode(Enum):
+	SYNC = "sync"
+	ASYNC = "async"
+
+class ExportFormat(Enum):
+	CSV = "csv"
+	NDJSON = "ndjson"
+
 class CurrencyCode(Enum):
 	"""
 	Supported currency codes (ISO 4217 compliant, except BTC)
@@ -142,14 +150,24 @@ class ProductBatch:
 	created: datetime
 	strategy: ImportStrategy
 	filename: str
+	content_hash: Optional[str] = None
+	idempotency_key: Optional[str] = None
 
 	@classmethod
-	def new(cls, filename: str, strategy: ImportStrategy) -> "ProductBatch":
+	def new(
+		cls,
+		filename: str,
+		strategy: ImportStrategy,
+		content_hash: Optional[str] = None,
+		idempotency_key: Optional[str] = None,
+	) -> "ProductBatch":
 		return cls(
 			id=ULID(),
 			created=datetime.now(timezone.utc),
 			strategy=strategy,
 			filename=filename,
+			content_hash=content_hash,
+			idempotency_key=idempotency_key,
 		)
 	
 	def to_dict(self):
@@ -161,6 +179,32 @@ class ProductBatch:
 		}
 
 
+@dataclass(frozen=True)
+class ProductBatchSummary:
+	"""
+	Aggregates over the products of a batch, expirations are None for an
+	empty batch
+	"""
+	batch_id: ULID
+	products: int
+	price_totals: Dict[CurrencyCode, PreciseNumber]
+	expiration_min: Optional[datetime]
+	expiration_max: Optional[datetime]
+
+	def to_dict(self):
+		return {
+			"batch_id": str(self.batch_id),
+			"products": self.products,
+			# totals overflow the safe integers of JSON numbers
+			"price_totals": {
+				code.value: {"amount": str(total.amount), "unit": total.unit}
+				for code, total in self.price_totals.items()
+			},
+			"expiration_min": self.expiration_min.isoformat() if self.expiration_min is not None else None,
+			"expiration_max": self.expiration_max.isoformat() if self.expiration_max is not None else None,
+		}
+
+
 @dataclass(frozen=True)
 class Product:
 	id: ULID
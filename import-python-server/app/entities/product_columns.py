@@ -0,0 +1,117 @@
+from array import array
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Sequence
+from ulid import ULID
+
+from .product import Product, ProductPrice, CurrencyType, CurrencyCode, PreciseAmount
+
+ULID_SIZE = 16
+
+AmountColumn = array | List[PreciseAmount]
+
+
+class ProductColumns:
+	"""
+	Columnar batch of products: packed 16 byte ids, expiration dates as
+	ordinals and int64 price arrays, instead of nine Python objects per row.
+	A price column holding a value past int64 is kept as a list of ints.
+	"""
+	def __init__(self, batch_id: Optional[ULID], created: datetime) -> None:
+		self.batch_id = batch_id
+		self.created = created
+		self.ids = bytearray()
+		self.names: List[str] = []
+		self.expirations = array("i")
+		self.usd: AmountColumn = array("q")
+		self.eur: AmountColumn = array("q")
+		self.jpy: AmountColumn = array("q")
+		self.brl: AmountColumn = array("q")
+		self.btc: AmountColumn = array("q")
+
+	def __len__(self) -> int:
+		return len(self.names)
+
+	def __getitem__(self, index: int) -> Product:
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("product index out of range")
+
+		return Product(
+			id=ULID.from_bytes(bytes(self.ids[index * ULID_SIZE:(index + 1) * ULID_SIZE])),
+			created=self.created,
+			batch_id=self.batch_id,
+			name=self.names[index],
+			prices=ProductPrice(
+				usd=CurrencyType(code=CurrencyCode.USD, amount=self.usd[index]),
+				eur=CurrencyType(code=CurrencyCode.EUR, amount=self.eur[index]),
+				jpy=CurrencyType(code=CurrencyCode.JPY, amount=self.jpy[index]),
+				brl=CurrencyType(code=CurrencyCode.BRL, amount=self.brl[index]),
+				btc=CurrencyType(code=CurrencyCode.BTC, amount=self.btc[index]),
+			),
+			expiration=date.fromordinal(self.expirations[index]),
+		)
+
+	def __iter__(self) -> Iterator[Product]:
+		for index in range(len(self)):
+			yield self[index]
+
+	def slice(self, start: int, end: int) -> "ProductColumns":
+		columns = ProductColumns(self.batch_id, self.created)
+		columns.ids = self.ids[start * ULID_SIZE:end * ULID_SIZE]
+		columns.names = self.names[start:end]
+		columns.expirations = self.expirations[start:end]
+		columns.usd = self.usd[start:end]
+		columns.eur = self.eur[start:end]
+		columns.jpy = self.jpy[start:end]
+		columns.brl = self.brl[start:end]
+		columns.btc = self.btc[start:end]
+		return columns
+
+	def assign_ids(self, ids: bytes):
+		"""
+		Set the ids of columns built without them, by a process that does
+		not allocate the ids of the batch.
+		"""
+		if len(ids) != len(self) * ULID_SIZE:
+			raise ValueError("expected one 16 byte id per product")
+		self.ids = bytearray(ids)
+
+	def id_bytes(self, index: int) -> bytes:
+		return bytes(self.ids[index * ULID_SIZE:(index + 1) * ULID_SIZE])
+
+	def extend(
+		self,
+		ids: bytes,
+		names: Sequence[str],
+		expirations: Sequence[date],
+		usd: Sequence[PreciseAmount],
+		eur: Sequence[PreciseAmount],
+		jpy: Sequence[PreciseAmount],
+		brl: Sequence[PreciseAmount],
+		btc: Sequence[PreciseAmount],
+	):
+		if len(ids) != len(names) * ULID_SIZE:
+			raise ValueError("expected one 16 byte id per product")
+
+		self.ids += ids
+		self.names.extend(names)
+		self.expirations.extend(expiration.toordinal() for expiration in expirations)
+		self.usd = extend_amounts(self.usd, usd)
+		self.eur = extend_amounts(self.eur, eur)
+		self.jpy = extend_amounts(self.jpy, jpy)
+		self.brl = extend_amounts(self.brl, brl)
+		self.btc = extend_amounts(self.btc, btc)
+
+
+def extend_amounts(column: AmountColumn, amounts: Sequence[PreciseAmount]) -> AmountColumn:
+	if isinstance(column, array):
+		size = len(column)
+		try:
+			column.extend(amounts)
+			return column
+		except OverflowError:
+			del column[size:]
+			column = column.tolist()
+	column.extend(amounts)
+	return column
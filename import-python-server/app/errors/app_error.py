@@ -4,16 +4,19 @@ from typing import Tuple, Dict, Any
 
 HttpErrorObject = Dict[str, Any]
 
-FlaskErrorResponse = Tuple[Dict[str, Any], int]
+FlaskErrorResponse = Tuple[Dict[str, Any], int, Dict[str, str]]
 
 class HttpBaseError(Exception, ABC):
 	@abstractmethod
 	def http_error_object(self) -> HttpErrorObject:
 		...
 	
+	def http_headers(self) -> Dict[str, str]:
+		return {}
+
 	def to_flask_response(self) -> FlaskErrorResponse:
 		data = self.http_error_object()
-		return data, data["status"]
+		return data, data["status"], self.http_headers()
 
 
 class AppError(HttpBaseError):
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, asdict
+from enum import Enum
+from typing import Optional
+
+from .app_error import AppError, HttpErrorObject
+
+class ResourceErrorType(Enum):
+	NOT_FOUND = "NOT_FOUND"
+	ALREADY_EXISTS = "ALREADY_EXISTS"
+	CONFLICT = "CONFLICT"
+
+	def as_http_status(self) -> int:
+		if self == ResourceErrorType.NOT_FOUND:
+			return 404
+		elif self in (ResourceErrorType.ALREADY_EXISTS, ResourceErrorType.CONFLICT):
+			return 409
+		return 400
+
+
+@dataclass(frozen=True)
+class ResourceLocation:
+	resource: str
+	key: str
+	path: Optional[str]
+
+
+class ResourceError(AppError):
+	error: ResourceErrorType
+
+	def __init__(
+		self,
+		type: ResourceErrorType,
+		location: ResourceLocation,
+	) -> None:
+		super().__init__("Resource error")
+		self.error = type
+		self.location = location
+
+	def http_error_object(self) -> HttpErrorObject:
+		return {
+			"status": self.error.as_http_status(),
+			"error": self.error.value,
+			"message": str(self),
+			"location": asdict(self.location),
+		}
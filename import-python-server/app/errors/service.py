@@ -1,15 +1,20 @@
+import math
 from enum import Enum
+from typing import Dict
 
 from .app_error import AppError, HttpErrorObject
 
 class ServiceErrorType(Enum):
 	UNAVAILABLE = "UNAVAILABLE"
+	TOO_MANY_REQUESTS = "TOO_MANY_REQUESTS"
 	NOT_IMPLEMENTED = "NOT_IMPLEMENTED"
 	INTERNAL_ERROR = "INTERNAL_ERROR"
 
 	def as_http_status(self) -> int:
 		if self == ServiceErrorType.UNAVAILABLE:
 			return 503
+		elif self == ServiceErrorType.TOO_MANY_REQUESTS:
+			return 429
 		elif self == ServiceErrorType.NOT_IMPLEMENTED:
 			return 501
 		return 500
@@ -21,9 +26,17 @@ class ServiceError(AppError):
 	def __init__(
 		self,
 		type: ServiceErrorType = ServiceErrorType.INTERNAL_ERROR,
+		retry_after: float | None = None,
 	) -> None:
 		super().__init__("Service error")
 		self.error = type
+		# seconds after which the client may try again
+		self.retry_after = retry_after
+
+	def http_headers(self) -> Dict[str, str]:
+		if self.retry_after is None:
+			return {}
+		return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
 
 	def http_error_object(self) -> HttpErrorObject:
 		return {
@@ -0,0 +1,19 @@
+from flask import current_app, Flask
+
+from ..services.admission import AdmissionController
+from .metrics import register_admission_gauges
+
+
+def init_admission(app: Flask):
+	admission = AdmissionController(
+		max_imports=app.config["IMPORT_MAX_CONCURRENT"],
+		max_bytes=app.config["IMPORT_MAX_INFLIGHT_BYTES"],
+		max_queued=app.config["IMPORT_ADMISSION_QUEUE_SIZE"],
+		queue_timeout=app.config["IMPORT_ADMISSION_TIMEOUT"],
+		metrics=app.extensions["import_metrics"],
+	)
+	app.extensions["import_admission"] = admission
+	register_admission_gauges(app.extensions["metrics"], admission)
+
+def get_admission() -> AdmissionController:
+	return current_app.extensions["import_admission"]
@@ -0,0 +1,28 @@
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from quart import current_app, Quart
+
+from .database import connection_pool_options
+
+
+def make_async_connection_pool(config) -> AsyncConnectionPool:
+	# opened by the server once its event loop runs
+	return AsyncConnectionPool(name="db_async", **connection_pool_options(config))
+
+def init_async_db(app: Quart, config):
+	pool = make_async_connection_pool(config)
+	app.extensions["async_db_pool"] = pool
+
+	@app.before_serving
+	async def open_pool():
+		await pool.open(wait=False)
+		try:
+			await pool.wait(timeout=config["DB_POOL_OPEN_TIMEOUT"])
+		except PoolTimeout:
+			app.logger.warning(f"async database pool not ready after {config['DB_POOL_OPEN_TIMEOUT']} seconds, connecting in background")
+
+	@app.after_serving
+	async def close_pool():
+		await pool.close()
+
+def get_async_pool() -> AsyncConnectionPool:
+	return current_app.extensions["async_db_pool"]
@@ -1,14 +1,40 @@
 import os
+from typing import Mapping
 from psycopg import Connection
-from psycopg_pool import ConnectionPool
+from psycopg_pool import ConnectionPool, PoolTimeout
 from flask import g, current_app, Flask
 
+from ..errors.service import ServiceError, ServiceErrorType
 
-def make_connection_pool() -> ConnectionPool:
-	return ConnectionPool(conninfo=os.environ["DATABASE_URL"], min_size=1, max_size=10)
+
+def connection_pool_options(config: Mapping) -> dict:
+	"""
+	Pool settings shared by the sync and async pools.
+	"""
+	return {
+		"conninfo": os.environ["DATABASE_URL"],
+		"min_size": config["DB_POOL_MIN_SIZE"],
+		"max_size": config["DB_POOL_MAX_SIZE"],
+		"timeout": config["DB_POOL_TIMEOUT"],
+		"max_lifetime": config["DB_POOL_MAX_LIFETIME"],
+		"max_idle": config["DB_POOL_MAX_IDLE"],
+		"reconnect_timeout": config["DB_POOL_RECONNECT_TIMEOUT"],
+		"kwargs": {"prepare_threshold": config["DB_PREPARE_THRESHOLD"]},
+		"open": False,
+	}
+
+def make_connection_pool(config: Mapping) -> ConnectionPool:
+	return ConnectionPool(name="db", **connection_pool_options(config))
 
 def init_db(app: Flask):
-	app.extensions["db_pool"] = make_connection_pool()
+	pool = make_connection_pool(app.config)
+	app.extensions["db_pool"] = pool
+	# warm up, so a burst of imports does not queue behind connection setup
+	pool.open(wait=False)
+	try:
+		pool.wait(timeout=app.config["DB_POOL_OPEN_TIMEOUT"])
+	except PoolTimeout:
+		app.logger.warning(f"database pool not ready after {app.config['DB_POOL_OPEN_TIMEOUT']} seconds, connecting in background")
 
 def get_pool() -> ConnectionPool:
 	return current_app.extensions["db_pool"]
@@ -16,7 +42,11 @@ def get_pool() -> ConnectionPool:
 def get_db() -> Connection:
 	if "db" not in g:
 		pool = get_pool()
-		g.db = pool.getconn()
+		try:
+			g.db = pool.getconn()
+		except PoolTimeout:
+			current_app.logger.error("no database connection available")
+			raise ServiceError(ServiceErrorType.UNAVAILABLE)
 	return g.db
 
 def close_db(exception: Exception | None) -> None:
@@ -0,0 +1,28 @@
+from flask import current_app, Flask
+
+from ..services.exchange import ExchangeRateCache, HttpExchangeRateSource
+
+
+def init_exchange(app: Flask):
+	source = app.config["EXCHANGE_RATE_SOURCE"]
+	if source is None:
+		source = HttpExchangeRateSource(
+			app.config["EXCHANGE_RATE_URL"],
+			app.config["EXCHANGE_RATE_TIMEOUT"],
+			app.logger,
+		)
+
+	cache = ExchangeRateCache(
+		source,
+		ttl=app.config["EXCHANGE_RATE_TTL"],
+		max_stale=app.config["EXCHANGE_RATE_MAX_STALE"],
+		snapshot_path=app.config["EXCHANGE_RATE_SNAPSHOT_PATH"],
+		logger=app.logger,
+	)
+	# warm up, so the first import does not wait on the network
+	cache.refresh_in_background()
+
+	app.extensions["exchange_rates"] = cache
+
+def get_exchange_rate_cache() -> ExchangeRateCache:
+	return current_app.extensions["exchange_rates"]
@@ -0,0 +1,16 @@
+import os
+from flask import current_app, Flask
+
+from ..services.import_jobs import ImportJobRegistry
+
+
+def init_jobs(app: Flask):
+	os.makedirs(app.config["IMPORT_SPOOL_DIR"], exist_ok=True)
+	app.extensions["import_jobs"] = ImportJobRegistry(
+		max_workers=app.config["IMPORT_WORKERS"],
+		retention=app.config["IMPORT_JOB_RETENTION"],
+		max_upload_workers=app.config["IMPORT_UPLOAD_WORKERS"],
+	)
+
+def get_job_registry() -> ImportJobRegistry:
+	return current_app.extensions["import_jobs"]
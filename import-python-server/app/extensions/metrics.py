@@ -0,0 +1,60 @@
+from flask import current_app, Flask
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+from ..services.admission import AdmissionController
+from ..services.metrics import CounterFunction, GaugeFunction, ImportMetrics, MetricsRegistry
+
+POOL_GAUGES = (
+	("size", "Connections currently open in the pool.", "pool_size"),
+	("available", "Idle connections ready to be handed out.", "pool_available"),
+	("max", "Maximum number of connections of the pool.", "pool_max"),
+	("requests_waiting", "Requests waiting for a connection.", "requests_waiting"),
+)
+
+# totals since the pool was opened, psycopg only resets them on pop_stats
+POOL_COUNTERS = (
+	("requests_total", "Connections requested from the pool.", "requests_num"),
+	("requests_wait_ms_total", "Time requests waited for a connection, in milliseconds.", "requests_wait_ms"),
+	("requests_errors_total", "Connection requests that timed out or failed.", "requests_errors"),
+	("connections_errors_total", "Failed attempts to open a connection.", "connections_errors"),
+	("connections_lost_total", "Connections found broken when returned or checked.", "connections_lost"),
+)
+
+ADMISSION_GAUGES = (
+	("active", "Imports admitted and still running.", "active"),
+	("bytes", "Upload bytes held by the running imports.", "bytes"),
+	("queued", "Import requests waiting for admission.", "queued"),
+)
+
+
+def init_metrics(app: Flask):
+	registry = MetricsRegistry()
+	app.extensions["metrics"] = registry
+	app.extensions["import_metrics"] = ImportMetrics(registry)
+	register_pool_gauges(registry, app.extensions["db_pool"])
+
+def register_pool_gauges(registry: MetricsRegistry, pool: ConnectionPool | AsyncConnectionPool, prefix: str = "db_pool"):
+	for name, help, key in POOL_GAUGES:
+		registry.register(GaugeFunction(f"{prefix}_{name}", help, (), make_pool_stat_reader(pool, key)))
+	for name, help, key in POOL_COUNTERS:
+		registry.register(CounterFunction(f"{prefix}_{name}", help, (), make_pool_stat_reader(pool, key)))
+
+def register_admission_gauges(registry: MetricsRegistry, admission: AdmissionController):
+	for name, help, attribute in ADMISSION_GAUGES:
+		registry.register(GaugeFunction(f"product_import_admission_{name}", help, (), make_attribute_reader(admission, attribute)))
+
+def make_attribute_reader(target: object, attribute: str):
+	def collect():
+		return [((), getattr(target, attribute))]
+	return collect
+
+def make_pool_stat_reader(pool: ConnectionPool | AsyncConnectionPool, key: str):
+	def collect():
+		return [((), pool.get_stats().get(key, 0))]
+	return collect
+
+def get_metrics_registry() -> MetricsRegistry:
+	return current_app.extensions["metrics"]
+
+def get_import_metrics() -> ImportMetrics:
+	return current_app.extensions["import_metrics"]
@@ -0,0 +1,15 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, Flask
+
+
+def init_parse_pool(app: Flask):
+	workers = app.config["IMPORT_PARALLEL_WORKERS"]
+	pool = None
+	if workers > 1:
+		# spawn, forking would copy the server threads and the connection pool
+		pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+	app.extensions["parse_pool"] = pool
+
+def get_parse_pool() -> ProcessPoolExecutor | None:
+	return current_app.extensions["parse_pool"]
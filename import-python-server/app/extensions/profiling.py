@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from typing import Iterator
+from flask import current_app, g, request, Flask, Response
+
+from ..services.profiling import ProfileMode, RequestProfiler
+from ..services.type_parser import parse_profile_mode
+from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
+
+PROFILE_HEADER = "X-Import-Profile"
+
+
+def init_profiling(app: Flask):
+	directory = app.config["IMPORT_PROFILE_DIR"]
+	if directory is None:
+		return
+
+	app.extensions["import_profiler"] = RequestProfiler(directory, app.config["IMPORT_PROFILE_INTERVAL"])
+	# after the error handlers too, a failing import is the one worth profiling
+	app.after_request(add_profile_headers)
+
+@contextmanager
+def profile_request() -> Iterator[None]:
+	"""
+	Profile the request when profiling is configured and the client asked
+	for it with the X-Import-Profile header.
+	"""
+	profiler: RequestProfiler | None = current_app.extensions.get("import_profiler")
+	value = request.headers.get(PROFILE_HEADER)
+	if profiler is None or value is None:
+		yield
+		return
+
+	mode = parse_profile_mode(value)
+	if mode is None:
+		raise ValidationError(RequestSegment.HEADERS, [
+			ValidationIssue(
+				message=f"Expected {PROFILE_HEADER} must be either 'cprofile' or 'sample'",
+				path="$.headers.x-import-profile",
+				type="invalid_format"
+			)
+		])
+
+	with profiler.profile(mode) as profile:
+		if profile is None:
+			current_app.logger.info("another request is being profiled, running unprofiled")
+		g.import_profile = profile
+		yield
+
+def profiling_calls() -> bool:
+	"""
+	Whether the request is profiled by cProfile, which only sees the calls
+	of the request thread.
+	"""
+	profile = g.get("import_profile")
+	return profile is not None and profile.mode == ProfileMode.CPROFILE
+
+def add_profile_headers(response: Response) -> Response:
+	profile = g.pop("import_profile", None)
+	if profile is not None and profile.path is not None:
+		current_app.logger.info(f"import profile {profile.id} saved to {profile.path}")
+		response.headers.update(profile.http_headers())
+	return response
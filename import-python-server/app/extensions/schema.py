@@ -0,0 +1,21 @@
+from flask import Flask
+from psycopg import Error as DatabaseError
+from psycopg_pool import PoolTimeout
+
+from ..services.product_batches import has_batch_index
+
+
+def check_schema(app: Flask):
+	"""
+	Warn when products.batch_id is not indexed, every batch summary, export
+	and deletion would then scan the whole products table.
+	"""
+	try:
+		with app.extensions["db_pool"].connection(timeout=app.config["DB_POOL_OPEN_TIMEOUT"]) as db:
+			indexed = has_batch_index(db)
+	except (PoolTimeout, DatabaseError):
+		app.logger.warning("could not check the products batch_id index")
+		return
+
+	if not indexed:
+		app.logger.warning("products.batch_id is not indexed, run the products_batch_index migration")
@@ -0,0 +1,14 @@
+import os
+from flask import current_app, Flask
+
+from ..services.upload_sessions import UploadSessionStore
+
+
+def init_uploads(app: Flask):
+	app.extensions["upload_sessions"] = UploadSessionStore(
+		root=os.path.join(app.config["IMPORT_SPOOL_DIR"], "uploads"),
+		max_size=app.config["IMPORT_UPLOAD_MAX_SIZE"],
+	)
+
+def get_upload_store() -> UploadSessionStore:
+	return current_app.extensions["upload_sessions"]
@@ -1,14 +1,14 @@
-from flask import jsonify
-
 from ..errors.app_error import HttpBaseError
 
+# handlers return the payload as a dict, so both the Flask app and the
+# async import app serialize it with their own JSON provider
+
 def handle_http_error(error: HttpBaseError):
-	payload, status = error.to_flask_response()
-	return jsonify(payload), status
+	return error.to_flask_response()
 
 def handle_file_too_large(error):
-	return jsonify({
+	return {
 		"status": 413,
 		"error": "PAYLOAD_TOO_LARGE",
 		"message": "Uploaded file is too large",
-	}), 413
+	}, 413
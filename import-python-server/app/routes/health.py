@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify, current_app, Response
+from psycopg import Error as DatabaseError
+from psycopg_pool import ConnectionPool, AsyncConnectionPool, PoolTimeout
+
+from ..extensions.database import get_pool
+
+health_bp = Blueprint("health", __name__)
+
+# seconds the health check waits for a connection
+HEALTH_CHECK_TIMEOUT = 2.0
+
+@health_bp.route("/health", methods=["GET"])
+def get_health() -> Response:
+	"""
+	Database reachability and connection pool statistics, 503 when no
+	connection could be used.
+	"""
+	pool = get_pool()
+	database_ok = check_database(pool)
+	pools = {"db": pool_stats(pool)}
+	async_pool = current_app.extensions.get("async_db_pool")
+	if async_pool is not None:
+		pools["db_async"] = pool_stats(async_pool)
+
+	return jsonify({
+		"status": "ok" if database_ok else "unavailable",
+		"database": database_ok,
+		"pools": pools,
+	}), 200 if database_ok else 503
+
+
+def check_database(pool: ConnectionPool) -> bool:
+	try:
+		with pool.connection(timeout=HEALTH_CHECK_TIMEOUT) as db:
+			db.execute("SELECT 1")
+		return True
+	except (PoolTimeout, DatabaseError):
+		current_app.logger.exception("database health check failed")
+		return False
+
+
+def pool_stats(pool: ConnectionPool | AsyncConnectionPool):
+	stats = pool.get_stats()
+	requests = stats.get("requests_num", 0)
+	wait_ms = stats.get("requests_wait_ms", 0)
+	return {
+		"size": stats.get("pool_size", 0),
+		"available": stats.get("pool_available", 0),
+		"min": stats.get("pool_min", 0),
+		"max": stats.get("pool_max", 0),
+		"requests_waiting": stats.get("requests_waiting", 0),
+		"checkouts": requests,
+		"wait_ms": wait_ms,
+		"average_wait_ms": wait_ms / requests if requests else 0,
+		"request_errors": stats.get("requests_errors", 0),
+		"connection_errors": stats.get("connections_errors", 0),
+		"connections_lost": stats.get("connections_lost", 0),
+	}
@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+
+from ..extensions.metrics import get_metrics_registry
+from ..services.metrics import PROMETHEUS_CONTENT_TYPE
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics() -> Response:
+	return Response(get_metrics_registry().render(), status=200, content_type=PROMETHEUS_CONTENT_TYPE)
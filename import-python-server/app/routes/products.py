@@ -1,18 +1,98 @@
-from flask import Blueprint, jsonify, request, current_app, Response
+import os
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, replace
+from typing import Iterator, Mapping
+from flask import Blueprint, Flask, jsonify, request, current_app, Response, stream_with_context
+from ulid import ULID
+from werkzeug.datastructures import FileStorage
 
-from ..entities.product import ImportStrategy
-from ..services.type_parser import parse_strategy
-from ..services.import_products import parse_products_csv_file, save_products_batch
-from ..services.exchange import get_currency_exchange_rate
+from ..entities.product import ExportFormat, ImportMode, ImportStrategy, ProductBatch
+from ..services.type_parser import parse_strategy, parse_import_mode, parse_flag, parse_export_format
+from ..services.import_products import DryRunResult, ImportOptions, ImportResult, dry_run_products_csv_file, import_products_csv_file
+from ..services.product_batches import (
+	delete_product_batch_chunked,
+	find_batch_job,
+	find_imported_batch,
+	iter_batch_products,
+	product_batch_exists,
+	product_batch_not_found,
+	summarize_product_batch,
+)
+from ..services.content_hash import get_content_hash
+from ..services.compression import Compression, decompressed_upload, upload_compression
+from ..services.issue_report import ImportRejectedError, issue_log_path, iter_issue_log
+from ..extensions.database import get_db
+from ..services.import_jobs import ImportJob, make_import_job_runner
+from ..extensions.jobs import get_job_registry
+from ..extensions.exchange import get_exchange_rate_cache
+from ..extensions.admission import get_admission
+from ..extensions.profiling import profile_request, profiling_calls
+from ..services.exchange import DeferredExchangeRate
 from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
-from ..errors.service import ServiceError, ServiceErrorType
+from ..errors.resource import ResourceError, ResourceErrorType, ResourceLocation
 
 products_bp = Blueprint("products", __name__)
 
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+@dataclass(frozen=True)
+class ImportRequest:
+	strategy: ImportStrategy
+	mode: ImportMode
+	file: FileStorage
+	compression: Compression
+	idempotency_key: str | None
+	# validate the upload without importing it, always synchronous
+	dry_run: bool = False
+
+
 @products_bp.route("/product", methods=["POST"])
 def import_products() -> Response:
-	strategystr = request.form.get("strategy")
-	strategy = parse_strategy(strategystr)
+	# admitted before the upload is read, a shed request costs neither parsing nor a connection
+	with get_admission().admit(request.content_length or 0), profile_request():
+		return run_import_request()
+
+
+def run_import_request() -> Response:
+	upload = parse_import_request(request.form, request.files, request.headers)
+	max_size = current_app.config["IMPORT_MAX_DECOMPRESSED_SIZE"]
+
+	if upload.dry_run:
+		file = decompressed_upload(upload.file, upload.compression, max_size)
+		result = dry_run_products_csv_file(file, upload.strategy, ImportOptions.from_config(current_app.config))
+		return jsonify(dry_run_payload(result)), 200
+
+	content_hash = get_content_hash(upload.file)
+	previous = find_imported_batch(
+		get_db(), content_hash, upload.strategy, upload.idempotency_key, current_app.config["IMPORT_STALE_BATCH_AGE"],
+	)
+	if previous is not None:
+		return jsonify(import_result_payload(previous, request.script_root)), 201, {"Idempotent-Replayed": "true"}
+
+	# fetched once the first rows are valid, a rejected upload never waits on the rate API
+	exchange = DeferredExchangeRate(get_exchange_rate_cache())
+	batch = ProductBatch.new(upload.file.filename, upload.strategy, content_hash, upload.idempotency_key)
+	file = decompressed_upload(upload.file, upload.compression, max_size)
+
+	if upload.mode == ImportMode.ASYNC:
+		job = enqueue_import_job(current_app._get_current_object(), batch, file, exchange)
+		return jsonify(import_job_payload(job)), 202, {"Location": batch_location(request.script_root, batch)}
+
+	options = ImportOptions.from_config(current_app.config)
+	if profiling_calls():
+		options = replace(options, inline_parse=True)
+	with locate_rejected_issues(request.script_root, batch):
+		result = import_products_csv_file(batch, file, exchange, options)
+
+	return jsonify(import_result_payload(result, request.script_root)), 201
+
+
+def parse_import_request(form: Mapping[str, str], files: Mapping[str, FileStorage], headers: Mapping[str, str]) -> ImportRequest:
+	"""
+	Validate the fields of an import request, shared by the sync and async servers.
+	"""
+	strategy = parse_strategy(form.get("strategy"))
 	if strategy is None:
 		raise ValidationError(RequestSegment.MULTIPART_FIELD, [
 			ValidationIssue(
@@ -21,8 +101,18 @@ def import_products() -> Response:
 				type="not_found"
 			)
 		])
+
+	mode = parse_import_mode(form.get("mode"))
+	if mode is None:
+		raise ValidationError(RequestSegment.MULTIPART_FIELD, [
+			ValidationIssue(
+				message="Expected mode must be either 'sync' or 'async'",
+				path="$.mode",
+				type="invalid_format"
+			)
+		])
 	
-	file = request.files.get("file")
+	file = files.get("file")
 
 	if not file or file.filename == "":
 		raise ValidationError(RequestSegment.MULTIPART_FILE, [
@@ -33,29 +123,202 @@ def import_products() -> Response:
 			)
 		])
 
-	if not file.filename.lower().endswith(".csv"):
+	compression = upload_compression(file.filename, file.headers.get("Content-Encoding"))
+	if compression is None:
 		raise ValidationError(RequestSegment.MULTIPART_FILE, [
 			ValidationIssue(
-				message="Expected file must be a CSV",
+				message="Expected file must be a CSV, either plain, gzip (.csv.gz), zstd (.csv.zst) or zipped (.zip)",
 				path="$.file",
 				type="invalid_format"
 			)
 		])
 	
-	exchange = get_currency_exchange_rate()
-	if exchange is None:
-		current_app.logger.error("get exchange rate service unavailable")
-		raise ServiceError(ServiceErrorType.UNAVAILABLE)
-	
-	batch, products, issues = parse_products_csv_file(file, exchange, strategy)
-	if strategy == ImportStrategy.ATOMIC and len(issues) != 0:
-		raise ValidationError(RequestSegment.MULTIPART_FILE, issues)
-	
-	save_products_batch(batch, products)
-
-	return jsonify({
-		"batch": batch.to_dict(),
-		"issues": issues,
-		"imported": len(products),
-		"strategy": batch.strategy.value
-	}), 201
+	dry_run = parse_flag(form.get("dry_run"))
+	if dry_run is None:
+		raise ValidationError(RequestSegment.MULTIPART_FIELD, [
+			ValidationIssue(
+				message="Expected dry_run must be either 'true' or 'false'",
+				path="$.dry_run",
+				type="invalid_format"
+			)
+		])
+
+	idempotency_key = headers.get("Idempotency-Key")
+	if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+		raise ValidationError(RequestSegment.HEADERS, [
+			ValidationIssue(
+				message=f"Expected Idempotency-Key to have 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters",
+				path="$.headers.idempotency-key",
+				type="invalid_format"
+			)
+		])
+
+	return ImportRequest(
+		strategy=strategy,
+		mode=mode,
+		file=file,
+		compression=compression,
+		idempotency_key=idempotency_key,
+		dry_run=dry_run,
+	)
+
+
+def import_result_payload(result: ImportResult, script_root: str):
+	return {
+		"batch": result.batch.to_dict(),
+		"issues": result.issues.samples,
+		"issue_summary": result.issues.summary_dict(),
+		"issues_url": f"{batch_location(script_root, result.batch)}/issues",
+		"imported": result.imported,
+		"strategy": result.batch.strategy.value
+	}
+
+
+def dry_run_payload(result: DryRunResult):
+	return {
+		"dry_run": True,
+		"issues": result.issues.samples,
+		"issue_summary": result.issues.summary_dict(),
+		"valid_rows": result.valid_rows,
+		"strategy": result.strategy.value
+	}
+
+
+def import_job_payload(job: ImportJob):
+	return {
+		"batch": job.batch.to_dict(),
+		"state": job.state.value,
+		"strategy": job.batch.strategy.value
+	}
+
+
+def batch_location(script_root: str, batch: ProductBatch) -> str:
+	return f"{script_root}/api/import/batch/{batch.id}"
+
+
+@contextmanager
+def locate_rejected_issues(script_root: str, batch: ProductBatch) -> Iterator[None]:
+	"""
+	Point the response of a rejected import to its full issue log.
+	"""
+	try:
+		yield
+	except ImportRejectedError as err:
+		if err.logged:
+			err.issues_url = f"{batch_location(script_root, batch)}/issues"
+		raise
+
+
+def enqueue_import_job(app: Flask, batch: ProductBatch, file: FileStorage, exchange: DeferredExchangeRate) -> ImportJob:
+	upload_path = os.path.join(app.config["IMPORT_SPOOL_DIR"], f"{batch.id}.csv")
+	try:
+		# compressed uploads are spooled decompressed
+		file.save(upload_path)
+	except Exception:
+		with suppress(FileNotFoundError):
+			os.remove(upload_path)
+		raise
+
+	job = ImportJob(batch)
+	run = make_import_job_runner(app, upload_path, file.filename, exchange)
+	get_job_registry().submit(job, run)
+	return job
+
+
+@products_bp.route("/batch/<batch_id>", methods=["GET"])
+def get_import_batch_status(batch_id: str) -> Response:
+	job = get_job_registry().get(batch_id)
+	if job is None:
+		check_batch_id(batch_id)
+		job = find_batch_job(get_db(), batch_id)
+	if job is None:
+		raise product_batch_not_found(batch_id)
+
+	return jsonify(job.to_dict()), 200
+
+
+@products_bp.route("/batch/<batch_id>/issues", methods=["GET"])
+def get_import_batch_issues(batch_id: str) -> Response:
+	"""
+	Every issue of an import as NDJSON, streamed from its issue log.
+	"""
+	not_found = ResourceError(ResourceErrorType.NOT_FOUND, ResourceLocation(
+		resource="product_batch_issues",
+		key=batch_id,
+		path="$.params.batch_id",
+	))
+	# only ids that parse as ULIDs ever reach the spool directory
+	try:
+		ULID.from_str(batch_id)
+	except ValueError:
+		raise not_found
+
+	path = issue_log_path(os.path.join(current_app.config["IMPORT_SPOOL_DIR"], "issues"), batch_id)
+	if not os.path.isfile(path):
+		raise not_found
+
+	return Response(iter_issue_log(path), mimetype="application/x-ndjson")
+
+
+EXPORT_MIMETYPES = {
+	ExportFormat.CSV: "text/csv",
+	ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+@products_bp.route("/batch/<batch_id>/products", methods=["GET"])
+def export_import_batch_products(batch_id: str) -> Response:
+	"""
+	Every product of an import as CSV or NDJSON, streamed from the database.
+	"""
+	format = parse_export_format(request.args.get("format"))
+	if format is None:
+		raise ValidationError(RequestSegment.QUERY, [
+			ValidationIssue(
+				message="Expected format must be either 'csv' or 'ndjson'",
+				path="$.query.format",
+				type="invalid_format"
+			)
+		])
+
+	check_batch_id(batch_id)
+	db = get_db()
+	if not product_batch_exists(db, batch_id):
+		raise product_batch_not_found(batch_id)
+
+	return Response(
+		stream_with_context(iter_batch_products(db, batch_id, format)),
+		mimetype=EXPORT_MIMETYPES[format],
+		headers={"Content-Disposition": f"attachment; filename={batch_id}.{format.value}"},
+	)
+
+
+@products_bp.route("/batch/<batch_id>/summary", methods=["GET"])
+def get_import_batch_summary(batch_id: str) -> Response:
+	"""
+	Product count, price totals per currency and expiration range of an import.
+	"""
+	check_batch_id(batch_id)
+	summary = summarize_product_batch(get_db(), batch_id)
+	return jsonify(summary.to_dict()), 200
+
+
+@products_bp.route("/batch/<batch_id>", methods=["DELETE"])
+def delete_import_batch(batch_id: str) -> Response:
+	"""
+	Roll back an import, deleting its products in chunks.
+	"""
+	check_batch_id(batch_id)
+	deleted = delete_product_batch_chunked(
+		get_db(),
+		batch_id,
+		current_app.config["IMPORT_DELETE_CHUNK_SIZE"],
+		current_app.config["IMPORT_STALE_BATCH_AGE"],
+	)
+	return jsonify({"batch_id": batch_id, "deleted": deleted}), 200
+
+
+def check_batch_id(batch_id: str):
+	try:
+		ULID.from_str(batch_id)
+	except ValueError:
+		raise product_batch_not_found(batch_id)
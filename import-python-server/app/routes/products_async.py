@@ -0,0 +1,85 @@
+import asyncio
+from dataclasses import replace
+from flask import Flask
+from quart import Blueprint, current_app, request, Response
+from werkzeug.datastructures import FileStorage
+
+from .products import (
+	batch_location,
+	dry_run_payload,
+	enqueue_import_job,
+	import_job_payload,
+	import_result_payload,
+	locate_rejected_issues,
+	parse_import_request,
+)
+from ..entities.product import ImportMode, ProductBatch
+from ..services.import_products import ImportOptions, dry_run_products_csv_file
+from ..services.import_products_async import import_products_csv_file_async
+from ..services.product_batches import find_imported_batch_async
+from ..services.content_hash import get_content_hash
+from ..services.compression import decompressed_upload
+from ..services.exchange import DeferredExchangeRate
+from ..services.admission import AdmissionController
+from ..extensions.async_database import get_async_pool
+from ..extensions.exchange import get_exchange_rate_cache
+from ..extensions.metrics import get_import_metrics
+from ..extensions.parsing import get_parse_pool
+
+products_async_bp = Blueprint("products_async", __name__)
+
+@products_async_bp.route("/product", methods=["POST"])
+async def import_products_async() -> Response:
+	"""
+	Same contract as `import_products`. Waiting on the upload and the
+	database yields the event loop to other imports, hashing, parsing and
+	the exchange rate fetch run in threads.
+	"""
+	# the Flask app owns the shared services: admission, metrics, exchange rates, jobs and the parse pool
+	app: Flask = current_app.extensions["flask_app"]
+	admission: AdmissionController = app.extensions["import_admission"]
+	async with admission.admit_async(request.content_length or 0):
+		return await run_import_request_async(app)
+
+
+async def run_import_request_async(app: Flask) -> Response:
+	form = await request.form
+	files = await request.files
+	upload = parse_import_request(form, files, request.headers)
+	# werkzeug's FileStorage, whose blocking `save` is only called from threads
+	file = FileStorage(stream=upload.file.stream, filename=upload.file.filename, content_type=upload.file.content_type)
+	pool = get_async_pool()
+	max_size = app.config["IMPORT_MAX_DECOMPRESSED_SIZE"]
+
+	with app.app_context():
+		if upload.dry_run:
+			file = decompressed_upload(file, upload.compression, max_size)
+			result = await asyncio.to_thread(dry_run_products_csv_file, file, upload.strategy, ImportOptions.from_config(app.config))
+			return dry_run_payload(result), 200
+
+		content_hash = await asyncio.to_thread(get_content_hash, file)
+		async with pool.connection() as db:
+			previous = await find_imported_batch_async(
+				db, content_hash, upload.strategy, upload.idempotency_key, app.config["IMPORT_STALE_BATCH_AGE"],
+			)
+		if previous is not None:
+			return import_result_payload(previous, request.script_root), 201, {"Idempotent-Replayed": "true"}
+
+		# resolved by the parser thread once the first rows are valid
+		exchange = DeferredExchangeRate(get_exchange_rate_cache())
+		batch = ProductBatch.new(file.filename, upload.strategy, content_hash, upload.idempotency_key)
+		file = decompressed_upload(file, upload.compression, max_size)
+
+		if upload.mode == ImportMode.ASYNC:
+			job = await asyncio.to_thread(enqueue_import_job, app, batch, file, exchange)
+			return import_job_payload(job), 202, {"Location": batch_location(request.script_root, batch)}
+
+		# a parser thread would hold the GIL the event loop needs, the pool parses in other processes
+		options = replace(ImportOptions.from_config(app.config), parallel_threshold=app.config["IMPORT_ASYNC_PARALLEL_THRESHOLD"])
+		async with pool.connection() as db:
+			with locate_rejected_issues(request.script_root, batch):
+				result = await import_products_csv_file_async(
+					db, batch, file, exchange, options, get_parse_pool(), get_import_metrics(),
+				)
+
+	return import_result_payload(result, request.script_root), 201
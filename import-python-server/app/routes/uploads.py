@@ -0,0 +1,199 @@
+from flask import Blueprint, jsonify, request, current_app, Response
+from ulid import ULID
+
+from ..services.type_parser import parse_strategy
+from ..services.import_jobs import ImportJob, ImportJobState, make_stream_import_job_runner
+from ..services.upload_sessions import UploadSession, upload_session_not_found
+from ..services.exchange import DeferredExchangeRate
+from ..extensions.jobs import get_job_registry
+from ..extensions.exchange import get_exchange_rate_cache
+from ..extensions.metrics import get_import_metrics
+from ..extensions.uploads import get_upload_store
+from ..errors.app_error import HttpErrorObject
+from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
+
+uploads_bp = Blueprint("uploads", __name__)
+
+@uploads_bp.route("/upload", methods=["POST"])
+def create_upload() -> Response:
+	"""
+	Start a chunked upload. The import starts with the first chunk and
+	parses chunks as they arrive, so it is nearly done when the last chunk
+	lands, the database is only written once the upload is finalized. The
+	session is kept until its import succeeds, or `IMPORT_UPLOAD_RETENTION`
+	seconds after its last change.
+	"""
+	fields = request.get_json(silent=True) or request.form
+	strategy = parse_strategy(fields.get("strategy"))
+	if strategy is None:
+		raise ValidationError(RequestSegment.BODY, [
+			ValidationIssue(
+				message="No strategy was found in the request body",
+				path="$.strategy",
+				type="not_found"
+			)
+		])
+
+	filename = fields.get("filename")
+	if not isinstance(filename, str) or not filename.lower().endswith(".csv"):
+		raise ValidationError(RequestSegment.BODY, [
+			ValidationIssue(
+				message="Expected filename must be a CSV",
+				path="$.filename",
+				type="invalid_format"
+			)
+		])
+
+	store = get_upload_store()
+	store.prune(current_app.config["IMPORT_UPLOAD_RETENTION"])
+	session = store.create(filename, strategy)
+
+	response = jsonify({"upload": session.to_dict(), "state": ImportJobState.QUEUED.value})
+	response.headers["Location"] = f"{request.script_root}/api/import/upload/{session.id}"
+	return response, 201
+
+
+@uploads_bp.route("/upload/<upload_id>", methods=["GET"])
+def get_upload(upload_id: str) -> Response:
+	session = get_upload_session(upload_id)
+	if len(session.chunks) == 0:
+		return jsonify({"upload": session.to_dict(), "state": ImportJobState.QUEUED.value}), 200
+
+	job = start_upload_import(session, retry=False)
+	return jsonify({"upload": session.to_dict(), "state": job.state.value}), 200
+
+
+@uploads_bp.route("/upload/<upload_id>/chunk/<int:index>", methods=["PUT"])
+def put_upload_chunk(upload_id: str, index: int) -> Response:
+	checksum = request.headers.get("X-Chunk-SHA256")
+	if not checksum:
+		raise ValidationError(RequestSegment.HEADERS, [
+			ValidationIssue(
+				message="Expected the SHA-256 of the chunk in the X-Chunk-SHA256 header",
+				path="$.headers.x-chunk-sha256",
+				type="not_found"
+			)
+		])
+
+	session = get_upload_session(upload_id)
+	data = request.get_data(cache=False)
+	if len(data) == 0:
+		raise ValidationError(RequestSegment.BODY, [
+			ValidationIssue(
+				message="Expected chunk to have content",
+				path=None,
+				type="invalid_data"
+			)
+		])
+
+	stored = get_upload_store().put_chunk(upload_id, index, data, checksum)
+	if stored:
+		get_import_metrics().bytes.inc(len(data), session.strategy.value)
+
+	start_upload_import(session, retry=False)
+	return jsonify({"index": index, "size": len(data), "stored": stored}), 201 if stored else 200
+
+
+@uploads_bp.route("/upload/<upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id: str) -> Response:
+	fields = request.get_json(silent=True) or request.form
+	chunk_count = fields.get("chunks")
+	if isinstance(chunk_count, str) and chunk_count.isdecimal():
+		chunk_count = int(chunk_count)
+	if not isinstance(chunk_count, int) or isinstance(chunk_count, bool) or chunk_count < 1:
+		raise ValidationError(RequestSegment.BODY, [
+			ValidationIssue(
+				message="Expected chunks to be the number of chunks uploaded",
+				path="$.chunks",
+				type="invalid_format"
+			)
+		])
+
+	get_upload_session(upload_id)
+	session = get_upload_store().finalize(upload_id, chunk_count)
+	job = start_upload_import(session, retry=True)
+
+	response = jsonify({
+		"batch": session.batch().to_dict(),
+		"state": job.state.value,
+		"strategy": session.strategy.value
+	})
+	response.headers["Location"] = f"{request.script_root}/api/import/batch/{session.id}"
+	return response, 202
+
+
+def get_upload_session(upload_id: str) -> UploadSession:
+	# only ids that parse as ULIDs ever reach the spool directory
+	try:
+		ULID.from_str(upload_id)
+	except ValueError:
+		raise upload_session_not_found(upload_id)
+
+	session = get_upload_store().get(upload_id)
+	if session is None:
+		raise upload_session_not_found(upload_id)
+	return session
+
+
+def start_upload_import(session: UploadSession, retry: bool) -> ImportJob:
+	"""
+	Job importing a session, from its first chunk. Only the process holding
+	the import claim of the session runs it, and a run interrupted with its
+	process is resumed by the next request finding the claim free, after
+	discarding what it wrote. A failed import, for instance waiting longer
+	than `IMPORT_UPLOAD_IDLE_TIMEOUT` for a chunk, stays failed until it is
+	retried by finalizing the upload.
+	"""
+	registry = get_job_registry()
+	session_id = str(session.id)
+	job = registry.get(session_id)
+	if job is not None and not (retry and job.state == ImportJobState.FAILED):
+		return job
+
+	store = get_upload_store()
+	claim = store.claim_import(session_id)
+	if claim is None:
+		# imported by another thread or process sharing the spool directory
+		job = ImportJob(session.batch())
+		job.start()
+		return job
+
+	try:
+		# read again under the claim, the last run may have ended meanwhile
+		session = store.get(session_id)
+		if session is None:
+			raise upload_session_not_found(session_id)
+		if session.import_error is not None:
+			if not retry:
+				job = ImportJob(session.batch())
+				job.fail(session.import_error)
+				claim.release()
+				return job
+			session = store.set_import_error(session_id, None)
+
+		def finish(error: HttpErrorObject | None):
+			try:
+				# a failed import keeps its spool, to be retried
+				if error is None:
+					store.remove(session_id)
+				else:
+					store.set_import_error(session_id, error)
+			finally:
+				claim.release()
+
+		idle_timeout = current_app.config["IMPORT_UPLOAD_IDLE_TIMEOUT"]
+		run = make_stream_import_job_runner(
+			current_app._get_current_object(),
+			lambda: store.open_stream(session_id, idle_timeout),
+			session.filename,
+			DeferredExchangeRate(get_exchange_rate_cache()),
+			discard_previous=True,
+			parsed_path=store.parsed_path(session_id),
+			on_finished=finish,
+		)
+		job = ImportJob(session.batch())
+		registry.submit(job, run, upload=True)
+		return job
+	except BaseException:
+		claim.release()
+		raise
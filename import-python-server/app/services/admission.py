@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Deque, Iterator
+
+from .metrics import ImportMetrics
+from ..errors.service import ServiceError, ServiceErrorType
+
+
+class AdmissionController:
+	"""
+	Bounds the imports running at once and the upload bytes they hold.
+
+	A request over the limits waits in a FIFO queue of at most `max_queued`
+	requests for up to `queue_timeout` seconds, failing with 503 once that
+	deadline passes. Requests finding the queue full fail right away with
+	429. Both tell the client when to retry. An upload larger than
+	`max_bytes` is admitted when no other import is running.
+	"""
+	def __init__(
+		self,
+		max_imports: int,
+		max_bytes: int,
+		max_queued: int,
+		queue_timeout: float,
+		metrics: ImportMetrics | None = None,
+		clock: Callable[[], float] = time.monotonic,
+	) -> None:
+		self.max_imports = max_imports
+		self.max_bytes = max_bytes
+		self.max_queued = max_queued
+		self.queue_timeout = queue_timeout
+		self.metrics = metrics
+		self.clock = clock
+		self.active = 0
+		self.bytes = 0
+		self._waiting: Deque[object] = deque()
+		self._condition = threading.Condition()
+
+	@property
+	def queued(self) -> int:
+		return len(self._waiting)
+
+	@contextmanager
+	def admit(self, size: int) -> Iterator[None]:
+		self.acquire(size)
+		try:
+			yield
+		finally:
+			self.release(size)
+
+	@asynccontextmanager
+	async def admit_async(self, size: int) -> AsyncIterator[None]:
+		"""
+		`admit` for coroutines, queueing in a thread. A request cancelled
+		while queued gives its slot back as soon as it gets one.
+		"""
+		waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire, size))
+		try:
+			await asyncio.shield(waiter)
+		except asyncio.CancelledError:
+			waiter.add_done_callback(lambda done: self._release_admitted(done, size))
+			raise
+
+		try:
+			yield
+		finally:
+			self.release(size)
+
+	def acquire(self, size: int):
+		started = self.clock()
+		with self._condition:
+			if len(self._waiting) == 0 and self._fits(size):
+				self._take(size)
+				self._observe_wait("admitted", 0.0)
+				return
+
+			if len(self._waiting) >= self.max_queued:
+				self._shed("queue_full")
+				raise ServiceError(ServiceErrorType.TOO_MANY_REQUESTS, retry_after=self.queue_timeout)
+
+			token = object()
+			self._waiting.append(token)
+			try:
+				while self._waiting[0] is not token or not self._fits(size):
+					remaining = started + self.queue_timeout - self.clock()
+					if remaining <= 0:
+						self._observe_wait("timeout", self.clock() - started)
+						self._shed("timeout")
+						raise ServiceError(ServiceErrorType.UNAVAILABLE, retry_after=self.queue_timeout)
+					self._condition.wait(remaining)
+				self._take(size)
+			finally:
+				self._waiting.remove(token)
+				# the next request in line may fit as well
+				self._condition.notify_all()
+
+		self._observe_wait("admitted", self.clock() - started)
+
+	def release(self, size: int):
+		with self._condition:
+			self.active -= 1
+			self.bytes -= size
+			self._condition.notify_all()
+
+	def _fits(self, size: int) -> bool:
+		if self.active >= self.max_imports:
+			return False
+		return self.active == 0 or self.bytes + size <= self.max_bytes
+
+	def _take(self, size: int):
+		self.active += 1
+		self.bytes += size
+
+	def _release_admitted(self, waiter: asyncio.Future, size: int):
+		if not waiter.cancelled() and waiter.exception() is None:
+			self.release(size)
+
+	def _observe_wait(self, result: str, seconds: float):
+		if self.metrics is not None:
+			self.metrics.admission_wait.observe(seconds, result)
+
+	def _shed(self, reason: str):
+		if self.metrics is not None:
+			self.metrics.admission_rejected.inc(1, reason)
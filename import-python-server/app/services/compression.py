@@ -0,0 +1,143 @@
+import gzip
+import io
+import zipfile
+import zlib
+from contextlib import contextmanager
+from enum import Enum
+from typing import IO, Iterator
+import zstandard
+from werkzeug.datastructures import FileStorage
+
+from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
+
+
+class Compression(Enum):
+	NONE = "identity"
+	GZIP = "gzip"
+	ZSTD = "zstd"
+	ZIP = "zip"
+
+
+# upload names accepted by the import, checked in order
+UPLOAD_SUFFIXES = (
+	(".csv.gz", Compression.GZIP),
+	(".csv.zst", Compression.ZSTD),
+	(".zip", Compression.ZIP),
+	(".csv", Compression.NONE),
+)
+
+CONTENT_ENCODINGS = {
+	"identity": Compression.NONE,
+	"gzip": Compression.GZIP,
+	"x-gzip": Compression.GZIP,
+	"zstd": Compression.ZSTD,
+}
+
+DECOMPRESS_ERRORS = (EOFError, zlib.error, gzip.BadGzipFile, zstandard.ZstdError, zipfile.BadZipFile, NotImplementedError, RuntimeError)
+
+
+def upload_compression(filename: str, content_encoding: str | None = None) -> Compression | None:
+	"""
+	Compression of an upload from its name, or from the Content-Encoding of
+	its multipart part for a plain `.csv` name. None when it is not supported.
+	"""
+	name = filename.lower()
+	compression = next((compression for suffix, compression in UPLOAD_SUFFIXES if name.endswith(suffix)), None)
+	if compression is None or content_encoding is None:
+		return compression
+
+	encoding = CONTENT_ENCODINGS.get(content_encoding.strip().lower())
+	if compression == Compression.NONE:
+		return encoding
+	return compression if encoding in (Compression.NONE, compression) else None
+
+
+def decompressed_upload(file: FileStorage, compression: Compression, max_size: int) -> FileStorage:
+	"""
+	Upload whose stream yields the decompressed CSV, read incrementally.
+	"""
+	if compression == Compression.NONE:
+		return file
+	stream = io.BufferedReader(DecompressingReader(file.stream, compression, max_size))
+	return FileStorage(stream=stream, filename=file.filename, content_type="text/csv")
+
+
+class DecompressingReader(io.RawIOBase):
+	"""
+	Decompresses `raw` from its current position while it is read, failing
+	once more than `max_size` bytes come out, whatever size the archive
+	declares. Like a request body, it is read once and cannot be seeked.
+	"""
+	def __init__(self, raw: IO[bytes], compression: Compression, max_size: int) -> None:
+		self.raw = raw
+		self.compression = compression
+		self.max_size = max_size
+		self._position = 0
+		self._archive: zipfile.ZipFile | None = None
+		self._reader: IO[bytes] | None = None
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		with translate_decompress_errors(self.compression):
+			if self._reader is None:
+				self._reader = self._open()
+			data = self._reader.read(len(buffer))
+
+		size = len(data)
+		buffer[:size] = data
+		self._position += size
+		if self._position > self.max_size:
+			raise ValidationError(RequestSegment.MULTIPART_FILE, [
+				ValidationIssue(
+					message=f"Expected decompressed file to have at most {self.max_size} bytes",
+					path="$.file",
+					type="too_large"
+				)
+			])
+		return size
+
+	def close(self):
+		self._close_reader()
+		super().close()
+
+	def _open(self) -> IO[bytes]:
+		if self.compression == Compression.GZIP:
+			return gzip.GzipFile(fileobj=self.raw, mode="rb")
+		if self.compression == Compression.ZSTD:
+			return zstandard.ZstdDecompressor().stream_reader(self.raw, read_across_frames=True, closefd=False)
+
+		self._archive = zipfile.ZipFile(self.raw)
+		entries = [entry for entry in self._archive.infolist() if not entry.is_dir()]
+		if len(entries) != 1:
+			raise ValidationError(RequestSegment.MULTIPART_FILE, [
+				ValidationIssue(
+					message=f"Expected zip file to have a single CSV file, found {len(entries)} files",
+					path="$.file",
+					type="invalid_format"
+				)
+			])
+		return self._archive.open(entries[0])
+
+	def _close_reader(self):
+		if self._reader is not None:
+			self._reader.close()
+			self._reader = None
+		if self._archive is not None:
+			self._archive.close()
+			self._archive = None
+
+
+@contextmanager
+def translate_decompress_errors(compression: Compression) -> Iterator[None]:
+	try:
+		yield
+	except DECOMPRESS_ERRORS:
+		raise ValidationError(RequestSegment.MULTIPART_FILE, [
+			ValidationIssue(
+				message=f"Expected file to be valid {compression.value} compressed data",
+				path="$.file",
+				type="invalid_format"
+			)
+		])
@@ -0,0 +1,54 @@
+import hashlib
+from typing import IO, Any
+from flask import Request
+from werkzeug.datastructures import FileStorage
+
+
+class HashingFile:
+	"""
+	Spooled upload file that hashes the data while it is being received,
+	so the content hash is known before parsing without another read.
+	"""
+	def __init__(self, file: IO[bytes]) -> None:
+		self._file = file
+		self._hash = hashlib.sha256()
+
+	def write(self, data: bytes) -> int:
+		self._hash.update(data)
+		return self._file.write(data)
+
+	def hexdigest(self) -> str:
+		return self._hash.hexdigest()
+
+	def __getattr__(self, name: str) -> Any:
+		return getattr(self._file, name)
+
+	def __iter__(self):
+		return iter(self._file)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self._file.close()
+
+
+class HashingRequest(Request):
+	def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+		return HashingFile(super()._get_file_stream(total_content_length, content_type, filename, content_length))
+
+
+def get_content_hash(file: FileStorage) -> str:
+	"""
+	SHA-256 of the uploaded file, hashed on receipt when possible.
+	"""
+	stream = file.stream
+	if isinstance(stream, HashingFile):
+		return stream.hexdigest()
+
+	hash = hashlib.sha256()
+	position = stream.tell()
+	for block in iter(lambda: stream.read(1024 * 1024), b""):
+		hash.update(block)
+	stream.seek(position)
+	return hash.hexdigest()
@@ -0,0 +1,166 @@
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+import numpy as np
+
+from ..entities.product import PreciseAmount, PreciseNumber, RoundingMode
+from .exchange import ExchangeRate
+
+INT64_MAX = 2 ** 63 - 1
+
+# smallest unit of each converted currency
+EUR_UNIT = 2
+JPY_UNIT = 0
+BRL_UNIT = 2
+BTC_UNIT = 8
+
+USD_UNIT = 2
+
+AmountColumn = array | List[PreciseAmount]
+
+
+@dataclass(frozen=True)
+class ConversionScale:
+	"""
+	Precomputed form of `PreciseNumber(amount, unit).multiply(rate).normalize(target_unit)`,
+	as `(amount * multiplier + adjustment) // divisor`.
+
+	For the int64 column path the multiplier is split around the divisor,
+	`multiplier = whole * divisor + high * split + low`, so that the 30+ digit
+	intermediate product never has to be materialized.
+	"""
+	multiplier: int
+	divisor: int
+	half: int
+	whole: int
+	high: int
+	low: int
+	split: int
+
+	@classmethod
+	def new(cls, rate: PreciseNumber, source_unit: int, target_unit: int, rounding: RoundingMode) -> "ConversionScale":
+		if target_unit < 0:
+			raise ValueError("target_unit must be >= 0")
+
+		unit = source_unit + rate.unit
+		if target_unit >= unit:
+			multiplier = rate.amount * 10 ** (target_unit - unit)
+			return cls(multiplier=multiplier, divisor=1, half=0, whole=multiplier, high=0, low=0, split=1)
+
+		divisor = 10 ** (unit - target_unit)
+		half = divisor // 2 if rounding is RoundingMode.HALF_UP else 0
+		split = 10 ** ((unit - target_unit) // 2)
+		whole, remainder = divmod(rate.amount, divisor)
+		high, low = divmod(remainder, split)
+		return cls(multiplier=rate.amount, divisor=divisor, half=half, whole=whole, high=high, low=low, split=split)
+
+	def convert(self, amount: PreciseAmount) -> PreciseAmount:
+		product = amount * self.multiplier
+		if product >= 0:
+			return (product + self.half) // self.divisor
+		return (product - self.half) // self.divisor
+
+	def fits_int64(self, bound: int) -> bool:
+		"""
+		Whether every intermediate of `convert_column` fits in int64 for
+		amounts no larger than `bound` in absolute value.
+		"""
+		low_part = bound * self.low + self.half
+		high_part = bound * self.high + low_part // self.split + 1
+		result = bound * abs(self.whole) + high_part // (self.divisor // self.split) + 1
+		return max(low_part, high_part, result) <= INT64_MAX
+
+	def convert_column(self, amounts: np.ndarray, bound: int) -> AmountColumn:
+		"""
+		Convert an int64 column, `bound` being its largest absolute value.
+		Falls back to exact big-int arithmetic whenever int64 could overflow.
+		"""
+		if not self.fits_int64(bound):
+			return [self.convert(int(amount)) for amount in amounts]
+
+		if self.divisor == 1:
+			return array("q", (amounts * self.multiplier).tobytes())
+
+		# floor((a * m + adj) / d) = a * whole + floor((a * high + floor((a * low + adj) / split)) / (d / split))
+		low_part = amounts * self.low
+		if self.half != 0 and self.multiplier != 0:
+			non_negative = amounts >= 0 if self.multiplier > 0 else amounts <= 0
+			low_part += np.where(non_negative, self.half, -self.half)
+		elif self.half != 0:
+			low_part += self.half
+
+		high_part = amounts * self.high
+		high_part += low_part // self.split
+
+		result = high_part // (self.divisor // self.split)
+		if self.whole != 0:
+			result += amounts * self.whole
+
+		return array("q", result.tobytes())
+
+
+@dataclass(frozen=True)
+class ConvertedPrices:
+	usd: AmountColumn
+	eur: AmountColumn
+	jpy: AmountColumn
+	brl: AmountColumn
+	btc: AmountColumn
+
+	def slice(self, start: int, end: int) -> "ConvertedPrices":
+		return ConvertedPrices(
+			usd=self.usd[start:end],
+			eur=self.eur[start:end],
+			jpy=self.jpy[start:end],
+			brl=self.brl[start:end],
+			btc=self.btc[start:end],
+		)
+
+
+class CurrencyConverter:
+	"""
+	Converts USD amounts with a fixed exchange rate, bit-for-bit equal to
+	`PreciseNumber.multiply` followed by `PreciseNumber.normalize`.
+	"""
+	def __init__(self, exchange: ExchangeRate, rounding: RoundingMode = RoundingMode.TRUNCATE) -> None:
+		self.exchange = exchange
+		self.rounding = rounding
+		self.eur = ConversionScale.new(exchange.eur, USD_UNIT, EUR_UNIT, rounding)
+		self.jpy = ConversionScale.new(exchange.jpy, USD_UNIT, JPY_UNIT, rounding)
+		self.brl = ConversionScale.new(exchange.brl, USD_UNIT, BRL_UNIT, rounding)
+		self.btc = ConversionScale.new(exchange.btc, USD_UNIT, BTC_UNIT, rounding)
+
+	def convert(self, usd: PreciseAmount) -> Tuple[PreciseAmount, PreciseAmount, PreciseAmount, PreciseAmount]:
+		return (
+			self.eur.convert(usd),
+			self.jpy.convert(usd),
+			self.brl.convert(usd),
+			self.btc.convert(usd),
+		)
+
+	def convert_column(self, usd: Sequence[PreciseAmount]) -> ConvertedPrices:
+		bound = max((abs(amount) for amount in usd), default=0)
+		if bound > INT64_MAX:
+			usd_column: AmountColumn = list(usd)
+			return ConvertedPrices(
+				usd=usd_column,
+				eur=[self.eur.convert(amount) for amount in usd],
+				jpy=[self.jpy.convert(amount) for amount in usd],
+				brl=[self.brl.convert(amount) for amount in usd],
+				btc=[self.btc.convert(amount) for amount in usd],
+			)
+
+		amounts = np.fromiter(usd, dtype=np.int64, count=len(usd))
+		return ConvertedPrices(
+			usd=array("q", amounts.tobytes()),
+			eur=self.eur.convert_column(amounts, bound),
+			jpy=self.jpy.convert_column(amounts, bound),
+			brl=self.brl.convert_column(amounts, bound),
+			btc=self.btc.convert_column(amounts, bound),
+		)
+
+
+@lru_cache(maxsize=8)
+def get_currency_converter(exchange: ExchangeRate, rounding: RoundingMode = RoundingMode.TRUNCATE) -> CurrencyConverter:
+	return CurrencyConverter(exchange, rounding)
@@ -1,11 +1,17 @@
+import json
+import logging
+import os
+import threading
+import time
 from dataclasses import dataclass
-from flask import current_app
+from typing import Callable, Protocol
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .type_parser import parse_precise_number
 from ..entities.product import CurrencyCode, PreciseNumber
-
-USD_EXCHANGE_RATE_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json"
+from ..errors.service import ServiceError, ServiceErrorType
 
 
 @dataclass(frozen=True)
@@ -20,33 +26,206 @@ class ExchangeRate:
 	btc: PreciseNumber
 
 
-def get_currency_exchange_rate() -> ExchangeRate | None:
-	try:
-		response = requests.get(USD_EXCHANGE_RATE_URL, timeout=5)
-		response.raise_for_status()
-		data = response.json()
-	except (requests.RequestException, ValueError) as err:
-		current_app.logger.error(f"get exchange rate error: {err}")
-		return None
+class ExchangeRateSource(Protocol):
+	def fetch(self) -> ExchangeRate | None:
+		...
+
+
+class HttpExchangeRateSource:
+	"""
+	Exchange rate API client reusing pooled connections between fetches.
+	"""
+	def __init__(self, url: str, timeout: float, logger: logging.Logger) -> None:
+		self.url = url
+		self.timeout = timeout
+		self.logger = logger
+		self.session = requests.Session()
+		retries = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+		self.session.mount("https://", HTTPAdapter(pool_maxsize=4, max_retries=retries))
+		self.session.mount("http://", HTTPAdapter(pool_maxsize=4, max_retries=retries))
+
+	def fetch(self) -> ExchangeRate | None:
+		try:
+			response = self.session.get(self.url, timeout=self.timeout)
+			response.raise_for_status()
+			data = response.json()
+		except (requests.RequestException, ValueError) as err:
+			self.logger.error(f"get exchange rate error: {err}")
+			return None
+
+		rate = parse_usd_exchange_rates(data, self.logger)
+		self.logger.info(f"exchange rate {rate}")
+		return rate
+
+
+class StaticExchangeRateSource:
+	"""
+	Fixed exchange rate, for tests and offline development.
+	"""
+	def __init__(self, rate: ExchangeRate | None) -> None:
+		self.rate = rate
+		self.fetches = 0
+
+	def fetch(self) -> ExchangeRate | None:
+		self.fetches += 1
+		return self.rate
+
+
+class ExchangeRateCache:
+	"""
+	Process-wide exchange rate cache.
+
+	A rate younger than `ttl` seconds is served as is. An older rate, up to
+	`max_stale` seconds, is still served while a background refresh runs.
+	Past that, or with nothing cached, the caller fetches synchronously.
+	Every successful fetch is written to `snapshot_path`, which seeds the
+	cache on the next cold start.
+	"""
+	def __init__(
+		self,
+		source: ExchangeRateSource,
+		*,
+		ttl: float,
+		max_stale: float,
+		snapshot_path: str | None,
+		logger: logging.Logger,
+		clock: Callable[[], float] = time.time,
+	) -> None:
+		self.source = source
+		self.ttl = ttl
+		self.max_stale = max_stale
+		self.snapshot_path = snapshot_path
+		self.logger = logger
+		self.clock = clock
+		self._rate: ExchangeRate | None = None
+		self._fetched = 0.0
+		self._lock = threading.Lock()
+		self._refresh_lock = threading.Lock()
+		self._refreshing = False
+
+		if snapshot_path is not None:
+			self._load_snapshot(snapshot_path)
+
+	def get(self) -> ExchangeRate | None:
+		with self._lock:
+			rate = self._rate
+			age = self.clock() - self._fetched
+
+		if rate is not None and age < self.ttl:
+			return rate
+
+		if rate is not None and age < self.max_stale:
+			self.refresh_in_background()
+			return rate
+
+		return self.refresh()
+
+	def refresh(self) -> ExchangeRate | None:
+		# single flight, concurrent callers wait for the running fetch
+		with self._refresh_lock:
+			with self._lock:
+				if self._rate is not None and self.clock() - self._fetched < self.ttl:
+					return self._rate
+
+			rate = self.source.fetch()
+			if rate is None:
+				return None
 
+			with self._lock:
+				self._rate = rate
+				self._fetched = self.clock()
+				fetched = self._fetched
+
+		if self.snapshot_path is not None:
+			self._save_snapshot(self.snapshot_path, rate, fetched)
+		return rate
+
+	def refresh_in_background(self):
+		with self._lock:
+			if self._refreshing:
+				return
+			self._refreshing = True
+
+		def run():
+			try:
+				self.refresh()
+			except Exception:
+				self.logger.exception("exchange rate background refresh failed")
+			finally:
+				with self._lock:
+					self._refreshing = False
+
+		threading.Thread(target=run, name="exchange-rate-refresh", daemon=True).start()
+
+	def _load_snapshot(self, path: str):
+		try:
+			with open(path, "r", encoding="utf-8") as file:
+				data = json.load(file)
+			rate = exchange_rate_from_dict(data["rates"])
+			fetched = float(data["fetched"])
+		except FileNotFoundError:
+			return
+		except (OSError, ValueError, KeyError, TypeError) as err:
+			self.logger.warning(f"exchange rate snapshot {path} ignored: {err}")
+			return
+
+		self._rate = rate
+		self._fetched = fetched
+		self.logger.info(f"exchange rate loaded from snapshot {path}")
+
+	def _save_snapshot(self, path: str, rate: ExchangeRate, fetched: float):
+		temp_path = f"{path}.tmp"
+		try:
+			with open(temp_path, "w", encoding="utf-8") as file:
+				json.dump({"fetched": fetched, "rates": exchange_rate_to_dict(rate)}, file)
+			os.replace(temp_path, path)
+		except OSError as err:
+			self.logger.warning(f"exchange rate snapshot {path} not saved: {err}")
+
+
+class DeferredExchangeRate:
+	"""
+	Exchange rate taken from `cache` the first time a price is converted,
+	so an import rejected before that never waits on the rate API. Usable
+	outside of the app context, from parser and job threads.
+	"""
+	def __init__(self, cache: ExchangeRateCache) -> None:
+		self.cache = cache
+		self._rate: ExchangeRate | None = None
+
+	def get(self) -> ExchangeRate:
+		if self._rate is None:
+			rate = self.cache.get()
+			if rate is None:
+				self.cache.logger.error("get exchange rate service unavailable")
+				raise ServiceError(ServiceErrorType.UNAVAILABLE)
+			self._rate = rate
+		return self._rate
+
+
+def resolve_exchange_rate(exchange: ExchangeRate | DeferredExchangeRate) -> ExchangeRate:
+	return exchange.get() if isinstance(exchange, DeferredExchangeRate) else exchange
+
+
+def parse_usd_exchange_rates(data: dict, logger: logging.Logger) -> ExchangeRate | None:
 	rates = data.get("usd")
 	if not isinstance(rates, dict):
 		return None
 
-	eur = extract_currency_precise_number(rates, CurrencyCode.EUR)
+	eur = extract_currency_precise_number(rates, CurrencyCode.EUR, logger)
 	if eur is None:
 		return None
-	jpy = extract_currency_precise_number(rates, CurrencyCode.JPY)
+	jpy = extract_currency_precise_number(rates, CurrencyCode.JPY, logger)
 	if jpy is None:
 		return None
-	brl = extract_currency_precise_number(rates, CurrencyCode.BRL)
+	brl = extract_currency_precise_number(rates, CurrencyCode.BRL, logger)
 	if brl is None:
 		return None
-	btc = extract_currency_precise_number(rates, CurrencyCode.BTC)
+	btc = extract_currency_precise_number(rates, CurrencyCode.BTC, logger)
 	if btc is None:
 		return None
 	
-	rate = ExchangeRate(
+	return ExchangeRate(
 		usd=PreciseNumber(amount=100, unit=2),
 		eur=eur,
 		jpy=jpy,
@@ -54,22 +233,45 @@ def get_currency_exchange_rate() -> ExchangeRate | None:
 		btc=btc,
 	)
 
-	current_app.logger.info(f"exchange rate {rate}")
-
-	return rate
-
 
-def extract_currency_precise_number(rates: dict, currency: CurrencyCode) -> PreciseNumber | None:
+def extract_currency_precise_number(rates: dict, currency: CurrencyCode, logger: logging.Logger) -> PreciseNumber | None:
 	rate = rates.get(currency.value.lower())
 	if rate is None:
-		current_app.logger.info(f"exchange rate of currency {currency.value} was not found")
+		logger.info(f"exchange rate of currency {currency.value} was not found")
 		return None
 	
 	if not isinstance(rate, int) and not isinstance(rate, float):
-		current_app.logger.info(f"exchange rate of currency {currency.value} is not a valid number {rate}")
+		logger.info(f"exchange rate of currency {currency.value} is not a valid number {rate}")
 		return None
 	
 	ratestr = format(rate, '.15f')
-	current_app.logger.info(f"exchange rate of currency {currency.value} as string {ratestr}")
+	logger.info(f"exchange rate of currency {currency.value} as string {ratestr}")
 
 	return parse_precise_number(ratestr)
+
+
+def exchange_rate_to_dict(rate: ExchangeRate) -> dict:
+	return {
+		code.value.lower(): [number.amount, number.unit]
+		for code, number in (
+			(CurrencyCode.USD, rate.usd),
+			(CurrencyCode.EUR, rate.eur),
+			(CurrencyCode.JPY, rate.jpy),
+			(CurrencyCode.BRL, rate.brl),
+			(CurrencyCode.BTC, rate.btc),
+		)
+	}
+
+
+def exchange_rate_from_dict(data: dict) -> ExchangeRate:
+	def number(code: CurrencyCode) -> PreciseNumber:
+		amount, unit = data[code.value.lower()]
+		return PreciseNumber(amount=int(amount), unit=int(unit))
+
+	return ExchangeRate(
+		usd=number(CurrencyCode.USD),
+		eur=number(CurrencyCode.EUR),
+		jpy=number(CurrencyCode.JPY),
+		brl=number(CurrencyCode.BRL),
+		btc=number(CurrencyCode.BTC),
+	)
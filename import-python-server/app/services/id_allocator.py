@@ -0,0 +1,91 @@
+import os
+import secrets
+import threading
+import time
+from typing import Callable
+
+# randomness of a new millisecond leaves 2**79 increments before overflowing 80 bits
+RANDOMNESS_BITS = 80
+RANDOMNESS_SEED_BITS = 79
+MAX_TIMESTAMP = 2 ** 48 - 1
+
+CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CROCKFORD_BASE32_PAIRS = [high + low for high in CROCKFORD_BASE32 for low in CROCKFORD_BASE32]
+
+
+class UlidAllocator:
+	"""
+	Allocates blocks of consecutive ULIDs.
+
+	Ids are monotonic within the process: a block continues the randomness
+	of the previous block in the same millisecond, so a chunk of rows is
+	appended to the right of the primary key index. The state is reset in
+	forked children, which would otherwise hand out the parent's ids again.
+	"""
+	def __init__(self, clock: Callable[[], int] = time.time_ns) -> None:
+		self.clock = clock
+		self._reset()
+		os.register_at_fork(after_in_child=self._reset)
+
+	def _reset(self):
+		self._lock = threading.Lock()
+		self._timestamp = -1
+		self._randomness = 0
+
+	def allocate(self, count: int) -> int:
+		"""
+		Reserve `count` ids, returning the first one as a 128 bit integer.
+		"""
+		if count < 1:
+			raise ValueError("count must be >= 1")
+
+		with self._lock:
+			timestamp = max(self.clock() // 1_000_000, self._timestamp)
+			if timestamp == self._timestamp and self._randomness + count < 2 ** RANDOMNESS_BITS:
+				start = self._randomness + 1
+			else:
+				if timestamp == self._timestamp:
+					# randomness of this millisecond is exhausted, borrow the next one
+					timestamp += 1
+				start = secrets.randbits(RANDOMNESS_SEED_BITS)
+
+			if timestamp > MAX_TIMESTAMP:
+				raise ValueError("ULID timestamp overflow")
+
+			self._timestamp = timestamp
+			self._randomness = start + count - 1
+
+		return (timestamp << RANDOMNESS_BITS) | start
+
+	def allocate_bytes(self, count: int) -> bytes:
+		"""
+		Reserve `count` ids, packed as 16 bytes each.
+		"""
+		first = self.allocate(count)
+		return b"".join((first + n).to_bytes(16, "big") for n in range(count))
+
+
+def encode_ulid(value: int) -> str:
+	"""
+	Crockford base32 text of a 128 bit ULID, as `str(ULID)`.
+	"""
+	pairs = CROCKFORD_BASE32_PAIRS
+	return (
+		CROCKFORD_BASE32[value >> 125]
+		+ pairs[(value >> 115) & 0x3FF]
+		+ pairs[(value >> 105) & 0x3FF]
+		+ pairs[(value >> 95) & 0x3FF]
+		+ pairs[(value >> 85) & 0x3FF]
+		+ pairs[(value >> 75) & 0x3FF]
+		+ pairs[(value >> 65) & 0x3FF]
+		+ pairs[(value >> 55) & 0x3FF]
+		+ pairs[(value >> 45) & 0x3FF]
+		+ pairs[(value >> 35) & 0x3FF]
+		+ pairs[(value >> 25) & 0x3FF]
+		+ pairs[(value >> 15) & 0x3FF]
+		+ pairs[(value >> 5) & 0x3FF]
+		+ CROCKFORD_BASE32[value & 0x1F]
+	)
+
+
+ulid_allocator = UlidAllocator()
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import IO, Callable
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+from .import_products import (
+	ImportOptions,
+	ProductChunk,
+	delete_product_batch,
+	import_product_chunks,
+	import_products_csv_file,
+	iter_spooled_product_chunks,
+	parse_product_chunks,
+	spool_product_chunks,
+)
+from .exchange import DeferredExchangeRate, ExchangeRate
+from ..entities.product import ImportStrategy, ProductBatch
+from ..errors.app_error import AppError, HttpBaseError, HttpErrorObject
+from ..extensions.database import get_db
+from ..extensions.metrics import get_import_metrics
+from ..extensions.parsing import get_parse_pool
+
+
+class ImportJobState(Enum):
+	QUEUED = "queued"
+	RUNNING = "running"
+	COMPLETED = "completed"
+	FAILED = "failed"
+
+
+class ImportJob:
+	"""
+	Progress of an import running in the background, updated per chunk.
+	"""
+	def __init__(self, batch: ProductBatch) -> None:
+		self.batch = batch
+		self.state = ImportJobState.QUEUED
+		self.rows_processed = 0
+		self.rows_imported = 0
+		self.issue_count = 0
+		self.started: float | None = None
+		self.finished: float | None = None
+		self.error: HttpErrorObject | None = None
+		self._lock = threading.Lock()
+
+	def start(self):
+		with self._lock:
+			self.state = ImportJobState.RUNNING
+			self.started = time.monotonic()
+
+	def record_chunk(self, chunk: ProductChunk, written: int):
+		with self._lock:
+			self.rows_processed += len(chunk.products) + len(chunk.issues)
+			self.rows_imported += written
+			self.issue_count += len(chunk.issues)
+
+	def complete(self, imported: int, issue_count: int):
+		with self._lock:
+			self.state = ImportJobState.COMPLETED
+			self.rows_imported = imported
+			self.issue_count = issue_count
+			self.finished = time.monotonic()
+
+	def fail(self, error: HttpErrorObject):
+		with self._lock:
+			self.state = ImportJobState.FAILED
+			if self.batch.strategy == ImportStrategy.ATOMIC:
+				# the single transaction was rolled back
+				self.rows_imported = 0
+			self.error = error
+			self.finished = time.monotonic()
+
+	def to_dict(self):
+		with self._lock:
+			elapsed = 0.0
+			if self.started is not None:
+				elapsed = (self.finished or time.monotonic()) - self.started
+
+			return {
+				"batch": self.batch.to_dict(),
+				"state": self.state.value,
+				"rows_processed": self.rows_processed,
+				"rows_imported": self.rows_imported,
+				"issues": self.issue_count,
+				"elapsed": round(elapsed, 3),
+				"throughput": round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0,
+				"error": self.error,
+			}
+
+
+class ImportJobRegistry:
+	"""
+	Runs imports on a worker pool and keeps the most recent jobs for status queries.
+	Imports of chunked uploads run on a pool of their own, as they spend
+	most of their time waiting for the client.
+	"""
+	def __init__(self, max_workers: int, retention: int, max_upload_workers: int = 1) -> None:
+		self.retention = retention
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import-job")
+		self._upload_executor = ThreadPoolExecutor(max_workers=max_upload_workers, thread_name_prefix="upload-import-job")
+		self._jobs: OrderedDict[str, ImportJob] = OrderedDict()
+		self._lock = threading.Lock()
+
+	def submit(self, job: ImportJob, run: Callable[[ImportJob], None], upload: bool = False):
+		with self._lock:
+			self._jobs[str(job.batch.id)] = job
+			self._evict_finished()
+		(self._upload_executor if upload else self._executor).submit(run, job)
+
+	def submit_if_absent(self, job: ImportJob, run: Callable[[ImportJob], None]) -> ImportJob:
+		"""
+		Submit `job` unless a job of the same batch is known, returning the job tracking the batch.
+		"""
+		with self._lock:
+			existing = self._jobs.get(str(job.batch.id))
+			if existing is not None:
+				return existing
+			self._jobs[str(job.batch.id)] = job
+			self._evict_finished()
+		self._executor.submit(run, job)
+		return job
+
+	def get(self, batch_id: str) -> ImportJob | None:
+		with self._lock:
+			return self._jobs.get(batch_id)
+
+	def shutdown(self):
+		self._executor.shutdown(wait=True)
+		self._upload_executor.shutdown(wait=True)
+
+	def _evict_finished(self):
+		finished_states = (ImportJobState.COMPLETED, ImportJobState.FAILED)
+		excess = len(self._jobs) - self.retention
+		for batch_id in [key for key, job in self._jobs.items() if job.state in finished_states]:
+			if excess <= 0:
+				break
+			del self._jobs[batch_id]
+			excess -= 1
+
+
+def make_import_job_runner(
+	app: Flask,
+	upload_path: str,
+	filename: str,
+	exchange: ExchangeRate | DeferredExchangeRate,
+) -> Callable[[ImportJob], None]:
+	"""
+	Import a spooled upload inside its own app context, so the job gets a
+	pooled connection that is committed and returned when it finishes.
+	"""
+	return make_stream_import_job_runner(
+		app,
+		lambda: open(upload_path, "rb"),
+		filename,
+		exchange,
+		cleanup=lambda: os.remove(upload_path),
+	)
+
+
+def make_stream_import_job_runner(
+	app: Flask,
+	open_stream: Callable[[], IO[bytes]],
+	filename: str,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	*,
+	discard_previous: bool = False,
+	parsed_path: str | None = None,
+	cleanup: Callable[[], None] | None = None,
+	on_finished: Callable[[HttpErrorObject | None], None] | None = None,
+) -> Callable[[ImportJob], None]:
+	"""
+	Import the stream returned by `open_stream`. With `parsed_path`, the
+	whole stream is parsed into that file first, and a connection is only
+	taken once it ends, so a stream still being received holds none.
+
+	With `discard_previous`, rows an interrupted run of the same batch
+	already committed are deleted first, so the batch is imported exactly
+	once. `on_finished` gets the error of the import, None once imported,
+	before the job reports it, so whoever sees the job finished also sees
+	what it left behind.
+	"""
+	def run(job: ImportJob):
+		job.start()
+		result = None
+		error: HttpErrorObject | None = None
+		try:
+			with app.app_context(), open_stream() as stream:
+				file = FileStorage(stream=stream, filename=filename)
+				options = ImportOptions.from_config(app.config)
+				if parsed_path is not None:
+					read_error = spool_product_chunks(
+						parse_product_chunks(job.batch, file, exchange, options, get_parse_pool(), get_import_metrics()),
+						parsed_path,
+					)
+
+				if discard_previous:
+					delete_product_batch(get_db(), job.batch.id)
+				if parsed_path is None:
+					result = import_products_csv_file(job.batch, file, exchange, options, on_chunk=job.record_chunk)
+				else:
+					result = import_product_chunks(
+						job.batch,
+						lambda: iter_spooled_product_chunks(parsed_path, read_error),
+						options,
+						on_chunk=job.record_chunk,
+					)
+		except HttpBaseError as err:
+			error = err.http_error_object()
+		except Exception:
+			app.logger.exception(f"import job {job.batch.id} failed")
+			error = AppError().http_error_object()
+		finally:
+			# the job reports its end state even when these fail, else it would look running forever
+			try:
+				if on_finished is not None:
+					on_finished(error)
+			except Exception:
+				app.logger.exception(f"import job {job.batch.id} could not record its outcome")
+			try:
+				if cleanup is not None:
+					cleanup()
+			except Exception:
+				app.logger.exception(f"import job {job.batch.id} could not clean up")
+
+			if result is not None:
+				job.complete(result.imported, result.issues.total)
+			else:
+				job.fail(error or AppError().http_error_object())
+
+	return run
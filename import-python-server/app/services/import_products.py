@@ -1,54 +1,196 @@
 import io
 import csv
-from typing import List, Tuple
+import itertools
+import math
+from array import array
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+from time import perf_counter
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from datetime import datetime, time
+from dataclasses import dataclass
+from enum import Enum
+from typing import IO, Any, Callable, Generator, Iterable, Iterator, List, Mapping, Sequence, Tuple
+from psycopg import Connection, DataError, IntegrityError, Rollback
+from psycopg.errors import UniqueViolation
+from psycopg.types.json import Jsonb
+from ulid import ULID
 from werkzeug.datastructures import FileStorage
 
 from .type_parser import ImportStrategy
-from .product_parser import parse_product_row
+from .product_parser import FIELD_CACHE_SIZE, FieldCaches, ProductFields, ProductRowParser, RowIssue, parse_product_row, make_products
+from .parallel_parser import CHUNKS_IN_FLIGHT_PER_WORKER, can_split_csv, estimate_row_size, find_record_end, split_csv_ranges, iter_parsed_ranges
+from .pipeline import chunked, iter_in_background
+from .id_allocator import encode_ulid, ulid_allocator
+from .metrics import ImportMetrics
+from .issue_report import IssueCollector, IssueReport, issue_log_path, prune_issue_logs
 from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
+from ..errors.resource import ResourceError, ResourceErrorType, ResourceLocation
 from ..entities.product import Product, ProductBatch
+from ..entities.product_columns import ULID_SIZE, ProductColumns
 from ..extensions.database import get_db
-from ..services.exchange import ExchangeRate
+from ..extensions.parsing import get_parse_pool
+from ..extensions.metrics import get_import_metrics
+from ..services.exchange import DeferredExchangeRate, ExchangeRate, resolve_exchange_rate
 
 
 EXPECTED_FIELDS = {"name", "price", "expiration"}
 
+# column order of files without a header
+CSV_FIELDNAMES = ("name", "price", "expiration")
+
+# rows converted at once when parsing a whole file into memory
+PARSE_CHUNK_SIZE = 5000
+
+# bytes read at once from unbuffered upload streams
+CSV_READ_BUFFER_SIZE = 256 * 1024
+
+# issues kept in memory and returned with an import result
+ISSUE_SAMPLES = 100
+
+# seconds an issue log is kept after its import
+ISSUE_RETENTION = 24 * 60 * 60
+
+# issues after which an atomic import stops reading its upload
+ATOMIC_MAX_ISSUES = 100
+
+ProductRecord = ProductFields | RowIssue
+
+
+@dataclass(frozen=True)
+class ProductChunk:
+	products: ProductColumns
+	issues: List[RowIssue]
+	# row index of each product, to report the rows the database rejects
+	row_indexes: Sequence[int] = ()
+
+
+# called after each chunk with the number of rows written from it
+ChunkCallback = Callable[[ProductChunk, int], None]
+
+
+@dataclass(frozen=True)
+class ImportOptions:
+	chunk_size: int
+	queue_size: int
+	parallel_threshold: int
+	parallel_workers: int
+	spool_dir: str
+	issue_samples: int = ISSUE_SAMPLES
+	# directory of the NDJSON issue logs, None to keep no log
+	issue_log_dir: str | None = None
+	issue_retention: float = ISSUE_RETENTION
+	field_cache_size: int = FIELD_CACHE_SIZE
+	atomic_max_issues: int = ATOMIC_MAX_ISSUES
+	# parse in the writer thread instead of a producer thread and the parse
+	# pool, for profilers that only see the calling thread
+	inline_parse: bool = False
+
+	@classmethod
+	def from_config(cls, config: Mapping[str, Any]) -> "ImportOptions":
+		return cls(
+			chunk_size=config["IMPORT_CHUNK_SIZE"],
+			queue_size=config["IMPORT_QUEUE_SIZE"],
+			parallel_threshold=config["IMPORT_PARALLEL_THRESHOLD"],
+			parallel_workers=config["IMPORT_PARALLEL_WORKERS"],
+			spool_dir=config["IMPORT_SPOOL_DIR"],
+			issue_samples=config["IMPORT_ISSUE_SAMPLES"],
+			issue_log_dir=os.path.join(config["IMPORT_SPOOL_DIR"], "issues"),
+			issue_retention=config["IMPORT_ISSUE_RETENTION"],
+			field_cache_size=config["IMPORT_FIELD_CACHE_SIZE"],
+			atomic_max_issues=config["IMPORT_ATOMIC_MAX_ISSUES"],
+		)
+
+
+@dataclass(frozen=True)
+class ImportResult:
+	batch: ProductBatch
+	imported: int
+	issues: IssueReport
+
+
+@dataclass(frozen=True)
+class DryRunResult:
+	strategy: ImportStrategy
+	valid_rows: int
+	issues: IssueReport
+
+
 def parse_products_csv_file(file: FileStorage, exchange: ExchangeRate, strategy: ImportStrategy) -> Tuple[ProductBatch, List[Product], List[ValidationIssue]]:
 	errors: List[ValidationIssue] = []
 	products: List[Product] = []
 	batch = ProductBatch.new(file.filename, strategy)
 
-	try:
-		# https://docs.python.org/3/library/codecs.html#codec-base-classes
-		error_strategy = "strict" if strategy == ImportStrategy.ATOMIC else "replace"
-		stream = io.TextIOWrapper(file.stream, encoding="utf-8", errors=error_strategy)
+	stream = open_csv_text_stream(file.stream, strategy)
+	for chunk in chunk_product_records(parse_products_csv(stream), batch, exchange, PARSE_CHUNK_SIZE):
+		products.extend(chunk.products)
+		errors.extend(issue.to_validation_issue() for issue in chunk.issues)
+
+	return (batch, products, errors)
+
+
+def dry_run_products_csv_file(file: FileStorage, strategy: ImportStrategy, options: ImportOptions) -> DryRunResult:
+	"""
+	Validate every row of the upload without converting or writing them,
+	so a dry run needs neither the exchange rate nor the database.
+	"""
+	issues = IssueCollector(options.issue_samples)
+	valid_rows = 0
+	stream = open_csv_text_stream(file.stream, strategy)
+	for record in parse_products_csv(stream, FieldCaches(options.field_cache_size)):
+		if isinstance(record, RowIssue):
+			issues.add((record,))
+		else:
+			valid_rows += 1
+
+	return DryRunResult(strategy=strategy, valid_rows=valid_rows, issues=issues.report())
+
+
+def open_csv_text_stream(binary: IO[bytes], strategy: ImportStrategy) -> io.TextIOWrapper:
+	# https://docs.python.org/3/library/codecs.html#codec-base-classes
+	error_strategy = "strict" if strategy == ImportStrategy.ATOMIC else "replace"
+	# raw streams such as request bodies and pipes are decoded from a read buffer
+	if isinstance(binary, io.RawIOBase):
+		binary = io.BufferedReader(binary, CSV_READ_BUFFER_SIZE)
+	return io.TextIOWrapper(binary, encoding="utf-8", errors=error_strategy)
+
+
+def parse_products_csv(stream: io.TextIOWrapper, caches: FieldCaches | None = None) -> Iterator[ProductRecord]:
+	"""
+	Lazily parse a CSV text stream, yielding the fields or the issue of each row.
+	"""
+	with translate_csv_errors():
 		reader = csv.reader(stream, delimiter=';')
-		first_row = next(reader)
+		first_row = next(reader, None)
+		if first_row is None:
+			return
 
+		# the peeked row is parsed as data when it is not a header, so the stream is read once
 		if is_product_csv_header(first_row):
-			stream.seek(0)
-			dict_reader = csv.DictReader(stream, delimiter=';')
-			normalize_csv_fieldnames(dict_reader)
+			parser = ProductRowParser.from_header(first_row, caches)
+			rows: Iterable[List[str]] = reader
 		else:
-			stream.seek(0)
-			dict_reader = csv.DictReader(stream, delimiter=';', fieldnames=EXPECTED_FIELDS)
+			parser = ProductRowParser(CSV_FIELDNAMES, caches)
+			rows = itertools.chain((first_row,), reader)
 
-		for row_index, row in enumerate(dict_reader, start=1):
-			if not any(row.values()):
+		for row in rows:
+			record = parser.parse_next(row)
+			if record is None:
 				continue
+			yield record
 
-			try:
-				product = parse_product_row(row, row_index, batch.id, exchange)
-				if isinstance(product, ValidationIssue):
-					errors.append(product)
-				else:
-					products.append(product)
-			except Exception:
-				errors.append(ValidationIssue(
-					message=f"Error in row {row_index}",
-					path=f"$.row.{row_index}",
-					type="invalid_data"
-				))
+
+@contextmanager
+def translate_csv_errors():
+	"""
+	Report decoding and CSV syntax errors as a validation error of the whole file.
+	"""
+	try:
+		yield
 	except UnicodeDecodeError:
 		raise ValidationError(RequestSegment.MULTIPART_FILE, [
 			ValidationIssue(
@@ -65,41 +207,691 @@ def parse_products_csv_file(file: FileStorage, exchange: ExchangeRate, strategy:
 				type="invalid_format"
 			)
 		])
-	
-	return (batch, products, errors)
+
+
+def chunk_product_records(
+	records: Iterable[ProductRecord],
+	batch: ProductBatch,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	chunk_size: int,
+	metrics: ImportMetrics | None = None,
+) -> Iterator[ProductChunk]:
+	"""
+	Convert the valid rows in chunks. The exchange rate is only resolved
+	for the first chunk with rows to convert, and an atomic import stops
+	converting at its first issue as none of its rows will be written.
+	"""
+	rate: ExchangeRate | None = None
+	rejected = False
+	started = perf_counter()
+	for records_chunk in chunked(records, chunk_size):
+		rows: List[ProductFields] = []
+		issues: List[RowIssue] = []
+		for record in records_chunk:
+			if isinstance(record, RowIssue):
+				issues.append(record)
+			else:
+				rows.append(record)
+
+		# parse covers reading, decoding and validating the rows of the chunk
+		parsed = perf_counter()
+		if metrics is not None:
+			metrics.observe_stage("parse", batch.strategy.value, parsed - started)
+
+		rejected = rejected or (batch.strategy == ImportStrategy.ATOMIC and len(issues) != 0)
+		if rejected:
+			rows = []
+		if len(rows) == 0:
+			products = ProductColumns(batch.id, batch.created)
+		else:
+			if rate is None:
+				rate = resolve_import_exchange_rate(exchange, batch.strategy, metrics)
+				parsed = perf_counter()
+			products = make_products(rows, batch, rate)
+			if metrics is not None:
+				metrics.observe_stage("convert", batch.strategy.value, perf_counter() - parsed)
+
+		yield ProductChunk(products=products, issues=issues, row_indexes=array("i", (row.row_index for row in rows)))
+		started = perf_counter()
+
+
+def resolve_import_exchange_rate(
+	exchange: ExchangeRate | DeferredExchangeRate,
+	strategy: ImportStrategy,
+	metrics: ImportMetrics | None = None,
+) -> ExchangeRate:
+	if metrics is None:
+		return resolve_exchange_rate(exchange)
+	with metrics.time_stage("exchange", strategy.value):
+		return resolve_exchange_rate(exchange)
 
 
 def is_product_csv_header(row: list[str]) -> bool:
 	return set(cell.strip().lower() for cell in row) >= EXPECTED_FIELDS
 
 
-def normalize_csv_fieldnames(reader: csv.DictReader[str]):
-	reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+def import_products_csv_file(
+	batch: ProductBatch,
+	file: FileStorage,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	options: ImportOptions,
+	on_chunk: ChunkCallback | None = None,
+) -> ImportResult:
+	"""
+	Parse and write the upload in fixed-size chunks, keeping memory flat
+	regardless of the file size. Parsing runs in a producer thread that can
+	be at most `queue_size` chunks ahead of the database writer.
+	"""
+	metrics = get_import_metrics()
+	size = upload_size(file.stream)
+	if size is not None:
+		metrics.bytes.inc(size, batch.strategy.value)
+
+	def open_chunks() -> Generator[ProductChunk, None, None]:
+		if options.inline_parse:
+			return parse_product_chunks(batch, file, exchange, options, None, metrics)
+		return iter_in_background(
+			parse_product_chunks(batch, file, exchange, options, get_parse_pool(), metrics),
+			options.queue_size,
+			name="import-parser",
+		)
+
+	return import_product_chunks(batch, open_chunks, options, on_chunk)
+
+
+def import_product_chunks(
+	batch: ProductBatch,
+	open_chunks: Callable[[], Generator[ProductChunk, None, None]],
+	options: ImportOptions,
+	on_chunk: ChunkCallback | None = None,
+) -> ImportResult:
+	"""
+	Write the chunks of `open_chunks`, opened once the batch is locked, and
+	complete the batch.
+	"""
+	metrics = get_import_metrics()
+	strategy = batch.strategy.value
+	db = get_db()
+	with importing_batch_lock(db, batch):
+		chunks = open_chunks()
+		record_chunk = make_chunk_recorder(metrics, strategy, on_chunk)
+		issues = IssueCollector(options.issue_samples, make_issue_log_path(batch, options))
+		result = "failed"
+		try:
+			with metrics.time_stage("import", strategy):
+				if batch.strategy == ImportStrategy.ATOMIC:
+					imported = write_product_chunks_atomic(db, batch, chunks, issues, record_chunk, metrics, options.atomic_max_issues)
+				else:
+					imported = write_product_chunks_partial(db, batch, chunks, issues, record_chunk, metrics)
+			result = "completed"
+		except ValidationError:
+			result = "rejected"
+			raise
+		except UniqueViolation:
+			db.rollback()
+			raise product_batch_conflict(batch)
+		finally:
+			chunks.close()
+			issues.close()
+			metrics.imports.inc(1, strategy, result)
+
+		report = issues.report()
+		if imported != 0:
+			complete_product_batch(db, batch, imported, report)
+
+	metrics.rows_imported.inc(imported, strategy)
+	return ImportResult(batch=batch, imported=imported, issues=report)
+
+
+def spool_product_chunks(chunks: Iterable[ProductChunk], path: str) -> ValidationError | None:
+	"""
+	Write parsed chunks to `path`, for `iter_spooled_product_chunks` to
+	import them later without parsing again. An error reading the upload
+	is returned, to be raised after the chunks parsed before it.
+	"""
+	with open(path, "wb") as file:
+		try:
+			for chunk in chunks:
+				pickle.dump(chunk, file, protocol=pickle.HIGHEST_PROTOCOL)
+		except ValidationError as err:
+			return err
+	return None
+
+
+def iter_spooled_product_chunks(path: str, error: ValidationError | None = None) -> Generator[ProductChunk, None, None]:
+	with open(path, "rb") as file:
+		while True:
+			try:
+				chunk = pickle.load(file)
+			except EOFError:
+				break
+			yield chunk
+
+	if error is not None:
+		raise error
+
+
+def make_chunk_recorder(metrics: ImportMetrics, strategy: str, on_chunk: ChunkCallback | None) -> ChunkCallback:
+	def record_chunk(chunk: ProductChunk, written: int):
+		metrics.rows.inc(len(chunk.products), strategy, "valid")
+		metrics.rows.inc(len(chunk.issues), strategy, "invalid")
+		metrics.issues.inc(len(chunk.issues), strategy)
+		if on_chunk is not None:
+			on_chunk(chunk, written)
+	return record_chunk
+
+
+def product_batch_conflict(batch: ProductBatch) -> ResourceError:
+	# the same upload is being imported by another request
+	return ResourceError(ResourceErrorType.CONFLICT, ResourceLocation(
+		resource="product_batch",
+		key=batch.idempotency_key or batch.content_hash or str(batch.id),
+		path=None,
+	))
+
+
+def make_issue_log_path(batch: ProductBatch, options: ImportOptions) -> str | None:
+	if options.issue_log_dir is None:
+		return None
+	os.makedirs(options.issue_log_dir, exist_ok=True)
+	prune_issue_logs(options.issue_log_dir, options.issue_retention)
+	return issue_log_path(options.issue_log_dir, str(batch.id))
+
+
+def parse_product_chunks(
+	batch: ProductBatch,
+	file: FileStorage,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	options: ImportOptions,
+	pool: Executor | None,
+	metrics: ImportMetrics | None = None,
+) -> Iterator[ProductChunk]:
+	"""
+	Uploads above `parallel_threshold` bytes are parsed across the process
+	pool, smaller ones and uploads still being received in the calling thread.
+	"""
+	size = upload_size(file.stream) if pool is not None else None
+	if size is not None and size >= options.parallel_threshold:
+		yield from parse_product_chunks_parallel(pool, batch, file, exchange, options, metrics)
+		return
+
+	stream = open_csv_text_stream(file.stream, batch.strategy)
+	yield from parse_product_chunks_serial(stream, batch, exchange, options, metrics)
+
+
+def parse_product_chunks_serial(
+	stream: io.TextIOWrapper,
+	batch: ProductBatch,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	options: ImportOptions,
+	metrics: ImportMetrics | None = None,
+) -> Iterator[ProductChunk]:
+	caches = FieldCaches(options.field_cache_size)
+	try:
+		yield from chunk_product_records(parse_products_csv(stream, caches), batch, exchange, options.chunk_size, metrics)
+	finally:
+		if metrics is not None:
+			metrics.record_field_caches(batch.strategy.value, caches.stats())
+
+
+def parse_product_chunks_parallel(
+	pool: Executor,
+	batch: ProductBatch,
+	file: FileStorage,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	options: ImportOptions,
+	metrics: ImportMetrics | None = None,
+) -> Iterator[ProductChunk]:
+	"""
+	Split the upload into newline aligned byte ranges parsed by the pool,
+	then merge them back in file order with row indexes counted over the
+	whole file. Rows and issues are the same as with the serial parser.
+	"""
+	with spooled_upload_path(file, options.spool_dir) as path, open(path, "rb") as raw:
+		with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			if not can_split_csv(data):
+				# parsed from the spooled copy, the upload stream may already be consumed
+				stream = open_csv_text_stream(raw, batch.strategy)
+				yield from parse_product_chunks_serial(stream, batch, exchange, options, metrics)
+				return
+
+			with translate_csv_errors():
+				header_end = find_record_end(data, 0, 0)
+				header_stream = open_csv_text_stream(io.BytesIO(data[:header_end]), batch.strategy)
+				first_row = next(csv.reader(header_stream, delimiter=';'), None)
+				if first_row is None:
+					return
 
+				if is_product_csv_header(first_row):
+					fieldnames = ProductRowParser.from_header(first_row).fieldnames
+					data_start = header_end
+				else:
+					fieldnames = CSV_FIELDNAMES
+					data_start = 0
+
+				# workers convert the rows they parse, so they need the rate up front
+				rate = resolve_import_exchange_rate(exchange, batch.strategy, metrics)
+				row_size = estimate_row_size(data, data_start)
+				parts = math.ceil((len(data) - data_start) / max(row_size * options.chunk_size, 1))
+				parsed_ranges = iter_parsed_ranges(
+					pool,
+					path,
+					split_csv_ranges(data, data_start, parts),
+					fieldnames,
+					batch,
+					rate,
+					row_size,
+					options.chunk_size * options.parallel_workers * CHUNKS_IN_FLIGHT_PER_WORKER,
+					options.field_cache_size,
+				)
+
+				row_offset = 0
+				for parsed in parsed_ranges:
+					if metrics is not None:
+						metrics.observe_stage("parse", batch.strategy.value, parsed.parse_seconds)
+						metrics.observe_stage("convert", batch.strategy.value, parsed.convert_seconds)
+						metrics.record_field_caches(batch.strategy.value, parsed.cache_stats)
+					range_offset = row_offset
+					row_offset += parsed.row_count
+
+					# ids allocated here, in file order, like the serial parser does
+					parsed.products.assign_ids(ulid_allocator.allocate_bytes(len(parsed.products)) if len(parsed.products) else b"")
+					yield ProductChunk(
+						products=parsed.products,
+						issues=[issue.shift(range_offset) for issue in parsed.issues],
+						row_indexes=array("i", (index + range_offset for index in parsed.row_indexes)),
+					)
+
+
+def upload_size(stream: IO[bytes]) -> int | None:
+	"""
+	Size of the upload, None while it is still being received or when the
+	stream cannot be seeked, like a pipe or a chunked request body.
+	"""
+	if not stream.seekable():
+		return None
+	try:
+		position = stream.tell()
+		size = stream.seek(0, os.SEEK_END)
+	except io.UnsupportedOperation:
+		return None
+	stream.seek(position)
+	return size
+
+
+@contextmanager
+def spooled_upload_path(file: FileStorage, spool_dir: str) -> Iterator[str]:
+	"""
+	Path of the upload on disk, copied to `spool_dir` from its current
+	position unless it already is a file.
+	"""
+	name = getattr(file.stream, "name", None)
+	if isinstance(name, str) and os.path.isfile(name):
+		yield name
+		return
+
+	with tempfile.NamedTemporaryFile(dir=spool_dir, suffix=".csv") as spooled:
+		shutil.copyfileobj(file.stream, spooled)
+		spooled.flush()
+		yield spooled.name
+
+
+class ChunkAction(Enum):
+	WRITE = "write"
+	SKIP = "skip"
+	STOP = "stop"
+
+
+# errors of a COPY caused by the rows it writes
+REJECTED_COPY_ERRORS = (DataError, IntegrityError, OverflowError)
+
+
+class AtomicChunkWriter:
+	"""
+	What an atomic import does with each chunk, shared by the sync and
+	async writers which only run the database statements. Reading stops
+	once `max_issues` issues are found.
+	"""
+	def __init__(
+		self,
+		batch: ProductBatch,
+		issues: IssueCollector,
+		on_chunk: ChunkCallback | None = None,
+		metrics: ImportMetrics | None = None,
+		max_issues: int | None = None,
+	) -> None:
+		self.batch = batch
+		self.issues = issues
+		self.on_chunk = on_chunk
+		self.metrics = metrics
+		self.max_issues = max_issues
+		self.imported = 0
+
+	def accept(self, chunk: ProductChunk) -> ChunkAction:
+		self.issues.add(chunk.issues)
+		if self.max_issues is not None and self.issues.total >= self.max_issues:
+			self.issues.aborted = True
+			self.skipped(chunk)
+			return ChunkAction.STOP
+		# once the batch is known to be rejected, only keep collecting issues
+		if self.issues.total != 0 or len(chunk.products) == 0:
+			self.skipped(chunk)
+			return ChunkAction.SKIP
+		return ChunkAction.WRITE
+
+	def skipped(self, chunk: ProductChunk):
+		if self.on_chunk is not None:
+			self.on_chunk(chunk, 0)
+
+	def written(self, chunk: ProductChunk, started: float):
+		if self.metrics is not None:
+			self.metrics.observe_stage("write", self.batch.strategy.value, perf_counter() - started)
+		self.imported += len(chunk.products)
+		if self.on_chunk is not None:
+			self.on_chunk(chunk, len(chunk.products))
+
+	def finish(self) -> int:
+		"""
+		Called inside the transaction, so a rejection rolls it back.
+		"""
+		if self.issues.total != 0:
+			raise self.issues.rejection_error(str(self.batch.id))
+		return self.imported
+
+
+class PartialChunkWriter:
+	"""
+	What a partial import does with each chunk, shared by the sync and
+	async writers. Every chunk is committed on its own.
+	"""
+	def __init__(
+		self,
+		batch: ProductBatch,
+		issues: IssueCollector,
+		on_chunk: ChunkCallback | None = None,
+		metrics: ImportMetrics | None = None,
+	) -> None:
+		self.batch = batch
+		self.issues = issues
+		self.on_chunk = on_chunk
+		self.metrics = metrics
+		self.imported = 0
+		# a batch only exists once it has products
+		self.batch_inserted = False
+
+	def accept(self, chunk: ProductChunk) -> ChunkAction:
+		self.issues.add(chunk.issues)
+		if len(chunk.products) == 0:
+			if self.on_chunk is not None:
+				self.on_chunk(chunk, 0)
+			return ChunkAction.SKIP
+		return ChunkAction.WRITE
+
+	def written(self, chunk: ProductChunk, written: int, started: float):
+		if self.metrics is not None:
+			self.metrics.observe_stage("write", self.batch.strategy.value, perf_counter() - started)
+			self.metrics.issues.inc(len(chunk.products) - written, self.batch.strategy.value)
+		self.batch_inserted = self.batch_inserted or written != 0
+		self.imported += written
+		if self.on_chunk is not None:
+			self.on_chunk(chunk, written)
+
+	def interrupted(self, err: ValidationError) -> int:
+		"""
+		The upload stopped being readable (a malformed CSV, the decompressed
+		size cap) after chunks were committed. Those rows stay imported and
+		the batch completes as aborted, with the error among its issues.
+		"""
+		if self.imported == 0:
+			raise err
+		for issue in err.issues:
+			self.issues.record(issue)
+		self.issues.aborted = True
+		return self.imported
+
+
+class RejectBisection:
+	"""
+	Slices of a chunk to copy, each under its own savepoint. When the
+	database rejects a slice, the caller reports it with `reject` and the
+	slice is split in halves, down to the single rows at fault, which are
+	recorded as issues.
+	"""
+	def __init__(self, chunk: ProductChunk, issues: IssueCollector) -> None:
+		self.chunk = chunk
+		self.issues = issues
+		self.written = 0
+		self._rejected: Exception | None = None
+
+	def __iter__(self) -> Iterator[ProductColumns]:
+		products = self.chunk.products
+		pending = [(0, len(products))]
+		while len(pending) != 0:
+			start, end = pending.pop()
+			self._rejected = None
+			yield products if end - start == len(products) else products.slice(start, end)
+
+			if self._rejected is None:
+				self.written += end - start
+			elif end - start == 1:
+				self.issues.record(rejected_row_issue(self.chunk.row_indexes[start], self._rejected))
+			else:
+				middle = (start + end) // 2
+				# the first half is popped first, so issues stay in row order
+				pending.append((middle, end))
+				pending.append((start, middle))
+
+	def reject(self, err: Exception):
+		self._rejected = err
+
+
+def write_product_chunks_atomic(
+	db: Connection,
+	batch: ProductBatch,
+	chunks: Iterable[ProductChunk],
+	issues: IssueCollector,
+	on_chunk: ChunkCallback | None = None,
+	metrics: ImportMetrics | None = None,
+	max_issues: int | None = None,
+) -> int:
+	"""
+	All chunks share a single transaction, any issue rolls back the whole batch.
+	"""
+	writer = AtomicChunkWriter(batch, issues, on_chunk, metrics, max_issues)
+
+	with db.transaction():
+		for chunk in chunks:
+			action = writer.accept(chunk)
+			if action == ChunkAction.STOP:
+				break
+			if action == ChunkAction.SKIP:
+				continue
+
+			started = perf_counter()
+			if writer.imported == 0:
+				insert_product_batch(db, batch)
+			copy_products(db, chunk.products)
+			writer.written(chunk, started)
+
+		return writer.finish()
+
+
+def write_product_chunks_partial(
+	db: Connection,
+	batch: ProductBatch,
+	chunks: Iterable[ProductChunk],
+	issues: IssueCollector,
+	on_chunk: ChunkCallback | None = None,
+	metrics: ImportMetrics | None = None,
+) -> int:
+	"""
+	Every chunk is committed on its own, so rows already written stay imported.
+	Rows the database rejects are reported as issues, see `copy_products_isolating_rejects`,
+	and an upload failing midway keeps the rows before it, see `PartialChunkWriter.interrupted`.
+	"""
+	writer = PartialChunkWriter(batch, issues, on_chunk, metrics)
+
+	try:
+		for chunk in chunks:
+			if writer.accept(chunk) == ChunkAction.SKIP:
+				continue
+
+			started = perf_counter()
+			with db.transaction() as transaction:
+				if not writer.batch_inserted:
+					insert_product_batch(db, batch)
+				written = copy_products_isolating_rejects(db, chunk, issues)
+				if written == 0:
+					raise Rollback(transaction)
+			writer.written(chunk, written, started)
+	except ValidationError as err:
+		return writer.interrupted(err)
+
+	return writer.imported
+
+
+def copy_products_isolating_rejects(db: Connection, chunk: ProductChunk, issues: IssueCollector) -> int:
+	"""
+	Copy the products of a chunk under savepoints, isolating the rows the
+	database rejects, see `RejectBisection`. Returns the number of products written.
+	"""
+	bisection = RejectBisection(chunk, issues)
+	for products in bisection:
+		try:
+			with db.transaction():
+				copy_products(db, products)
+		except REJECTED_COPY_ERRORS as err:
+			bisection.reject(err)
+	return bisection.written
+
+
+def rejected_row_issue(row_index: int, err: Exception) -> ValidationIssue:
+	if isinstance(err, OverflowError):
+		# raised while encoding the COPY row, before reaching the database
+		reason = "a value is out of the BIGINT range"
+	else:
+		reason = err.diag.message_primary or str(err)
+	return ValidationIssue(
+		message=f"Row index {row_index} was rejected by the database: {reason}",
+		path=f"$.row.{row_index}",
+		type="rejected",
+	)
+
+
+PRODUCT_COPY_COLUMNS = ("id", "batch_id", "name", "expiration", "price_usd", "price_eur", "price_jpy", "price_brl", "price_btc")
+PRODUCT_COPY_TYPES = ("text", "text", "text", "timestamp", "int8", "int8", "int8", "int8", "int8")
+COPY_PRODUCTS = f"COPY products ({', '.join(PRODUCT_COPY_COLUMNS)}) FROM STDIN (FORMAT BINARY)"
+
+# statements run by every import are executed with prepare=True, so each
+# pooled connection prepares them once; products go through COPY instead
+INSERT_PRODUCT_BATCH = "INSERT INTO product_batchs (id, strategy, filename, content_hash, idempotency_key) VALUES (%s, %s, %s, %s, %s)"
+COMPLETE_PRODUCT_BATCH = "UPDATE product_batchs SET imported = %s, issues = %s WHERE id = %s"
+DELETE_BATCH_PRODUCTS = "DELETE FROM products WHERE batch_id = %s"
+DELETE_PRODUCT_BATCH = "DELETE FROM product_batchs WHERE id = %s"
+# advisory lock keyed on the batch id, held by the connection importing it
+LOCK_IMPORTING_BATCH = "SELECT pg_advisory_lock(hashtextextended(%s, 0))"
+UNLOCK_IMPORTING_BATCH = "SELECT pg_advisory_unlock(hashtextextended(%s, 0))"
+TRY_LOCK_IMPORTING_BATCH = "SELECT pg_try_advisory_xact_lock(hashtextextended(%s, 0))"
 
 def save_products_batch(batch: ProductBatch, products: List[Product]):
 	if len(products) == 0:
 		return
-	
-	sql = "INSERT INTO products (id, batch_id, name, expiration, price_usd, price_eur, price_jpy, price_brl, price_btc) VALUES"
-	pvalues = []
-	for n, product in enumerate(products, start=1):
-		sql += " (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
-		sql += ", " if n != len(products) else ""
-		pvalues.append(str(product.id))
-		pvalues.append(None if product.batch_id == None else str(product.batch_id))
-		pvalues.append(product.name)
-		pvalues.append(product.expiration)
-		pvalues.append(product.prices.usd.amount)
-		pvalues.append(product.prices.eur.amount)
-		pvalues.append(product.prices.jpy.amount)
-		pvalues.append(product.prices.brl.amount)
-		pvalues.append(product.prices.btc.amount)
 
 	db = get_db()
 	with db.transaction():
-		db.execute(
-			"INSERT INTO product_batchs (id, strategy, filename) VALUES (%s, %s, %s)",
-			[str(batch.id), batch.strategy.value, batch.filename]
+		insert_product_batch(db, batch)
+		copy_products(db, products)
+
+
+def delete_product_batch(db: Connection, batch_id: ULID):
+	with db.transaction():
+		db.execute(DELETE_BATCH_PRODUCTS, [str(batch_id)])
+		db.execute(DELETE_PRODUCT_BATCH, [str(batch_id)])
+
+
+@contextmanager
+def importing_batch_lock(db: Connection, batch: ProductBatch) -> Iterator[None]:
+	"""
+	Hold the advisory lock of the batch while it is imported, so a batch
+	left unfinished is only discarded once no connection imports it. The
+	session lock outlives the transactions of the import, and is released
+	by the server if the connection is lost.
+	"""
+	with db.transaction():
+		db.execute(LOCK_IMPORTING_BATCH, [str(batch.id)])
+	try:
+		yield
+	finally:
+		if not db.broken:
+			with db.transaction():
+				db.execute(UNLOCK_IMPORTING_BATCH, [str(batch.id)])
+
+
+def insert_product_batch(db: Connection, batch: ProductBatch):
+	db.execute(INSERT_PRODUCT_BATCH, product_batch_params(batch), prepare=True)
+
+
+def product_batch_params(batch: ProductBatch) -> list:
+	return [str(batch.id), batch.strategy.value, batch.filename, batch.content_hash, batch.idempotency_key]
+
+
+def complete_product_batch(db: Connection, batch: ProductBatch, imported: int, issues: IssueReport):
+	"""
+	Store the result of an import, so a repeated upload can be answered from it.
+	"""
+	with db.transaction():
+		db.execute(COMPLETE_PRODUCT_BATCH, [imported, Jsonb(issues.to_dict()), str(batch.id)], prepare=True)
+
+
+def copy_products(db: Connection, products: Iterable[Product] | ProductColumns):
+	"""
+	Write products with a binary COPY, which has no bind-parameter limit
+	and skips the server-side parsing of a huge VALUES statement.
+	"""
+	with db.cursor() as cursor:
+		with cursor.copy(COPY_PRODUCTS) as copy:
+			copy.set_types(PRODUCT_COPY_TYPES)
+			for row in products_copy_rows(products):
+				copy.write_row(row)
+
+
+def products_copy_rows(products: Iterable[Product] | ProductColumns) -> Iterator[tuple]:
+	if isinstance(products, ProductColumns):
+		return product_columns_copy_rows(products)
+	return map(product_copy_row, products)
+
+
+def product_copy_row(product: Product) -> tuple:
+	expiration = product.expiration
+	if not isinstance(expiration, datetime):
+		# binary timestamp fields require a datetime, parsed dates have no time part
+		expiration = datetime.combine(expiration, time())
+
+	return (
+		str(product.id),
+		None if product.batch_id is None else str(product.batch_id),
+		product.name,
+		expiration,
+		product.prices.usd.amount,
+		product.prices.eur.amount,
+		product.prices.jpy.amount,
+		product.prices.brl.amount,
+		product.prices.btc.amount,
+	)
+
+
+def product_columns_copy_rows(columns: ProductColumns) -> Iterator[tuple]:
+	batch_id = None if columns.batch_id is None else str(columns.batch_id)
+	ids = columns.ids
+	for n in range(len(columns)):
+		yield (
+			encode_ulid(int.from_bytes(ids[n * ULID_SIZE:(n + 1) * ULID_SIZE])),
+			batch_id,
+			columns.names[n],
+			datetime.fromordinal(columns.expirations[n]),
+			columns.usd[n],
+			columns.eur[n],
+			columns.jpy[n],
+			columns.brl[n],
+			columns.btc[n],
 		)
-		db.execute(sql, pvalues)
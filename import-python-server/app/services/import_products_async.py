@@ -0,0 +1,205 @@
+"""
+Async counterparts of the database side of `import_products`, used by the
+async server. Parsing and conversion stay synchronous and run in a
+producer thread, or in the parse pool for it, so the event loop only
+awaits chunks and database I/O. What to write is decided by the chunk
+writers of `import_products`, shared with the sync pipeline.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import Executor
+from time import perf_counter
+from typing import AsyncIterator, Iterable
+from psycopg import AsyncConnection, Rollback
+from psycopg.errors import UniqueViolation
+from psycopg.types.json import Jsonb
+from ulid import ULID
+from werkzeug.datastructures import FileStorage
+
+from .import_products import (
+	COMPLETE_PRODUCT_BATCH,
+	COPY_PRODUCTS,
+	DELETE_BATCH_PRODUCTS,
+	DELETE_PRODUCT_BATCH,
+	INSERT_PRODUCT_BATCH,
+	LOCK_IMPORTING_BATCH,
+	PRODUCT_COPY_TYPES,
+	REJECTED_COPY_ERRORS,
+	UNLOCK_IMPORTING_BATCH,
+	AtomicChunkWriter,
+	ChunkAction,
+	ChunkCallback,
+	ImportOptions,
+	ImportResult,
+	PartialChunkWriter,
+	ProductChunk,
+	RejectBisection,
+	make_chunk_recorder,
+	make_issue_log_path,
+	parse_product_chunks,
+	product_batch_conflict,
+	product_batch_params,
+	products_copy_rows,
+	upload_size,
+)
+from .issue_report import IssueCollector, IssueReport
+from .metrics import ImportMetrics
+from .pipeline import aiter_in_background
+from .type_parser import ImportStrategy
+from ..entities.product import Product, ProductBatch
+from ..entities.product_columns import ProductColumns
+from ..errors.validation import ValidationError
+from ..services.exchange import DeferredExchangeRate, ExchangeRate
+
+
+async def import_products_csv_file_async(
+	db: AsyncConnection,
+	batch: ProductBatch,
+	file: FileStorage,
+	exchange: ExchangeRate | DeferredExchangeRate,
+	options: ImportOptions,
+	parse_pool: Executor | None,
+	metrics: ImportMetrics,
+) -> ImportResult:
+	"""
+	Same pipeline as `import_products_csv_file`, writing with `db` while
+	the next chunks are parsed in a producer thread.
+	"""
+	strategy = batch.strategy.value
+	size = upload_size(file.stream)
+	if size is not None:
+		metrics.bytes.inc(size, strategy)
+
+	async with importing_batch_lock_async(db, batch):
+		chunks = aiter_in_background(
+			parse_product_chunks(batch, file, exchange, options, parse_pool, metrics),
+			options.queue_size,
+			name="import-parser",
+		)
+
+		record_chunk = make_chunk_recorder(metrics, strategy, None)
+		issues = IssueCollector(options.issue_samples, await asyncio.to_thread(make_issue_log_path, batch, options))
+		result = "failed"
+		try:
+			with metrics.time_stage("import", strategy):
+				if batch.strategy == ImportStrategy.ATOMIC:
+					imported = await write_product_chunks_atomic_async(db, batch, chunks, issues, record_chunk, metrics, options.atomic_max_issues)
+				else:
+					imported = await write_product_chunks_partial_async(db, batch, chunks, issues, record_chunk, metrics)
+			result = "completed"
+		except ValidationError:
+			result = "rejected"
+			raise
+		except UniqueViolation:
+			await db.rollback()
+			raise product_batch_conflict(batch)
+		finally:
+			await chunks.aclose()
+			issues.close()
+			metrics.imports.inc(1, strategy, result)
+
+		report = issues.report()
+		if imported != 0:
+			await complete_product_batch_async(db, batch, imported, report)
+
+	metrics.rows_imported.inc(imported, strategy)
+	return ImportResult(batch=batch, imported=imported, issues=report)
+
+
+async def write_product_chunks_atomic_async(
+	db: AsyncConnection,
+	batch: ProductBatch,
+	chunks: AsyncIterator[ProductChunk],
+	issues: IssueCollector,
+	on_chunk: ChunkCallback | None = None,
+	metrics: ImportMetrics | None = None,
+	max_issues: int | None = None,
+) -> int:
+	writer = AtomicChunkWriter(batch, issues, on_chunk, metrics, max_issues)
+
+	async with db.transaction():
+		async for chunk in chunks:
+			action = writer.accept(chunk)
+			if action == ChunkAction.STOP:
+				break
+			if action == ChunkAction.SKIP:
+				continue
+
+			started = perf_counter()
+			if writer.imported == 0:
+				await db.execute(INSERT_PRODUCT_BATCH, product_batch_params(batch), prepare=True)
+			await copy_products_async(db, chunk.products)
+			writer.written(chunk, started)
+
+		return writer.finish()
+
+
+async def write_product_chunks_partial_async(
+	db: AsyncConnection,
+	batch: ProductBatch,
+	chunks: AsyncIterator[ProductChunk],
+	issues: IssueCollector,
+	on_chunk: ChunkCallback | None = None,
+	metrics: ImportMetrics | None = None,
+) -> int:
+	writer = PartialChunkWriter(batch, issues, on_chunk, metrics)
+
+	try:
+		async for chunk in chunks:
+			if writer.accept(chunk) == ChunkAction.SKIP:
+				continue
+
+			started = perf_counter()
+			async with db.transaction() as transaction:
+				if not writer.batch_inserted:
+					await db.execute(INSERT_PRODUCT_BATCH, product_batch_params(batch), prepare=True)
+				written = await copy_products_isolating_rejects_async(db, chunk, issues)
+				if written == 0:
+					raise Rollback(transaction)
+			writer.written(chunk, written, started)
+	except ValidationError as err:
+		return writer.interrupted(err)
+
+	return writer.imported
+
+
+async def copy_products_isolating_rejects_async(db: AsyncConnection, chunk: ProductChunk, issues: IssueCollector) -> int:
+	bisection = RejectBisection(chunk, issues)
+	for products in bisection:
+		try:
+			async with db.transaction():
+				await copy_products_async(db, products)
+		except REJECTED_COPY_ERRORS as err:
+			bisection.reject(err)
+	return bisection.written
+
+
+async def copy_products_async(db: AsyncConnection, products: Iterable[Product] | ProductColumns):
+	async with db.cursor() as cursor:
+		async with cursor.copy(COPY_PRODUCTS) as copy:
+			copy.set_types(PRODUCT_COPY_TYPES)
+			for row in products_copy_rows(products):
+				await copy.write_row(row)
+
+
+@asynccontextmanager
+async def importing_batch_lock_async(db: AsyncConnection, batch: ProductBatch) -> AsyncIterator[None]:
+	async with db.transaction():
+		await db.execute(LOCK_IMPORTING_BATCH, [str(batch.id)])
+	try:
+		yield
+	finally:
+		if not db.broken:
+			async with db.transaction():
+				await db.execute(UNLOCK_IMPORTING_BATCH, [str(batch.id)])
+
+
+async def complete_product_batch_async(db: AsyncConnection, batch: ProductBatch, imported: int, issues: IssueReport):
+	async with db.transaction():
+		await db.execute(COMPLETE_PRODUCT_BATCH, [imported, Jsonb(issues.to_dict()), str(batch.id)], prepare=True)
+
+
+async def delete_product_batch_async(db: AsyncConnection, batch_id: ULID):
+	async with db.transaction():
+		await db.execute(DELETE_BATCH_PRODUCTS, [str(batch_id)])
+		await db.execute(DELETE_PRODUCT_BATCH, [str(batch_id)])
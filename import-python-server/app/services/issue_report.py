@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import IO, Dict, Iterable, Iterator, List
+
+from .product_parser import RowIssue
+from ..errors.app_error import HttpErrorObject
+from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
+
+# column reported for rows that failed without a specific cell
+ROW_ISSUE_COLUMN = "row"
+
+
+@dataclass(frozen=True)
+class IssueReport:
+	"""
+	Bounded summary of the issues of an import: counts by type and column
+	and the first issues found.
+	"""
+	total: int = 0
+	by_type: Dict[str, int] = field(default_factory=dict)
+	by_column: Dict[str, int] = field(default_factory=dict)
+	samples: List[ValidationIssue] = field(default_factory=list)
+	# the import stopped reading the upload, `total` only counts the rows read
+	aborted: bool = False
+
+	@property
+	def truncated(self) -> bool:
+		return self.total > len(self.samples)
+
+	def summary_dict(self):
+		return {
+			"total": self.total,
+			"by_type": self.by_type,
+			"by_column": self.by_column,
+			"truncated": self.truncated,
+			"aborted": self.aborted,
+		}
+
+	def to_dict(self):
+		return {**self.summary_dict(), "samples": [asdict(issue) for issue in self.samples]}
+
+	@classmethod
+	def from_dict(cls, data) -> "IssueReport":
+		return cls(
+			total=data["total"],
+			by_type=data["by_type"],
+			by_column=data["by_column"],
+			samples=[ValidationIssue(**issue) for issue in data["samples"]],
+			aborted=data.get("aborted", False),
+		)
+
+
+class ImportRejectedError(ValidationError):
+	"""
+	Validation error of a rejected import, with the summary of all its
+	issues next to the sampled ones.
+	"""
+	def __init__(self, report: IssueReport, batch_id: str, logged: bool = False) -> None:
+		super().__init__(RequestSegment.MULTIPART_FILE, report.samples)
+		self.report = report
+		self.batch_id = batch_id
+		# every issue was written to the issue log of the batch
+		self.logged = logged
+		# set by the route, where the issue log is served
+		self.issues_url: str | None = None
+
+	def http_error_object(self) -> HttpErrorObject:
+		error = {**super().http_error_object(), "batch_id": self.batch_id, "issue_summary": self.report.summary_dict()}
+		if self.issues_url is not None:
+			error["issues_url"] = self.issues_url
+		return error
+
+
+class IssueCollector:
+	"""
+	Aggregates row issues while keeping at most `max_samples` of them in
+	memory. With a `log_path`, every issue is also appended to an NDJSON
+	file, created on the first issue.
+	"""
+	def __init__(self, max_samples: int, log_path: str | None = None) -> None:
+		self.max_samples = max_samples
+		self.log_path = log_path
+		self.total = 0
+		self.by_type: Dict[str, int] = {}
+		self.by_column: Dict[str, int] = {}
+		self.samples: List[ValidationIssue] = []
+		self.aborted = False
+		self._log: IO[str] | None = None
+
+	def add(self, issues: Iterable[RowIssue]):
+		for issue in issues:
+			self.record(issue.to_validation_issue(), issue.column or ROW_ISSUE_COLUMN)
+
+	def record(self, issue: ValidationIssue, column: str = ROW_ISSUE_COLUMN):
+		self.total += 1
+		self.by_column[column] = self.by_column.get(column, 0) + 1
+		self.by_type[issue.type] = self.by_type.get(issue.type, 0) + 1
+		if len(self.samples) < self.max_samples:
+			self.samples.append(issue)
+
+		if self.log_path is not None:
+			if self._log is None:
+				self._log = open(self.log_path, "w", encoding="utf-8")
+			self._log.write(json.dumps(asdict(issue)))
+			self._log.write("\n")
+
+	def report(self) -> IssueReport:
+		return IssueReport(
+			total=self.total,
+			by_type=dict(self.by_type),
+			by_column=dict(self.by_column),
+			samples=list(self.samples),
+			aborted=self.aborted,
+		)
+
+	def rejection_error(self, batch_id: str) -> ImportRejectedError:
+		return ImportRejectedError(self.report(), batch_id, logged=self.log_path is not None)
+
+	def close(self):
+		if self._log is not None:
+			self._log.close()
+			self._log = None
+
+
+def issue_log_path(issue_dir: str, batch_id: str) -> str:
+	return os.path.join(issue_dir, f"{batch_id}.ndjson")
+
+
+def prune_issue_logs(issue_dir: str, max_age: float):
+	"""
+	Remove issue logs older than `max_age` seconds.
+	"""
+	oldest = time.time() - max_age
+	with os.scandir(issue_dir) as entries:
+		for entry in entries:
+			if entry.name.endswith(".ndjson") and entry.stat().st_mtime < oldest:
+				try:
+					os.remove(entry.path)
+				except FileNotFoundError:
+					pass
+
+
+def iter_issue_log(path: str, block_size: int = 64 * 1024) -> Iterator[bytes]:
+	with open(path, "rb") as file:
+		for block in iter(lambda: file.read(block_size), b""):
+			yield block
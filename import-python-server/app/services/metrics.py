@@ -0,0 +1,239 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# seconds, from a single small chunk up to a multi-million row import
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label_value(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+	if len(names) == 0:
+		return ""
+	pairs = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values))
+	return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+	if float(value).is_integer():
+		return str(int(value))
+	return repr(float(value))
+
+
+class Metric:
+	"""
+	A metric family in the Prometheus text exposition format.
+	"""
+	kind = "untyped"
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+
+	def samples(self) -> Iterator[str]:
+		raise NotImplementedError
+
+	def render(self) -> Iterator[str]:
+		yield f"# HELP {self.name} {self.help}"
+		yield f"# TYPE {self.name} {self.kind}"
+		yield from self.samples()
+
+
+class Counter(Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+		super().__init__(name, help, labelnames)
+		self._values: Dict[LabelValues, float] = {}
+
+	def inc(self, amount: float = 1, *labels: str):
+		with self._lock:
+			self._values[labels] = self._values.get(labels, 0) + amount
+
+	def value(self, *labels: str) -> float:
+		with self._lock:
+			return self._values.get(labels, 0)
+
+	def samples(self) -> Iterator[str]:
+		with self._lock:
+			values = sorted(self._values.items())
+		for labels, value in values:
+			yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+
+class Histogram(Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS) -> None:
+		super().__init__(name, help, labelnames)
+		self.buckets = tuple(sorted(buckets))
+		# per label set: count of each bucket (not cumulative) plus +Inf, then sum
+		self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value: float, *labels: str):
+		index = bisect_left(self.buckets, value)
+		with self._lock:
+			entry = self._values.get(labels)
+			if entry is None:
+				entry = ([0] * (len(self.buckets) + 1), [0.0])
+				self._values[labels] = entry
+			entry[0][index] += 1
+			entry[1][0] += value
+
+	@contextmanager
+	def time(self, *labels: str) -> Iterator[None]:
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - start, *labels)
+
+	def count(self, *labels: str) -> int:
+		with self._lock:
+			entry = self._values.get(labels)
+			return 0 if entry is None else sum(entry[0])
+
+	def samples(self) -> Iterator[str]:
+		with self._lock:
+			values = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._values.items())
+
+		bucket_names = self.labelnames + ("le",)
+		for labels, (counts, total) in values:
+			cumulative = 0
+			for bound, count in zip(self.buckets + (math.inf,), counts):
+				cumulative += count
+				yield f"{self.name}_bucket{format_labels(bucket_names, labels + (format_value(bound),))} {cumulative}"
+			yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}"
+			yield f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class GaugeFunction(Metric):
+	"""
+	Gauge read when the metrics are collected, `collect` returns the
+	label values and value of every sample.
+	"""
+	kind = "gauge"
+
+	def __init__(
+		self,
+		name: str,
+		help: str,
+		labelnames: Sequence[str],
+		collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+	) -> None:
+		super().__init__(name, help, labelnames)
+		self.collect = collect
+
+	def samples(self) -> Iterator[str]:
+		for labels, value in self.collect():
+			yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+
+class CounterFunction(GaugeFunction):
+	"""
+	Counter read when the metrics are collected, for totals kept by
+	another component, like the statistics of a connection pool.
+	"""
+	kind = "counter"
+
+
+class MetricsRegistry:
+	def __init__(self) -> None:
+		self._metrics: Dict[str, Metric] = {}
+		self._lock = threading.Lock()
+
+	def register(self, metric: Metric) -> Metric:
+		with self._lock:
+			if metric.name in self._metrics:
+				raise ValueError(f"metric {metric.name} is already registered")
+			self._metrics[metric.name] = metric
+		return metric
+
+	def render(self) -> str:
+		with self._lock:
+			metrics = list(self._metrics.values())
+		lines: List[str] = []
+		for metric in metrics:
+			lines.extend(metric.render())
+		return "\n".join(lines) + "\n"
+
+
+class ImportMetrics:
+	"""
+	Import pipeline metrics. Stages are observed once per chunk, never per
+	row, so the hot loops only pay for a couple of clock reads per chunk.
+	"""
+	def __init__(self, registry: MetricsRegistry) -> None:
+		self.stage_seconds: Histogram = registry.register(Histogram(
+			"product_import_stage_seconds",
+			"Time spent in each import stage, per chunk for parse, convert and write.",
+			("stage", "strategy"),
+		))
+		self.rows: Counter = registry.register(Counter(
+			"product_import_rows_total",
+			"Rows read from uploads, valid or invalid.",
+			("strategy", "outcome"),
+		))
+		self.rows_imported: Counter = registry.register(Counter(
+			"product_import_rows_imported_total",
+			"Rows written to the database by completed imports.",
+			("strategy",),
+		))
+		self.bytes: Counter = registry.register(Counter(
+			"product_import_bytes_total",
+			"Size of the uploaded CSV files.",
+			("strategy",),
+		))
+		self.issues: Counter = registry.register(Counter(
+			"product_import_issues_total",
+			"Validation issues found in uploads.",
+			("strategy",),
+		))
+		self.imports: Counter = registry.register(Counter(
+			"product_imports_total",
+			"Finished imports, by result.",
+			("strategy", "result"),
+		))
+		self.admission_wait: Histogram = registry.register(Histogram(
+			"product_import_admission_wait_seconds",
+			"Time import requests waited for admission, by whether they were admitted or timed out.",
+			("result",),
+		))
+		self.admission_rejected: Counter = registry.register(Counter(
+			"product_import_admission_rejected_total",
+			"Import requests shed by admission control, because the queue was full or their wait timed out.",
+			("reason",),
+		))
+		self.field_cache: Counter = registry.register(Counter(
+			"product_import_field_cache_lookups_total",
+			"Parsed cell lookups in the per-import field caches, the hit rate being hits over all lookups.",
+			("strategy", "field", "result"),
+		))
+
+	def observe_stage(self, stage: str, strategy: str, seconds: float):
+		self.stage_seconds.observe(seconds, stage, strategy)
+
+	def time_stage(self, stage: str, strategy: str):
+		return self.stage_seconds.time(stage, strategy)
+
+	def record_field_caches(self, strategy: str, stats: Mapping[str, Tuple[int, int]]):
+		"""
+		Add the `(hits, misses)` of each field cache of a parser.
+		"""
+		for field, (hits, misses) in stats.items():
+			self.field_cache.inc(hits, strategy, field, "hit")
+			self.field_cache.inc(misses, strategy, field, "miss")
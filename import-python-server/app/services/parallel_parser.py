@@ -0,0 +1,194 @@
+import csv
+import io
+import math
+import mmap
+import re
+import time
+from array import array
+from concurrent.futures import Executor, Future
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, List, Sequence, Tuple
+
+from .currency import get_currency_converter
+from .exchange import ExchangeRate
+from .product_parser import FieldCaches, FieldCacheStats, ProductFields, ProductRowParser, RowIssue, collect_product_columns
+from ..entities.product import ImportStrategy, ProductBatch
+from ..entities.product_columns import ProductColumns
+
+# a quoted field, opened at the start of a field and closed right before a delimiter
+QUOTED_FIELD_PATTERN = re.compile(rb'(?:\A|(?<=[;\n]))"(?:[^"]|"")*"(?=[;\r\n]|\Z)')
+
+# bytes sampled to size the ranges, so that each one holds about a chunk of rows
+ROW_SIZE_SAMPLE = 64 * 1024
+
+# chunks of rows parsed ahead per worker, bounding the parsed rows held by the parent
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+
+@dataclass(frozen=True)
+class ParsedRange:
+	"""
+	Products parsed from a byte range of about one chunk, as columns whose
+	ids are assigned by the parent, with row indexes local to the range.
+	"""
+	products: ProductColumns
+	row_indexes: array
+	issues: List[RowIssue]
+	row_count: int
+	parse_seconds: float
+	convert_seconds: float
+	cache_stats: Dict[str, FieldCacheStats]
+
+
+def can_split_csv(data: mmap.mmap) -> bool:
+	"""
+	Splitting on newlines with an even quote count is only exact when every
+	quote belongs to a well-formed quoted field. A stray quote inside an
+	unquoted field (`5" screen`) is literal to the csv module.
+	"""
+	quotes = data.find(b'"')
+	if quotes == -1:
+		return True
+
+	quoted = 0
+	for match in QUOTED_FIELD_PATTERN.finditer(data, quotes):
+		quoted += match.group().count(b'"')
+	return quoted == count_quotes(data, 0, len(data))
+
+
+def count_quotes(data: mmap.mmap, start: int, end: int) -> int:
+	return data[start:end].count(b'"')
+
+
+def find_record_end(data: mmap.mmap, start: int, position: int) -> int:
+	"""
+	Offset right after the first newline at or past `position` that is not
+	inside a quoted field, `start` being the start of a record.
+	"""
+	quotes = count_quotes(data, start, position)
+	while True:
+		newline = data.find(b"\n", position)
+		if newline == -1:
+			return len(data)
+
+		quotes += count_quotes(data, position, newline)
+		if quotes % 2 == 0:
+			return newline + 1
+		position = newline + 1
+
+
+def split_csv_ranges(data: mmap.mmap, start: int, parts: int) -> List[Tuple[int, int]]:
+	"""
+	Split `data[start:]` in about `parts` byte ranges, each holding whole records.
+	"""
+	end = len(data)
+	ranges: List[Tuple[int, int]] = []
+	range_start = start
+
+	for n in range(1, parts):
+		target = start + (end - start) * n // parts
+		if target <= range_start:
+			continue
+
+		range_end = find_record_end(data, range_start, target)
+		if range_end >= end:
+			break
+		ranges.append((range_start, range_end))
+		range_start = range_end
+
+	if range_start < end:
+		ranges.append((range_start, end))
+	return ranges
+
+
+def estimate_row_size(data: mmap.mmap, start: int) -> float:
+	"""
+	Average bytes per row over the first `ROW_SIZE_SAMPLE` bytes of `data[start:]`.
+	"""
+	sample = data[start:start + ROW_SIZE_SAMPLE]
+	return len(sample) / max(sample.count(b"\n"), 1)
+
+
+def parse_csv_range(
+	path: str,
+	start: int,
+	end: int,
+	fieldnames: Sequence[str],
+	batch: ProductBatch,
+	exchange: ExchangeRate,
+	cache_size: int,
+) -> ParsedRange:
+	"""
+	Worker task, parse and convert the rows of a byte range of the upload.
+	Field caches live as long as the task, as workers are shared by imports.
+	"""
+	started = time.perf_counter()
+	with open(path, "rb") as file:
+		file.seek(start)
+		data = file.read(end - start)
+
+	error_strategy = "strict" if batch.strategy == ImportStrategy.ATOMIC else "replace"
+	stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors=error_strategy)
+	parser = ProductRowParser(fieldnames, FieldCaches(cache_size))
+	rows: List[ProductFields] = []
+	issues: List[RowIssue] = []
+
+	for row in csv.reader(stream, delimiter=';'):
+		record = parser.parse_next(row)
+		if record is None:
+			continue
+		if isinstance(record, RowIssue):
+			issues.append(record)
+		else:
+			rows.append(record)
+
+	parsed = time.perf_counter()
+	prices = get_currency_converter(exchange).convert_column([row.usd for row in rows])
+	return ParsedRange(
+		products=collect_product_columns(rows, prices, batch),
+		row_indexes=array("i", (row.row_index for row in rows)),
+		issues=issues,
+		row_count=parser.row_count,
+		parse_seconds=parsed - started,
+		convert_seconds=time.perf_counter() - parsed,
+		cache_stats=parser.caches.stats(),
+	)
+
+
+def iter_parsed_ranges(
+	executor: Executor,
+	path: str,
+	ranges: Sequence[Tuple[int, int]],
+	fieldnames: Sequence[str],
+	batch: ProductBatch,
+	exchange: ExchangeRate,
+	row_size: float,
+	max_rows: int,
+	cache_size: int,
+) -> Iterator[ParsedRange]:
+	"""
+	Parse ranges in the pool, yielding them in file order. Ranges are
+	submitted while the rows in flight, estimated from `row_size` bytes per
+	row, stay within `max_rows`, so memory does not grow with the upload.
+	"""
+	pending: Deque[Tuple[Future, int]] = deque()
+	in_flight = 0
+
+	try:
+		for start, end in ranges:
+			rows = math.ceil((end - start) / row_size)
+			while len(pending) != 0 and in_flight + rows > max_rows:
+				future, done_rows = pending.popleft()
+				in_flight -= done_rows
+				yield future.result()
+
+			future = executor.submit(parse_csv_range, path, start, end, fieldnames, batch, exchange, cache_size)
+			pending.append((future, rows))
+			in_flight += rows
+
+		while pending:
+			yield pending.popleft()[0].result()
+	finally:
+		for future, _ in pending:
+			future.cancel()
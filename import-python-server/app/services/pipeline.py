@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from queue import Queue, Full
+from typing import AsyncIterator, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+PUT_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+	def __init__(self, error: BaseException) -> None:
+		self.error = error
+
+
+_DONE = object()
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+	if size < 1:
+		raise ValueError("size must be >= 1")
+
+	chunk: List[T] = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) == size:
+			yield chunk
+			chunk = []
+
+	if chunk:
+		yield chunk
+
+
+def iter_in_background(iterable: Iterable[T], maxsize: int, *, name: str = "pipeline-stage") -> Iterator[T]:
+	"""
+	Run an iterable in a producer thread, handing items over through a bounded
+	queue so the producer never gets more than `maxsize` items ahead.
+	Exceptions raised by the producer are re-raised in the consumer.
+	"""
+	queue: Queue = Queue(maxsize=maxsize)
+	stop = threading.Event()
+
+	def put(item) -> bool:
+		while not stop.is_set():
+			try:
+				queue.put(item, timeout=PUT_POLL_INTERVAL)
+				return True
+			except Full:
+				continue
+		return False
+
+	def produce():
+		iterator = iter(iterable)
+		try:
+			for item in iterator:
+				if not put(item):
+					return
+			put(_DONE)
+		except BaseException as err:
+			put(_Failure(err))
+		finally:
+			close = getattr(iterator, "close", None)
+			if close is not None:
+				close()
+
+	thread = threading.Thread(target=produce, name=name, daemon=True)
+	thread.start()
+
+	try:
+		while True:
+			item = queue.get()
+			if item is _DONE:
+				return
+			if isinstance(item, _Failure):
+				raise item.error
+			yield item
+	finally:
+		stop.set()
+		thread.join()
+
+
+async def aiter_in_background(iterable: Iterable[T], maxsize: int, *, name: str = "pipeline-stage") -> AsyncIterator[T]:
+	"""
+	Async counterpart of `iter_in_background`, the producer thread hands
+	items over to the running event loop, which is never blocked by it.
+	"""
+	loop = asyncio.get_running_loop()
+	queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+	stop = threading.Event()
+
+	def put(item) -> bool:
+		future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+		while not stop.is_set():
+			try:
+				future.result(timeout=PUT_POLL_INTERVAL)
+				return True
+			except FutureTimeoutError:
+				continue
+		future.cancel()
+		return False
+
+	def produce():
+		iterator = iter(iterable)
+		try:
+			for item in iterator:
+				if not put(item):
+					return
+			put(_DONE)
+		except BaseException as err:
+			put(_Failure(err))
+		finally:
+			close = getattr(iterator, "close", None)
+			if close is not None:
+				close()
+
+	thread = threading.Thread(target=produce, name=name, daemon=True)
+	thread.start()
+
+	try:
+		while True:
+			item = await queue.get()
+			if item is _DONE:
+				return
+			if isinstance(item, _Failure):
+				raise item.error
+			yield item
+	finally:
+		stop.set()
+		await asyncio.to_thread(thread.join)
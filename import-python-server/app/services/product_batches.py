@@ -0,0 +1,276 @@
+from typing import Iterator, List
+from psycopg import AsyncConnection, Connection
+from ulid import ULID
+
+from .import_products import DELETE_PRODUCT_BATCH, PRODUCT_COPY_COLUMNS, TRY_LOCK_IMPORTING_BATCH, ImportResult, delete_product_batch
+from .import_products_async import delete_product_batch_async
+from .currency import BRL_UNIT, BTC_UNIT, EUR_UNIT, JPY_UNIT, USD_UNIT
+from .import_jobs import ImportJob
+from .issue_report import IssueReport
+from ..entities.product import CurrencyCode, ExportFormat, ImportStrategy, PreciseNumber, ProductBatch, ProductBatchSummary
+from ..errors.resource import ResourceError, ResourceErrorType, ResourceLocation
+
+PRODUCT_BATCH_COLUMNS = "id, created, strategy, filename, content_hash, idempotency_key, imported, issues, EXTRACT(EPOCH FROM now() - created)"
+
+SELECT_BATCH_BY_KEY = f"SELECT {PRODUCT_BATCH_COLUMNS} FROM product_batchs WHERE idempotency_key = %s"
+SELECT_BATCH_BY_HASH = f"SELECT {PRODUCT_BATCH_COLUMNS} FROM product_batchs WHERE content_hash = %s AND strategy = %s"
+SELECT_BATCH_BY_ID = f"SELECT {PRODUCT_BATCH_COLUMNS} FROM product_batchs WHERE id = %s"
+SELECT_BATCH_EXISTS = "SELECT 1 FROM product_batchs WHERE id = %s"
+SELECT_BATCH_SUMMARY = """
+	SELECT count(*), sum(price_usd), sum(price_eur), sum(price_jpy), sum(price_brl), sum(price_btc), min(expiration), max(expiration)
+	FROM products WHERE batch_id = %s
+"""
+# a bounded slice of the batch per statement, walking idx_products_batch_id
+DELETE_BATCH_PRODUCTS_CHUNK = "DELETE FROM products WHERE id IN (SELECT id FROM products WHERE batch_id = %s ORDER BY id LIMIT %s)"
+# a valid index led by products.batch_id, one left by a failed concurrent build is invalid
+SELECT_BATCH_INDEX = """
+	SELECT 1 FROM pg_index
+	JOIN pg_attribute ON attrelid = indrelid AND attnum = indkey[0]
+	WHERE indrelid = 'products'::regclass AND attname = 'batch_id' AND indisvalid
+"""
+
+# the columns written by the import, in file order as ids are allocated in sequence
+SELECT_BATCH_PRODUCTS = f"SELECT {', '.join(PRODUCT_COPY_COLUMNS)} FROM products WHERE batch_id = %s ORDER BY id"
+EXPORT_PRODUCTS = {
+	ExportFormat.CSV: f"COPY ({SELECT_BATCH_PRODUCTS}) TO STDOUT (FORMAT CSV, HEADER)",
+	# one JSON object per line, text COPY only escapes the backslashes of the JSON escapes
+	ExportFormat.NDJSON: f"COPY (SELECT row_to_json(product) FROM ({SELECT_BATCH_PRODUCTS}) product) TO STDOUT",
+}
+
+# bytes of COPY rows sent to the client at once
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+
+def find_imported_batch(
+	db: Connection,
+	content_hash: str,
+	strategy: ImportStrategy,
+	idempotency_key: str | None,
+	stale_after: float,
+) -> ImportResult | None:
+	"""
+	Result of a previous import of the same upload, matched by the
+	Idempotency-Key when given, otherwise by content hash and strategy.
+
+	An import still running is a conflict, one left unfinished for
+	`stale_after` seconds is discarded so the upload can be imported again.
+	"""
+	# an explicit transaction, otherwise the lookup leaves one open and the
+	# per-chunk transactions of the import only become savepoints in it
+	with db.transaction():
+		row = None
+		if idempotency_key is not None:
+			row = db.execute(SELECT_BATCH_BY_KEY, [idempotency_key], prepare=True).fetchone()
+			check_same_upload(row, content_hash, strategy, idempotency_key)
+
+		if row is None:
+			row = db.execute(SELECT_BATCH_BY_HASH, [content_hash, strategy.value], prepare=True).fetchone()
+
+		if row is None:
+			return None
+
+		if is_stale_batch(db, row, stale_after):
+			delete_product_batch(db, row[0])
+			return None
+		return imported_batch_result(row)
+
+
+async def find_imported_batch_async(
+	db: AsyncConnection,
+	content_hash: str,
+	strategy: ImportStrategy,
+	idempotency_key: str | None,
+	stale_after: float,
+) -> ImportResult | None:
+	async with db.transaction():
+		row = None
+		if idempotency_key is not None:
+			row = await (await db.execute(SELECT_BATCH_BY_KEY, [idempotency_key], prepare=True)).fetchone()
+			check_same_upload(row, content_hash, strategy, idempotency_key)
+
+		if row is None:
+			row = await (await db.execute(SELECT_BATCH_BY_HASH, [content_hash, strategy.value], prepare=True)).fetchone()
+
+		if row is None:
+			return None
+
+		if await is_stale_batch_async(db, row, stale_after):
+			await delete_product_batch_async(db, row[0])
+			return None
+		return imported_batch_result(row)
+
+
+def check_same_upload(row: tuple | None, content_hash: str, strategy: ImportStrategy, idempotency_key: str):
+	if row is not None and (row[4] != content_hash or row[2] != strategy.value):
+		raise ResourceError(ResourceErrorType.CONFLICT, ResourceLocation(
+			resource="product_batch",
+			key=idempotency_key,
+			path="$.headers.idempotency-key",
+		))
+
+
+def is_stale_batch(db: Connection, row: tuple, stale_after: float) -> bool:
+	"""
+	Whether an unfinished batch can be discarded, raises while it may still
+	be running. Called inside a transaction, which keeps the import lock of
+	a stale batch until it ends, see `importing_batch_lock`.
+	"""
+	if not is_unfinished_batch(row, stale_after):
+		return False
+	check_abandoned_batch(row, db.execute(TRY_LOCK_IMPORTING_BATCH, [row[0]]).fetchone()[0])
+	return True
+
+
+async def is_stale_batch_async(db: AsyncConnection, row: tuple, stale_after: float) -> bool:
+	if not is_unfinished_batch(row, stale_after):
+		return False
+	check_abandoned_batch(row, (await (await db.execute(TRY_LOCK_IMPORTING_BATCH, [row[0]])).fetchone())[0])
+	return True
+
+
+def is_unfinished_batch(row: tuple, stale_after: float) -> bool:
+	id, imported, age = row[0], row[6], row[8]
+	if imported is not None:
+		return False
+	if age < stale_after:
+		raise product_batch_in_progress(id)
+	return True
+
+
+def check_abandoned_batch(row: tuple, unlocked: bool):
+	# however old, a batch is running while its import holds the lock
+	if not unlocked:
+		raise product_batch_in_progress(row[0])
+
+
+def imported_batch_result(row: tuple) -> ImportResult:
+	return ImportResult(batch=stored_batch(row), imported=row[6], issues=IssueReport.from_dict(row[7]))
+
+
+def stored_batch(row: tuple) -> ProductBatch:
+	id, created, strategy_value, filename, content_hash, key, _, _, _ = row
+	return ProductBatch(
+		id=ULID.from_str(id),
+		created=created,
+		strategy=ImportStrategy(strategy_value),
+		filename=filename,
+		content_hash=content_hash,
+		idempotency_key=key,
+	)
+
+
+def find_batch_job(db: Connection, batch_id: str) -> ImportJob | None:
+	"""
+	Status of a batch from its stored row, for sync imports and for jobs
+	run before a restart or by another process.
+	"""
+	with db.transaction():
+		row = db.execute(SELECT_BATCH_BY_ID, [batch_id], prepare=True).fetchone()
+	if row is None:
+		return None
+
+	job = ImportJob(stored_batch(row))
+	if row[6] is None:
+		job.start()
+	else:
+		result = imported_batch_result(row)
+		job.complete(result.imported, result.issues.total)
+	return job
+
+
+def product_batch_in_progress(batch_id: str) -> ResourceError:
+	return ResourceError(ResourceErrorType.CONFLICT, ResourceLocation(
+		resource="product_batch",
+		key=batch_id,
+		path=None,
+	))
+
+
+def product_batch_not_found(batch_id: str) -> ResourceError:
+	return ResourceError(ResourceErrorType.NOT_FOUND, ResourceLocation(
+		resource="product_batch",
+		key=batch_id,
+		path="$.params.batch_id",
+	))
+
+
+def has_batch_index(db: Connection) -> bool:
+	return db.execute(SELECT_BATCH_INDEX).fetchone() is not None
+
+
+def summarize_product_batch(db: Connection, batch_id: str) -> ProductBatchSummary:
+	with db.transaction():
+		if not product_batch_exists(db, batch_id):
+			raise product_batch_not_found(batch_id)
+		row = db.execute(SELECT_BATCH_SUMMARY, [batch_id], prepare=True).fetchone()
+
+	count, usd, eur, jpy, brl, btc, expiration_min, expiration_max = row
+	return ProductBatchSummary(
+		batch_id=ULID.from_str(batch_id),
+		products=count,
+		price_totals={
+			CurrencyCode.USD: PreciseNumber(int(usd or 0), USD_UNIT),
+			CurrencyCode.EUR: PreciseNumber(int(eur or 0), EUR_UNIT),
+			CurrencyCode.JPY: PreciseNumber(int(jpy or 0), JPY_UNIT),
+			CurrencyCode.BRL: PreciseNumber(int(brl or 0), BRL_UNIT),
+			CurrencyCode.BTC: PreciseNumber(int(btc or 0), BTC_UNIT),
+		},
+		expiration_min=expiration_min,
+		expiration_max=expiration_max,
+	)
+
+
+def delete_product_batch_chunked(db: Connection, batch_id: str, chunk_size: int, stale_after: float) -> int:
+	"""
+	Delete a batch and its products, `chunk_size` products per transaction,
+	so row locks and WAL stay bounded and other writers are never blocked
+	for the whole batch. Returns the number of deleted products.
+
+	The batch row goes last, an interrupted deletion is finished by
+	deleting again. A batch still importing is a conflict.
+	"""
+	with db.transaction():
+		row = db.execute(SELECT_BATCH_BY_ID, [batch_id], prepare=True).fetchone()
+		if row is None:
+			raise product_batch_not_found(batch_id)
+		is_stale_batch(db, row, stale_after)
+
+	deleted = 0
+	while True:
+		with db.transaction():
+			count = db.execute(DELETE_BATCH_PRODUCTS_CHUNK, [batch_id, chunk_size], prepare=True).rowcount
+		deleted += count
+		if count < chunk_size:
+			break
+
+	with db.transaction():
+		db.execute(DELETE_PRODUCT_BATCH, [batch_id], prepare=True)
+	return deleted
+
+
+def product_batch_exists(db: Connection, batch_id: str) -> bool:
+	return db.execute(SELECT_BATCH_EXISTS, [batch_id], prepare=True).fetchone() is not None
+
+
+def iter_batch_products(db: Connection, batch_id: str, format: ExportFormat) -> Iterator[bytes]:
+	"""
+	Products of a batch streamed by `COPY TO`, in blocks of about
+	`EXPORT_BLOCK_SIZE` bytes, so memory stays flat whatever the batch size.
+	"""
+	block: List[bytes] = []
+	size = 0
+	with db.cursor() as cursor:
+		with cursor.copy(EXPORT_PRODUCTS[format], [batch_id]) as copy:
+			for data in copy:
+				row = bytes(data)
+				if format == ExportFormat.NDJSON:
+					row = row.replace(b"\\\\", b"\\")
+				block.append(row)
+				size += len(row)
+				if size >= EXPORT_BLOCK_SIZE:
+					yield b"".join(block)
+					block = []
+					size = 0
+
+	if len(block) != 0:
+		yield b"".join(block)
@@ -1,15 +1,43 @@
-from typing import Any
+from array import array
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Sequence
 from ulid import ULID
-from datetime import datetime, timezone
 
 from ..errors.validation import ValidationIssue
-from ..entities.product import Product, ProductPrice, CurrencyType, CurrencyCode
-from .type_parser import parse_csv_price, parse_csv_date, parse_product_name
+from ..entities.product import Product, ProductBatch, ProductPrice, CurrencyType, CurrencyCode, PreciseAmount
+from ..entities.product_columns import ProductColumns
+from .type_parser import parse_csv_price, parse_csv_date, parse_product_name, parse_price_cents, parse_date_text
 from .exchange import ExchangeRate
+from .currency import ConvertedPrices, get_currency_converter
+from .id_allocator import ulid_allocator
 
 RowType = dict[str | Any, str | Any]
 
+# distinct cells of each memoized column kept per import
+FIELD_CACHE_SIZE = 4096
+
+
+class ProductFields(NamedTuple):
+	"""
+	Validated row values, before currency conversion.
+	"""
+	name: str
+	usd: PreciseAmount
+	expiration: date
+	row_index: int
+
+
 def parse_product_row(row: RowType, row_index: int, batch_id: ULID, exchange: ExchangeRate) -> Product | ValidationIssue:
+	fields = parse_product_fields(row, row_index)
+	if isinstance(fields, ValidationIssue):
+		return fields
+
+	eur, jpy, brl, btc = get_currency_converter(exchange).convert(fields.usd)
+	return make_product(fields, batch_id, eur, jpy, brl, btc)
+
+
+def parse_product_fields(row: RowType, row_index: int) -> ProductFields | ValidationIssue:
 	name = parse_product_name(row["name"])
 	if name is None:
 		return ValidationIssue(
@@ -33,18 +61,192 @@ def parse_product_row(row: RowType, row_index: int, batch_id: ULID, exchange: Ex
 			path=f"$.row.{row_index}",
 			type="invalid_format",
 		)
-	
+
+	return ProductFields(name=name, usd=usd.amount, expiration=expiration, row_index=row_index)
+
+
+class RowIssue(NamedTuple):
+	"""
+	Compact form of a row `ValidationIssue`. `column` is None when the row
+	failed unexpectedly.
+	"""
+	row_index: int
+	column: str | None
+	value: str | None
+
+	def to_validation_issue(self) -> ValidationIssue:
+		if self.column is None:
+			return ValidationIssue(
+				message=f"Error in row {self.row_index}",
+				path=f"$.row.{self.row_index}",
+				type="invalid_data",
+			)
+
+		return ValidationIssue(
+			message=f"Expected {ROW_ISSUE_SUBJECTS[self.column]} in row index {self.row_index} is invalid '{self.value}'",
+			path=f"$.row.{self.row_index}",
+			type="invalid_format",
+		)
+
+	def shift(self, rows: int) -> "RowIssue":
+		return self._replace(row_index=self.row_index + rows)
+
+
+ROW_ISSUE_SUBJECTS = {
+	"name": "name",
+	"price": "price in USD",
+	"expiration": "expiration date",
+}
+
+
+class FieldCacheStats(NamedTuple):
+	hits: int
+	misses: int
+
+
+def parse_price_cell(raw: str) -> PreciseAmount | None:
+	return parse_price_cents(raw.strip())
+
+
+def parse_expiration_cell(raw: str) -> date | None:
+	return parse_date_text(raw.strip())
+
+
+class FieldCaches:
+	"""
+	Memo of raw price and expiration cells to their parsed value, bounded
+	to `size` entries per column with least recently used eviction. Feeds
+	repeat few distinct dates and prices, so most cells skip parsing and
+	share the same `date`. A size of 0 parses every cell.
+	"""
+	def __init__(self, size: int = FIELD_CACHE_SIZE) -> None:
+		self.price = lru_cache(maxsize=size)(parse_price_cell)
+		self.expiration = lru_cache(maxsize=size)(parse_expiration_cell)
+
+	def stats(self) -> Dict[str, FieldCacheStats]:
+		price = self.price.cache_info()
+		expiration = self.expiration.cache_info()
+		return {
+			"price": FieldCacheStats(price.hits, price.misses),
+			"expiration": FieldCacheStats(expiration.hits, expiration.misses),
+		}
+
+
+class ProductRowParser:
+	"""
+	Parser for positional `csv.reader` rows of the name;price;expiration schema.
+
+	Column indexes are resolved once, from the header when there is one, and
+	the reported issues are the same as `parse_product_fields` on the
+	equivalent `csv.DictReader` row.
+	"""
+	def __init__(self, fieldnames: Sequence[str], caches: FieldCaches | None = None) -> None:
+		columns = {name: index for index, name in enumerate(fieldnames)}
+		self.fieldnames = tuple(fieldnames)
+		self.width = len(fieldnames)
+		self.name_index = columns["name"]
+		self.price_index = columns["price"]
+		self.expiration_index = columns["expiration"]
+		self.caches = caches if caches is not None else FieldCaches()
+		self.row_count = 0
+
+	@classmethod
+	def from_header(cls, header: Sequence[str], caches: FieldCaches | None = None) -> "ProductRowParser":
+		return cls([name.strip().lower() for name in header], caches)
+
+	def is_blank(self, row: List[str]) -> bool:
+		# cells past the header width count as data, as DictReader keeps them under `restkey`
+		return len(row) <= self.width and not any(row)
+
+	def parse_next(self, row: List[str]) -> ProductFields | RowIssue | None:
+		"""
+		Parse the next row of the file, None when the row is skipped.
+		"""
+		# blank lines are skipped without being counted
+		if not row:
+			return None
+		self.row_count += 1
+		if self.is_blank(row):
+			return None
+
+		try:
+			return self.parse(row, self.row_count)
+		except Exception:
+			return RowIssue(self.row_count, None, None)
+
+	def parse(self, row: List[str], row_index: int) -> ProductFields | RowIssue:
+		size = len(row)
+		raw_name = row[self.name_index] if self.name_index < size else None
+		raw_price = row[self.price_index] if self.price_index < size else None
+		raw_expiration = row[self.expiration_index] if self.expiration_index < size else None
+
+		name = None if raw_name is None else parse_product_name(raw_name)
+		if name is None:
+			return RowIssue(row_index, "name", raw_name)
+
+		usd = None if raw_price is None else self.caches.price(raw_price)
+		if usd is None:
+			return RowIssue(row_index, "price", raw_price)
+
+		expiration = None if raw_expiration is None else self.caches.expiration(raw_expiration)
+		if expiration is None:
+			return RowIssue(row_index, "expiration", raw_expiration)
+
+		return ProductFields(name=name, usd=usd, expiration=expiration, row_index=row_index)
+
+
+def make_products(rows: Sequence[ProductFields], batch: ProductBatch, exchange: ExchangeRate) -> ProductColumns:
+	"""
+	Build products for a chunk of rows, converting all prices in one pass.
+	"""
+	prices = get_currency_converter(exchange).convert_column([row.usd for row in rows])
+	return make_product_columns(rows, prices, batch)
+
+
+def make_product_columns(rows: Sequence[ProductFields], prices: ConvertedPrices, batch: ProductBatch) -> ProductColumns:
+	"""
+	Products of a chunk share the batch timestamp and get a block of
+	consecutive ids, so their inserts append to the primary key index.
+	"""
+	columns = collect_product_columns(rows, prices, batch)
+	columns.assign_ids(ulid_allocator.allocate_bytes(len(rows)) if rows else b"")
+	return columns
+
+
+def collect_product_columns(rows: Sequence[ProductFields], prices: ConvertedPrices, batch: ProductBatch) -> ProductColumns:
+	"""
+	Columns of a chunk without ids, which are left to `assign_ids`.
+	"""
+	columns = ProductColumns(batch.id, batch.created)
+	columns.names = [row.name for row in rows]
+	columns.expirations = array("i", (row.expiration.toordinal() for row in rows))
+	columns.usd = prices.usd
+	columns.eur = prices.eur
+	columns.jpy = prices.jpy
+	columns.brl = prices.brl
+	columns.btc = prices.btc
+	return columns
+
+
+def make_product(
+	fields: ProductFields,
+	batch_id: ULID,
+	eur: PreciseAmount,
+	jpy: PreciseAmount,
+	brl: PreciseAmount,
+	btc: PreciseAmount,
+) -> Product:
 	return Product(
 		id=ULID(),
 		created=datetime.now(timezone.utc),
 		batch_id=batch_id,
-		name=name,
+		name=fields.name,
 		prices=ProductPrice(
-			usd=CurrencyType(code=CurrencyCode.USD, amount=usd.amount),
-			eur=CurrencyType(code=CurrencyCode.EUR, amount=usd.multiply(exchange.eur).normalize(2).amount),
-			jpy=CurrencyType(code=CurrencyCode.JPY, amount=usd.multiply(exchange.jpy).normalize(0).amount),
-			brl=CurrencyType(code=CurrencyCode.BRL, amount=usd.multiply(exchange.brl).normalize(2).amount),
-			btc=CurrencyType(code=CurrencyCode.BTC, amount=usd.multiply(exchange.btc).normalize(8).amount),
+			usd=CurrencyType(code=CurrencyCode.USD, amount=fields.usd),
+			eur=CurrencyType(code=CurrencyCode.EUR, amount=eur),
+			jpy=CurrencyType(code=CurrencyCode.JPY, amount=jpy),
+			brl=CurrencyType(code=CurrencyCode.BRL, amount=brl),
+			btc=CurrencyType(code=CurrencyCode.BTC, amount=btc),
 		),
-		expiration=expiration,
+		expiration=fields.expiration,
 	)
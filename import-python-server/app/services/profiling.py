@@ -0,0 +1,140 @@
+import cProfile
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from types import FrameType
+from typing import Dict, Iterator
+from ulid import ULID
+
+
+class ProfileMode(Enum):
+	# deterministic, every call of the request thread, several times slower,
+	# an import profiled this way parses in that thread
+	CPROFILE = "cprofile"
+	# stacks of the request thread and the threads it starts, every `interval`
+	SAMPLE = "sample"
+
+
+@dataclass
+class RequestProfile:
+	id: str
+	mode: ProfileMode
+	path: str | None = None
+	# traced across the process, allocations of concurrent requests included
+	process_peak_memory: int | None = None
+
+	def http_headers(self) -> Dict[str, str]:
+		headers = {"X-Import-Profile-Id": self.id}
+		if self.process_peak_memory is not None:
+			headers["X-Import-Profile-Process-Peak-Memory"] = str(self.process_peak_memory)
+		return headers
+
+
+class StackSampler:
+	"""
+	Samples the stacks of a thread, and of the threads started while it
+	runs, from a background thread. The counts are written in the collapsed
+	stack format read by flamegraph tools, one `frame;frame;frame count`
+	line per distinct stack.
+	"""
+	def __init__(self, interval: float) -> None:
+		self.interval = interval
+		self.stacks: Counter[str] = Counter()
+		self._stop = threading.Event()
+		self._thread: threading.Thread | None = None
+
+	def start(self):
+		target = threading.get_ident()
+		# threads already running belong to other requests or are idle
+		ignored = {thread.ident for thread in threading.enumerate()} - {target}
+		self._thread = threading.Thread(target=self._run, args=(ignored,), name="profile-sampler", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+
+	def save(self, path: str) -> str:
+		path = f"{path}.collapsed"
+		with open(path, "w", encoding="utf-8") as file:
+			for stack, count in self.stacks.most_common():
+				file.write(f"{stack} {count}\n")
+		return path
+
+	def _run(self, ignored: set):
+		ignored = ignored | {threading.get_ident()}
+		while not self._stop.wait(self.interval):
+			names = {thread.ident: thread.name for thread in threading.enumerate()}
+			for ident, frame in sys._current_frames().items():
+				if ident not in ignored:
+					self.stacks[collapse_stack(names.get(ident, str(ident)), frame)] += 1
+
+
+def collapse_stack(thread_name: str, frame: FrameType | None) -> str:
+	frames = []
+	while frame is not None:
+		code = frame.f_code
+		frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+		frame = frame.f_back
+	frames.append(thread_name)
+	return ";".join(reversed(frames))
+
+
+class CallProfiler:
+	def __init__(self) -> None:
+		self.profiler = cProfile.Profile()
+
+	def start(self):
+		self.profiler.enable()
+
+	def stop(self):
+		self.profiler.disable()
+
+	def save(self, path: str) -> str:
+		path = f"{path}.pstats"
+		self.profiler.dump_stats(path)
+		return path
+
+
+class RequestProfiler:
+	"""
+	Profiles one request at a time into `directory`, recording the peak
+	memory traced by tracemalloc meanwhile. cProfile hooks and tracemalloc
+	are process wide, so a request arriving while another one is profiled
+	runs unprofiled, while the peak also counts what other requests allocate.
+	"""
+	def __init__(self, directory: str, interval: float) -> None:
+		self.directory = directory
+		self.interval = interval
+		self._lock = threading.Lock()
+
+	@contextmanager
+	def profile(self, mode: ProfileMode) -> Iterator[RequestProfile | None]:
+		if not self._lock.acquire(blocking=False):
+			yield None
+			return
+
+		try:
+			profile = RequestProfile(id=str(ULID()), mode=mode)
+			collector = CallProfiler() if mode == ProfileMode.CPROFILE else StackSampler(self.interval)
+			tracing = not tracemalloc.is_tracing()
+			if tracing:
+				tracemalloc.start()
+			collector.start()
+			try:
+				yield profile
+			finally:
+				collector.stop()
+				if tracing:
+					profile.process_peak_memory = tracemalloc.get_traced_memory()[1]
+					tracemalloc.stop()
+				os.makedirs(self.directory, exist_ok=True)
+				profile.path = collector.save(os.path.join(self.directory, profile.id))
+		finally:
+			self._lock.release()
@@ -2,7 +2,8 @@ import re
 from typing import Any
 from datetime import date
 
-from ..entities.product import PreciseNumber, ImportStrategy
+from ..entities.product import PreciseAmount, PreciseNumber, ImportStrategy, ImportMode, ExportFormat
+from .profiling import ProfileMode
 
 
 MAX_NAME_LENGTH = 1024
@@ -39,6 +40,29 @@ def parse_csv_price(value: Any) -> PreciseNumber | None:
 	return PreciseNumber(amount=amount, unit=2)
 
 
+def parse_price_cents(text: str) -> PreciseAmount | None:
+	"""
+	Same as `parse_csv_price` on stripped text, without the regex engine.
+	"""
+	# shortest match is "$0.00"
+	if len(text) < 5 or text[0] != "$":
+		return None
+
+	dot = len(text) - 3
+	if text[dot] != ".":
+		return None
+
+	dollars = text[1:dot]
+	cents = text[dot + 1:]
+	# str.isdecimal() accepts the same characters as \d
+	if not cents.isdecimal() or not dollars.isdecimal():
+		return None
+	if dollars[0] not in "123456789" and dollars != "0":
+		return None
+
+	return int(dollars) * 100 + int(cents)
+
+
 DATE_PATTERN = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{3,4})$")
 
 def parse_csv_date(value: Any) -> date | None:
@@ -59,6 +83,26 @@ def parse_csv_date(value: Any) -> date | None:
 		return None
 
 
+def parse_date_text(text: str) -> date | None:
+	"""
+	Same as `parse_csv_date` on stripped text, without the regex engine.
+	"""
+	parts = text.split("/")
+	if len(parts) != 3:
+		return None
+
+	month, day, year = parts
+	if not (0 < len(month) <= 2 and 0 < len(day) <= 2 and 3 <= len(year) <= 4):
+		return None
+	if not (month.isdecimal() and day.isdecimal() and year.isdecimal()):
+		return None
+
+	try:
+		return date(int(year), int(month), int(day))
+	except ValueError:
+		return None
+
+
 def is_all_number(s: str) -> bool:
 	if not s:
 		return False
@@ -96,3 +140,48 @@ def parse_strategy(value: Any) -> ImportStrategy | None:
 		return ImportStrategy.PARTIAL
 	
 	return None
+
+
+def parse_import_mode(value: Any) -> ImportMode | None:
+	if value is None:
+		return ImportMode.SYNC
+
+	if value == "sync":
+		return ImportMode.SYNC
+	if value == "async":
+		return ImportMode.ASYNC
+
+	return None
+
+
+def parse_export_format(value: Any) -> ExportFormat | None:
+	if value is None:
+		return ExportFormat.CSV
+
+	if value == "csv":
+		return ExportFormat.CSV
+	if value == "ndjson":
+		return ExportFormat.NDJSON
+
+	return None
+
+
+def parse_profile_mode(value: Any) -> ProfileMode | None:
+	if value == "cprofile":
+		return ProfileMode.CPROFILE
+	if value == "sample":
+		return ProfileMode.SAMPLE
+
+	return None
+
+
+def parse_flag(value: Any) -> bool | None:
+	if value is None:
+		return False
+
+	if value in ("true", "1"):
+		return True
+	if value in ("false", "0"):
+		return False
+
+	return None
@@ -0,0 +1,433 @@
+import fcntl
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import IO, Dict, Iterator, List
+from ulid import ULID
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from ..entities.product import ImportStrategy, ProductBatch
+from ..errors.app_error import HttpErrorObject
+from ..errors.resource import ResourceError, ResourceErrorType, ResourceLocation
+from ..errors.validation import ValidationError, RequestSegment, ValidationIssue
+
+SESSION_MANIFEST = "session.json"
+# locked around every change of the manifest
+SESSION_LOCK = "session.lock"
+# locked by the process importing the session, for as long as it runs
+IMPORT_LOCK = "import.lock"
+
+# waiting readers re-check the session this often, in seconds
+CHUNK_POLL_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class UploadChunk:
+	size: int
+	sha256: str
+
+
+@dataclass
+class UploadSession:
+	"""
+	An upload received as numbered chunks, spooled to disk. `chunk_count`
+	is only known once the client finalizes the upload, `import_error` is
+	set while its last import failed.
+	"""
+	id: ULID
+	created: datetime
+	filename: str
+	strategy: ImportStrategy
+	chunks: Dict[int, UploadChunk] = field(default_factory=dict)
+	chunk_count: int | None = None
+	import_error: HttpErrorObject | None = None
+
+	@property
+	def finalized(self) -> bool:
+		return self.chunk_count is not None
+
+	@property
+	def size(self) -> int:
+		return sum(chunk.size for chunk in self.chunks.values())
+
+	def batch(self) -> ProductBatch:
+		return ProductBatch(id=self.id, created=self.created, strategy=self.strategy, filename=self.filename)
+
+	def missing_chunks(self, chunk_count: int) -> List[int]:
+		return [index for index in range(chunk_count) if index not in self.chunks]
+
+	def to_dict(self):
+		return {
+			"id": str(self.id),
+			"created": self.created.isoformat(),
+			"filename": self.filename,
+			"strategy": self.strategy.value,
+			"chunks": [
+				{"index": index, "size": chunk.size, "sha256": chunk.sha256}
+				for index, chunk in sorted(self.chunks.items())
+			],
+			"chunk_count": self.chunk_count,
+			"size": self.size,
+			"import_error": self.import_error,
+		}
+
+	@classmethod
+	def from_dict(cls, data) -> "UploadSession":
+		return cls(
+			id=ULID.from_str(data["id"]),
+			created=datetime.fromisoformat(data["created"]),
+			filename=data["filename"],
+			strategy=ImportStrategy(data["strategy"]),
+			chunks={
+				chunk["index"]: UploadChunk(size=chunk["size"], sha256=chunk["sha256"])
+				for chunk in data["chunks"]
+			},
+			chunk_count=data["chunk_count"],
+			import_error=data.get("import_error"),
+		)
+
+
+class ImportClaim:
+	"""
+	Exclusive right to import a session, across the processes sharing the
+	spool directory. It is an flock, so the system releases it when its
+	process dies and the import can be resumed by another one.
+	"""
+	def __init__(self, file: IO[str]) -> None:
+		self._file = file
+
+	def release(self):
+		fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+		self._file.close()
+
+
+def upload_session_not_found(session_id: str) -> ResourceError:
+	return ResourceError(ResourceErrorType.NOT_FOUND, ResourceLocation(
+		resource="upload_session",
+		key=session_id,
+		path="$.params.upload_id",
+	))
+
+
+def upload_session_conflict(session_id: str, path: str) -> ResourceError:
+	return ResourceError(ResourceErrorType.CONFLICT, ResourceLocation(
+		resource="upload_session",
+		key=session_id,
+		path=path,
+	))
+
+
+class UploadSessionStore:
+	"""
+	Upload sessions spooled under `root`, one directory per session with a
+	JSON manifest and a file per chunk. The manifest is the only state, read
+	again on every access and changed under a file lock, so every process
+	sharing `root` sees the same sessions and they outlive their process.
+	"""
+	def __init__(self, root: str, max_size: int) -> None:
+		self.root = root
+		self.max_size = max_size
+		# wakes readers of this process, those of other processes poll
+		self._changed = threading.Condition()
+		os.makedirs(root, exist_ok=True)
+
+	def create(self, filename: str, strategy: ImportStrategy) -> UploadSession:
+		session = UploadSession(
+			id=ULID(),
+			created=datetime.now(timezone.utc),
+			filename=filename,
+			strategy=strategy,
+		)
+		os.makedirs(self.session_dir(str(session.id)))
+		with self._locked(str(session.id)):
+			self._save(session)
+		return session
+
+	def get(self, session_id: str) -> UploadSession | None:
+		"""
+		Snapshot of the session, safe to read while chunks keep arriving.
+		"""
+		return self._load(session_id)
+
+	def put_chunk(self, session_id: str, index: int, data: bytes, sha256: str) -> bool:
+		"""
+		Store a chunk, returning False when the same chunk was already stored.
+		"""
+		digest = hashlib.sha256(data).hexdigest()
+		if digest != sha256.lower():
+			raise ValidationError(RequestSegment.HEADERS, [
+				ValidationIssue(
+					message=f"Expected chunk checksum to be {digest}",
+					path="$.headers.x-chunk-sha256",
+					type="invalid_data"
+				)
+			])
+
+		with self._locked(session_id):
+			session = self._load(session_id)
+			if session is None:
+				raise upload_session_not_found(session_id)
+
+			stored = session.chunks.get(index)
+			if stored is not None:
+				if stored.sha256 == digest:
+					return False
+				raise upload_session_conflict(session_id, "$.params.index")
+
+			if session.finalized:
+				raise upload_session_conflict(session_id, "$.params.upload_id")
+
+			if session.size + len(data) > self.max_size:
+				raise RequestEntityTooLarge()
+
+			path = self.chunk_path(session_id, index)
+			with open(path + ".tmp", "wb") as file:
+				file.write(data)
+				file.flush()
+				os.fsync(file.fileno())
+			os.replace(path + ".tmp", path)
+
+			session.chunks[index] = UploadChunk(size=len(data), sha256=digest)
+			self._save(session)
+		return True
+
+	def finalize(self, session_id: str, chunk_count: int) -> UploadSession:
+		with self._locked(session_id):
+			session = self._load(session_id)
+			if session is None:
+				raise upload_session_not_found(session_id)
+
+			if session.finalized:
+				if session.chunk_count != chunk_count:
+					raise upload_session_conflict(session_id, "$.chunks")
+				return session
+
+			missing = session.missing_chunks(chunk_count)
+			if len(missing) != 0 or max(session.chunks, default=-1) >= chunk_count:
+				raise ValidationError(RequestSegment.BODY, [
+					ValidationIssue(
+						message=f"Expected chunks 0 to {chunk_count - 1}, missing {missing}",
+						path="$.chunks",
+						type="invalid_data"
+					)
+				])
+
+			session.chunk_count = chunk_count
+			self._save(session)
+			return session
+
+	def set_import_error(self, session_id: str, error: HttpErrorObject | None) -> UploadSession:
+		with self._locked(session_id):
+			session = self._load(session_id)
+			if session is None:
+				raise upload_session_not_found(session_id)
+			session.import_error = error
+			self._save(session)
+			return session
+
+	def claim_import(self, session_id: str) -> ImportClaim | None:
+		"""
+		Claim the import of the session, None while another thread or
+		process holds the claim.
+		"""
+		try:
+			file = open(os.path.join(self.session_dir(session_id), IMPORT_LOCK), "a")
+		except FileNotFoundError:
+			raise upload_session_not_found(session_id)
+
+		try:
+			fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except BlockingIOError:
+			file.close()
+			return None
+		return ImportClaim(file)
+
+	def remove(self, session_id: str):
+		with self._changed:
+			shutil.rmtree(self.session_dir(session_id), ignore_errors=True)
+			self._changed.notify_all()
+
+	def prune(self, max_age: float):
+		"""
+		Remove the sessions unchanged for `max_age` seconds, unless they are
+		being imported.
+		"""
+		oldest = time.time() - max_age
+		with os.scandir(self.root) as entries:
+			for entry in entries:
+				try:
+					changed = os.stat(os.path.join(entry.path, SESSION_MANIFEST)).st_mtime
+				except FileNotFoundError:
+					continue
+				if changed >= oldest:
+					continue
+
+				try:
+					claim = self.claim_import(entry.name)
+				except ResourceError:
+					continue
+				if claim is not None:
+					self.remove(entry.name)
+					claim.release()
+
+	def wait_for_chunk(self, session_id: str, index: int, timeout: float) -> str | None:
+		"""
+		Path of chunk `index` once received, None past the last chunk of a
+		finalized session.
+		"""
+		deadline = time.monotonic() + timeout
+		with self._changed:
+			while True:
+				session = self._load(session_id)
+				if session is None:
+					raise upload_session_not_found(session_id)
+				if index in session.chunks:
+					return self.chunk_path(session_id, index)
+				if session.finalized and index >= session.chunk_count:
+					return None
+
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					raise ValidationError(RequestSegment.BODY, [
+						ValidationIssue(
+							message=f"Expected chunk {index} within {timeout:.0f} seconds",
+							path=None,
+							type="timeout"
+						)
+					])
+				self._changed.wait(min(remaining, CHUNK_POLL_INTERVAL))
+
+	def open_stream(self, session_id: str, idle_timeout: float) -> io.BufferedReader:
+		return io.BufferedReader(ChunkedUploadReader(self, session_id, idle_timeout))
+
+	def session_dir(self, session_id: str) -> str:
+		# ids are only ever parsed ULIDs, never raw user input
+		return os.path.join(self.root, session_id)
+
+	def parsed_path(self, session_id: str) -> str:
+		# chunks parsed while the upload arrives, written once it is finalized
+		return os.path.join(self.session_dir(session_id), "parsed.chunks")
+
+	def chunk_path(self, session_id: str, index: int) -> str:
+		return os.path.join(self.session_dir(session_id), f"{index:08d}.chunk")
+
+	@contextmanager
+	def _locked(self, session_id: str) -> Iterator[None]:
+		"""
+		Change the manifest of a session, excluding the threads of this
+		process and, with an flock, the other processes.
+		"""
+		with self._changed:
+			try:
+				file = open(os.path.join(self.session_dir(session_id), SESSION_LOCK), "a")
+			except FileNotFoundError:
+				raise upload_session_not_found(session_id)
+
+			with file:
+				fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+				yield
+			self._changed.notify_all()
+
+	def _load(self, session_id: str) -> UploadSession | None:
+		try:
+			with open(os.path.join(self.session_dir(session_id), SESSION_MANIFEST)) as file:
+				return UploadSession.from_dict(json.load(file))
+		except FileNotFoundError:
+			return None
+
+	def _save(self, session: UploadSession):
+		path = os.path.join(self.session_dir(str(session.id)), SESSION_MANIFEST)
+		with open(path + ".tmp", "w") as file:
+			json.dump(session.to_dict(), file)
+		os.replace(path + ".tmp", path)
+
+
+class ChunkedUploadReader(io.RawIOBase):
+	"""
+	Reads the chunks of an upload session in order while they are still
+	arriving, waiting up to `idle_timeout` seconds for each missing chunk.
+	Seeking is limited to data already received.
+	"""
+	def __init__(self, store: UploadSessionStore, session_id: str, idle_timeout: float) -> None:
+		self.store = store
+		self.session_id = session_id
+		self.idle_timeout = idle_timeout
+		self._index = 0
+		self._offset = 0
+		self._position = 0
+		self._file: io.BufferedReader | None = None
+		self._eof = False
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		while not self._eof:
+			if self._file is None:
+				path = self.store.wait_for_chunk(self.session_id, self._index, self.idle_timeout)
+				if path is None:
+					self._eof = True
+					break
+				self._file = open(path, "rb")
+				self._file.seek(self._offset)
+
+			read = self._file.readinto(buffer)
+			if read:
+				self._offset += read
+				self._position += read
+				return read
+
+			self._file.close()
+			self._file = None
+			self._index += 1
+			self._offset = 0
+		return 0
+
+	def tell(self) -> int:
+		return self._position
+
+	def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+		session = self.store.get(self.session_id)
+		if session is None:
+			raise upload_session_not_found(self.session_id)
+
+		if whence == io.SEEK_CUR:
+			offset += self._position
+		elif whence == io.SEEK_END:
+			if not session.finalized:
+				raise io.UnsupportedOperation("upload size is unknown until it is finalized")
+			offset += session.size
+		if offset < 0:
+			raise ValueError("negative seek position")
+
+		index, start = 0, 0
+		while index in session.chunks and start + session.chunks[index].size <= offset:
+			start += session.chunks[index].size
+			index += 1
+		if index not in session.chunks and offset > start:
+			raise io.UnsupportedOperation("cannot seek past the chunks received so far")
+
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+		self._index = index
+		self._offset = offset - start
+		self._position = offset
+		self._eof = False
+		return offset
+
+	def close(self):
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+		super().close()
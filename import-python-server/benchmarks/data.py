@@ -0,0 +1,97 @@
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Iterator, List
+from ulid import ULID
+
+from app.entities.product import Product, ProductPrice, CurrencyType, CurrencyCode
+
+
+def make_products(count: int, *, seed: int = 0) -> List[Product]:
+	"""
+	Deterministic synthetic products, as produced by the CSV parser.
+	"""
+	rng = random.Random(seed)
+	batch_id = ULID()
+	created = datetime.now(timezone.utc)
+	products: List[Product] = []
+
+	for n in range(count):
+		usd = rng.randint(1, 99_999)
+		products.append(Product(
+			id=ULID(),
+			created=created,
+			batch_id=batch_id,
+			name=f"Product #{n} ({rng.randint(10**15, 10**16 - 1)})",
+			prices=ProductPrice(
+				usd=CurrencyType(code=CurrencyCode.USD, amount=usd),
+				eur=CurrencyType(code=CurrencyCode.EUR, amount=usd * 92 // 100),
+				jpy=CurrencyType(code=CurrencyCode.JPY, amount=usd * 157 // 100),
+				brl=CurrencyType(code=CurrencyCode.BRL, amount=usd * 540 // 100),
+				btc=CurrencyType(code=CurrencyCode.BTC, amount=usd * 1_000_000 // 6_700_000),
+			),
+			expiration=date(rng.randint(2020, 2030), rng.randint(1, 12), rng.randint(1, 28)),
+		))
+
+	return products
+
+
+@dataclass(frozen=True)
+class CsvProfile:
+	"""
+	Share of rows with one malformed cell and of rows with non-ASCII names.
+	"""
+	invalid_ratio: float
+	unicode_ratio: float
+
+
+CSV_PROFILES = {
+	"valid": CsvProfile(invalid_ratio=0.0, unicode_ratio=0.0),
+	"mixed": CsvProfile(invalid_ratio=0.1, unicode_ratio=0.0),
+	"unicode": CsvProfile(invalid_ratio=0.0, unicode_ratio=0.9),
+}
+
+UNICODE_WORDS = ["Pão de Açúcar", "Crème brûlée", "Ñandú", "Łódź", "Ελιά", "Сыр", "寿司", "抹茶ラテ", "김치", "☕", "🧀🍞"]
+
+
+def make_products_csv(count: int, *, seed: int = 0, invalid_ratio: float = 0.0, unicode_ratio: float = 0.0) -> bytes:
+	"""
+	Deterministic synthetic CSV upload with a header row, `invalid_ratio`
+	of its rows having one malformed cell.
+	"""
+	lines = iter_products_csv_lines(count, seed=seed, invalid_ratio=invalid_ratio, unicode_ratio=unicode_ratio)
+	return "".join(lines).encode("utf-8")
+
+
+def write_products_csv(path: str, count: int, *, seed: int = 0, profile: CsvProfile = CSV_PROFILES["valid"]):
+	"""
+	Same rows as `make_products_csv`, streamed to `path` so large uploads
+	are never held in memory.
+	"""
+	lines = iter_products_csv_lines(count, seed=seed, invalid_ratio=profile.invalid_ratio, unicode_ratio=profile.unicode_ratio)
+	with open(path, "w", encoding="utf-8", newline="") as file:
+		file.writelines(lines)
+
+
+def iter_products_csv_lines(count: int, *, seed: int = 0, invalid_ratio: float = 0.0, unicode_ratio: float = 0.0) -> Iterator[str]:
+	rng = random.Random(seed)
+	yield "name;price;expiration\n"
+
+	for n in range(count):
+		if unicode_ratio and rng.random() < unicode_ratio:
+			name = f"{rng.choice(UNICODE_WORDS)} {rng.choice(UNICODE_WORDS)} #{n}"
+		else:
+			name = f"Product #{n} ({rng.randint(10**15, 10**16 - 1)})"
+		price = f"${rng.randint(0, 999)}.{rng.randint(0, 99):02d}"
+		expiration = f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(2020, 2030)}"
+
+		if invalid_ratio and rng.random() < invalid_ratio:
+			column = rng.randrange(3)
+			if column == 0:
+				name = " "
+			elif column == 1:
+				price = price[1:]
+			else:
+				expiration = expiration.replace("/", "-")
+
+		yield f"{name};{price};{expiration}\n"
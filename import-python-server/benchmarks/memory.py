@@ -0,0 +1,62 @@
+"""
+Memory per row of parsed products, as a list of Product dataclasses and
+as ProductColumns.
+
+	python -m benchmarks.memory [rows]
+"""
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, List
+from ulid import ULID
+
+from app.entities.product_columns import ProductColumns
+from .data import make_products
+
+
+DEFAULT_ROWS = 1_000_000
+
+
+def measure(build: Callable[[], object]) -> int:
+	tracemalloc.start()
+	try:
+		before = tracemalloc.get_traced_memory()[0]
+		built = build()
+		after = tracemalloc.get_traced_memory()[0]
+	finally:
+		tracemalloc.stop()
+	del built
+	return after - before
+
+
+def main(argv: List[str]):
+	count = int(argv[0]) if argv else DEFAULT_ROWS
+
+	def build_products():
+		return make_products(count)
+
+	def build_columns():
+		# same values, but only the columns are kept alive
+		columns = ProductColumns(ULID(), datetime.now(timezone.utc))
+		step = 10_000
+		for start in range(0, count, step):
+			products = make_products(min(step, count - start), seed=start)
+			columns.extend(
+				b"".join(product.id.bytes for product in products),
+				[product.name for product in products],
+				[product.expiration for product in products],
+				[product.prices.usd.amount for product in products],
+				[product.prices.eur.amount for product in products],
+				[product.prices.jpy.amount for product in products],
+				[product.prices.brl.amount for product in products],
+				[product.prices.btc.amount for product in products],
+			)
+		return columns
+
+	for label, build in (("products", build_products), ("columns", build_columns)):
+		size = measure(build)
+		print(f"{label:>9} {count:>9} rows {size / 2**20:9.1f} MiB {size / count:8.1f} bytes/row")
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,53 @@
+"""
+Compare the positional row parser with the csv.DictReader and regex based
+parser it replaced, in rows per second.
+
+	python -m benchmarks.parse_rows [rows ...]
+"""
+import csv
+import io
+import sys
+import time
+from typing import Callable, Iterator, List
+
+from app.entities.product import ImportStrategy
+from app.services.import_products import ProductRecord, open_csv_text_stream, parse_products_csv
+from app.services.product_parser import parse_product_fields
+from .data import make_products_csv
+
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+
+def parse_products_csv_dict_reader(stream: io.TextIOWrapper) -> Iterator[ProductRecord]:
+	"""
+	The previous parser, for files with a header row.
+	"""
+	reader = csv.DictReader(stream, delimiter=';')
+	reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+	for row_index, row in enumerate(reader, start=1):
+		if not any(row.values()):
+			continue
+		yield parse_product_fields(row, row_index)
+
+
+def measure(parser: Callable[[io.TextIOWrapper], Iterator[ProductRecord]], data: bytes) -> float:
+	stream = open_csv_text_stream(io.BytesIO(data), ImportStrategy.PARTIAL)
+	start = time.perf_counter()
+	for _ in parser(stream):
+		pass
+	return time.perf_counter() - start
+
+
+def main(argv: List[str]):
+	rows = [int(arg) for arg in argv] or DEFAULT_ROWS
+
+	for count in rows:
+		data = make_products_csv(count, invalid_ratio=0.01)
+		for label, parser in (("dict", parse_products_csv_dict_reader), ("fast", parse_products_csv)):
+			elapsed = measure(parser, data)
+			print(f"{label:>6} {count:>9} rows {elapsed:9.3f} s {count / elapsed:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
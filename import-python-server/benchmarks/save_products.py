@@ -0,0 +1,62 @@
+"""
+Compare the binary COPY product writer with the multi-row INSERT ... VALUES
+writer it replaced.
+
+Runs against the database in DATABASE_URL, every measurement is rolled back.
+
+	python -m benchmarks.save_products [rows ...]
+"""
+import os
+import sys
+import time
+from typing import Callable, List
+from psycopg import Connection
+
+from app.entities.product import Product
+from app.services.import_products import PRODUCT_COPY_COLUMNS, copy_products, product_copy_row
+from .data import make_products
+
+
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000]
+
+# PostgreSQL accepts at most 65535 bind parameters per statement
+MAX_BIND_PARAMETERS = 65535
+
+
+def insert_products_values(db: Connection, products: List[Product]):
+	"""
+	The previous writer, split into statements under the bind-parameter cap
+	so it can run past ~7.2k rows.
+	"""
+	rows_per_statement = MAX_BIND_PARAMETERS // len(PRODUCT_COPY_COLUMNS)
+	placeholders = "(" + ", ".join(["%s"] * len(PRODUCT_COPY_COLUMNS)) + ")"
+
+	for start in range(0, len(products), rows_per_statement):
+		chunk = products[start:start + rows_per_statement]
+		sql = f"INSERT INTO products ({', '.join(PRODUCT_COPY_COLUMNS)}) VALUES " + ", ".join([placeholders] * len(chunk))
+		pvalues = []
+		for product in chunk:
+			pvalues.extend(product_copy_row(product))
+		db.execute(sql, pvalues)
+
+
+def measure(db: Connection, writer: Callable[[Connection, List[Product]], None], products: List[Product]) -> float:
+	with db.transaction(force_rollback=True):
+		start = time.perf_counter()
+		writer(db, products)
+		return time.perf_counter() - start
+
+
+def main(argv: List[str]):
+	rows = [int(arg) for arg in argv] or DEFAULT_ROWS
+
+	with Connection.connect(os.environ["DATABASE_URL"]) as db:
+		for count in rows:
+			products = make_products(count)
+			for label, writer in (("values", insert_products_values), ("copy", copy_products)):
+				elapsed = measure(db, writer, products)
+				print(f"{label:>6} {count:>9} rows {elapsed:9.3f} s {count / elapsed:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
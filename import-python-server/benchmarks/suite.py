@@ -0,0 +1,287 @@
+"""
+Time each stage of the import hot path over synthetic uploads and write the
+results as JSON, so runs can be compared over time.
+
+	python -m benchmarks.suite [--rows 1000 100000] [--profiles valid mixed unicode]
+		[--output results.json] [--baseline previous.json]
+
+`save_products_batch` only runs when DATABASE_URL is set; use a throwaway
+database, although every write is rolled back. Above 1M rows the stages
+that build a whole list of products are skipped, the streaming
+`parse_product_chunks` stage covers those sizes.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+from app.config import Config
+from app.entities.product import ImportStrategy, PreciseNumber, ProductBatch, RoundingMode
+from app.extensions.database import close_db, get_db, init_db
+from app.services.exchange import ExchangeRate
+from app.services.import_products import ImportOptions, parse_product_chunks, parse_products_csv_file, save_products_batch
+from app.services.product_parser import parse_product_row
+from app.services.type_parser import parse_csv_date, parse_csv_price
+from .data import CSV_PROFILES, write_products_csv
+
+
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000]
+MAX_ROWS = 10_000_000
+
+# cells are parsed in blocks so the micro stages never hold a whole 10M row file
+BLOCK_ROWS = 100_000
+
+# parse_products_csv_file and save_products_batch keep every Product alive
+FULL_LIST_ROW_LIMIT = 1_000_000
+
+EXCHANGE_RATE = ExchangeRate(
+	usd=PreciseNumber(100, 2),
+	eur=PreciseNumber(92, 2),
+	jpy=PreciseNumber(15700, 2),
+	brl=PreciseNumber(540, 2),
+	btc=PreciseNumber(15, 7),
+)
+
+
+@dataclass(frozen=True)
+class StageResult:
+	stage: str
+	profile: str
+	rows: int
+	seconds: float
+
+	@property
+	def rows_per_second(self) -> float:
+		return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+	def to_dict(self):
+		return {**asdict(self), "rows_per_second": round(self.rows_per_second, 1)}
+
+
+class StageTimer:
+	"""
+	Accumulates time spent in one stage across blocks of rows.
+	"""
+	def __init__(self) -> None:
+		self.seconds = 0.0
+
+	def __enter__(self):
+		self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.seconds += time.perf_counter() - self._start
+
+
+def iter_row_blocks(path: str) -> Iterator[List[List[str]]]:
+	with open(path, encoding="utf-8", newline="") as file:
+		reader = csv.reader(file, delimiter=';')
+		next(reader)
+		block: List[List[str]] = []
+		for row in reader:
+			block.append(row)
+			if len(block) == BLOCK_ROWS:
+				yield block
+				block = []
+		if block:
+			yield block
+
+
+def bench_cells(path: str) -> Dict[str, float]:
+	prices = StageTimer()
+	dates = StageTimer()
+	rows = StageTimer()
+	arithmetic = StageTimer()
+	batch_id = ProductBatch.new("bench.csv", ImportStrategy.PARTIAL).id
+
+	for block in iter_row_blocks(path):
+		price_cells = [row[1] for row in block]
+		date_cells = [row[2] for row in block]
+		dicts = [{"name": row[0], "price": row[1], "expiration": row[2]} for row in block]
+
+		with prices:
+			parsed_prices = [parse_csv_price(cell) for cell in price_cells]
+		with dates:
+			for cell in date_cells:
+				parse_csv_date(cell)
+		with rows:
+			for row_index, row in enumerate(dicts, start=1):
+				parse_product_row(row, row_index, batch_id, EXCHANGE_RATE)
+
+		numbers = [price for price in parsed_prices if price is not None]
+		with arithmetic:
+			for price in numbers:
+				# one conversion as done per row before the vectorized converter
+				price.divide(EXCHANGE_RATE.usd).multiply(EXCHANGE_RATE.eur).normalize(2, rounding=RoundingMode.HALF_UP)
+				price.add(price).subtract(price)
+
+	return {
+		"parse_csv_price": prices.seconds,
+		"parse_csv_date": dates.seconds,
+		"parse_product_row": rows.seconds,
+		"precise_number": arithmetic.seconds,
+	}
+
+
+def open_upload(path: str) -> FileStorage:
+	return FileStorage(stream=open(path, "rb"), filename="bench.csv", content_type="text/csv")
+
+
+def bench_parse_file(path: str) -> float:
+	file = open_upload(path)
+	try:
+		start = time.perf_counter()
+		parse_products_csv_file(file, EXCHANGE_RATE, ImportStrategy.PARTIAL)
+		return time.perf_counter() - start
+	finally:
+		file.close()
+
+
+def bench_parse_chunks(path: str) -> float:
+	file = open_upload(path)
+	batch = ProductBatch.new(file.filename, ImportStrategy.PARTIAL)
+	options = ImportOptions(
+		chunk_size=5_000,
+		queue_size=4,
+		parallel_threshold=sys.maxsize,
+		parallel_workers=1,
+		spool_dir=tempfile.gettempdir(),
+	)
+	try:
+		start = time.perf_counter()
+		for _ in parse_product_chunks(batch, file, EXCHANGE_RATE, options, None):
+			pass
+		return time.perf_counter() - start
+	finally:
+		file.close()
+
+
+def bench_save(app: Flask, path: str) -> float:
+	file = open_upload(path)
+	try:
+		batch, products, _ = parse_products_csv_file(file, EXCHANGE_RATE, ImportStrategy.PARTIAL)
+	finally:
+		file.close()
+
+	with app.app_context():
+		try:
+			# the transaction of save_products_batch becomes a savepoint of this one
+			with get_db().transaction(force_rollback=True):
+				start = time.perf_counter()
+				save_products_batch(batch, products)
+				return time.perf_counter() - start
+		finally:
+			close_db(None)
+
+
+def run_profile(app: Optional[Flask], profile: str, count: int, workdir: str) -> List[StageResult]:
+	path = os.path.join(workdir, f"{profile}-{count}.csv")
+	write_products_csv(path, count, seed=count, profile=CSV_PROFILES[profile])
+
+	try:
+		timings = bench_cells(path)
+		timings["parse_product_chunks"] = bench_parse_chunks(path)
+		if count <= FULL_LIST_ROW_LIMIT:
+			timings["parse_products_csv_file"] = bench_parse_file(path)
+			if app is not None:
+				timings["save_products_batch"] = bench_save(app, path)
+	finally:
+		os.remove(path)
+
+	return [StageResult(stage, profile, count, seconds) for stage, seconds in timings.items()]
+
+
+def git_revision() -> Optional[str]:
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def compare(results: List[StageResult], baseline_path: str) -> Iterator[str]:
+	with open(baseline_path) as file:
+		baseline = {
+			(entry["stage"], entry["profile"], entry["rows"]): entry["rows_per_second"]
+			for entry in json.load(file)["results"]
+		}
+
+	for result in results:
+		previous = baseline.get((result.stage, result.profile, result.rows))
+		if previous:
+			change = (result.rows_per_second / previous - 1) * 100
+			yield f"{result.stage:>24} {result.profile:>8} {result.rows:>9} {change:+8.1f} %"
+
+
+def make_app() -> Optional[Flask]:
+	if "DATABASE_URL" not in os.environ:
+		return None
+	app = Flask(__name__)
+	# init_db sizes its pool from the DB_POOL_* settings
+	app.config.from_object(Config)
+	init_db(app)
+	return app
+
+
+def main(argv: List[str]):
+	parser = argparse.ArgumentParser(prog="benchmarks.suite")
+	parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+	parser.add_argument("--profiles", nargs="+", choices=sorted(CSV_PROFILES), default=sorted(CSV_PROFILES))
+	parser.add_argument("--output", help="JSON results path, stdout by default")
+	parser.add_argument("--baseline", help="previous JSON results to compare against")
+	args = parser.parse_args(argv)
+
+	if any(count < 1 or count > MAX_ROWS for count in args.rows):
+		parser.error(f"--rows must be between 1 and {MAX_ROWS}")
+
+	app = make_app()
+	results: List[StageResult] = []
+	with tempfile.TemporaryDirectory(prefix="import-bench-") as workdir:
+		for count in args.rows:
+			for profile in args.profiles:
+				for result in run_profile(app, profile, count, workdir):
+					results.append(result)
+					print(
+						f"{result.stage:>24} {result.profile:>8} {result.rows:>9} rows"
+						f" {result.seconds:9.3f} s {result.rows_per_second:12.0f} rows/s",
+						file=sys.stderr,
+					)
+
+	report = {
+		"created": datetime.now(timezone.utc).isoformat(),
+		"revision": git_revision(),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"database": app is not None,
+		"results": [result.to_dict() for result in results],
+	}
+
+	if args.output:
+		with open(args.output, "w") as file:
+			json.dump(report, file, indent=2)
+	else:
+		json.dump(report, sys.stdout, indent=2)
+		print()
+
+	if args.baseline:
+		for line in compare(results, args.baseline):
+			print(line, file=sys.stderr)
+
+	if app is not None:
+		app.extensions["db_pool"].close()
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -1,11 +1,23 @@
-from app import create_app
 from dotenv import load_dotenv
 import os
 
+# before importing the app, Config reads the environment when it is defined
 if os.getenv("FLASK_ENV") != "production":
 	load_dotenv()
 
-app = create_app()
+from app import create_app
 
+# the app is only created when run as a script, parser processes import this module again
 if __name__ == "__main__":
-	app.run(host="0.0.0.0", port=3334)
+	if os.getenv("SERVER_MODE") == "async":
+		import asyncio
+		from hypercorn.asyncio import serve
+		from hypercorn.config import Config as ServerConfig
+		from app.asgi import create_asgi_app
+
+		server_config = ServerConfig()
+		server_config.bind = ["0.0.0.0:3334"]
+		asyncio.run(serve(create_asgi_app(), server_config))
+	else:
+		app = create_app()
+		app.run(host="0.0.0.0", port=3334)
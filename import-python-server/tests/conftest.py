@@ -0,0 +1,62 @@
+import os
+import psycopg
+import pytest
+
+from app.entities.product import PreciseNumber
+from app.services.exchange import ExchangeRate, StaticExchangeRateSource
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "application-server", "migrations")
+MIGRATIONS = ("init_database.sql", "init_product_batch_idempotency.sql", "init_products_batch_index.sql")
+
+# tests using these fixtures run against TEST_DATABASE_URL, and are skipped without it
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def make_exchange_rate() -> ExchangeRate:
+	return ExchangeRate(
+		usd=PreciseNumber(100, 2),
+		eur=PreciseNumber(92, 2),
+		jpy=PreciseNumber(15700, 2),
+		brl=PreciseNumber(540, 2),
+		btc=PreciseNumber(15, 7),
+	)
+
+
+@pytest.fixture(scope="session")
+def database_url():
+	if TEST_DATABASE_URL is None:
+		pytest.skip("TEST_DATABASE_URL is not set")
+
+	with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as db:
+		if db.execute("SELECT to_regclass('products')").fetchone()[0] is None:
+			for name in MIGRATIONS:
+				with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as file:
+					# one statement at a time, CREATE INDEX CONCURRENTLY cannot run in a query of several
+					for statement in file.read().split(";"):
+						if statement.strip():
+							db.execute(statement)
+	os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+	return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def app_config(tmp_path):
+	return {
+		"TESTING": True,
+		"EXCHANGE_RATE_SOURCE": StaticExchangeRateSource(make_exchange_rate()),
+		"EXCHANGE_RATE_SNAPSHOT_PATH": None,
+		"IMPORT_SPOOL_DIR": str(tmp_path / "spool"),
+		"IMPORT_PARALLEL_WORKERS": 1,
+		"DB_POOL_MIN_SIZE": 1,
+		"DB_POOL_MAX_SIZE": 4,
+	}
+
+
+@pytest.fixture
+def flask_app(database_url, app_config):
+	from app import create_app
+
+	app = create_app(app_config)
+	yield app
+	app.extensions["import_jobs"].shutdown()
+	app.extensions["db_pool"].close()
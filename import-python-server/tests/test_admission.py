@@ -0,0 +1,58 @@
+import threading
+import pytest
+
+from app.errors.service import ServiceError, ServiceErrorType
+from app.services.admission import AdmissionController
+
+def test_admission_queues_requests_until_an_import_finishes():
+	admission = AdmissionController(max_imports=1, max_bytes=100, max_queued=1, queue_timeout=5)
+	admission.acquire(10)
+	admitted = threading.Event()
+
+	def queued():
+		admission.acquire(10)
+		admitted.set()
+	thread = threading.Thread(target=queued)
+	thread.start()
+
+	assert not admitted.wait(0.05)
+	assert admission.queued == 1
+	admission.release(10)
+	assert admitted.wait(5)
+	thread.join()
+	assert (admission.active, admission.bytes, admission.queued) == (1, 10, 0)
+
+def test_admission_sheds_requests_when_the_queue_is_full_or_times_out():
+	admission = AdmissionController(max_imports=1, max_bytes=100, max_queued=1, queue_timeout=0.05)
+	admission.acquire(10)
+	errors = []
+
+	def queued():
+		with pytest.raises(ServiceError) as error:
+			admission.acquire(10)
+		errors.append(error.value)
+	thread = threading.Thread(target=queued)
+	thread.start()
+	while admission.queued == 0:
+		pass
+
+	with pytest.raises(ServiceError) as error:
+		admission.acquire(10)
+	assert error.value.error == ServiceErrorType.TOO_MANY_REQUESTS
+	assert error.value.to_flask_response()[1:] == (429, {"Retry-After": "1"})
+
+	thread.join()
+	assert errors[0].error == ServiceErrorType.UNAVAILABLE
+	assert (admission.active, admission.queued) == (1, 0)
+
+def test_admission_limits_upload_bytes_but_admits_a_large_upload_alone():
+	admission = AdmissionController(max_imports=4, max_bytes=100, max_queued=0, queue_timeout=0)
+	with admission.admit(500):
+		with pytest.raises(ServiceError):
+			admission.acquire(1)
+	with admission.admit(60):
+		with pytest.raises(ServiceError):
+			admission.acquire(50)
+		with admission.admit(40):
+			assert admission.bytes == 100
+	assert (admission.active, admission.bytes) == (0, 0)
@@ -0,0 +1,43 @@
+import asyncio
+import io
+from ulid import ULID
+from werkzeug.datastructures import FileStorage
+
+from app.asgi import create_import_app
+
+def post_import(flask_app, data: bytes, **form):
+	async def post():
+		import_app = create_import_app(flask_app)
+		async with import_app.test_app() as test_app:
+			response = await test_app.test_client().post(
+				"/api/import/product",
+				form=form,
+				files={"file": FileStorage(io.BytesIO(data), filename="products.csv")},
+			)
+			return response.status_code, await response.get_json()
+	return asyncio.run(post())
+
+def make_upload() -> bytes:
+	return f"Cheese {ULID()};$1.00;1/1/2030\nMilk;1.00;1/1/2030\nBread {ULID()};$2.50;1/1/2030\n".encode("utf-8")
+
+def test_async_dry_run_only_validates(flask_app):
+	status, body = post_import(flask_app, make_upload(), strategy="partial", dry_run="true")
+
+	assert status == 200
+	assert body["dry_run"] is True
+	assert (body["valid_rows"], body["issue_summary"]["total"]) == (2, 1)
+
+def test_async_atomic_import_is_rejected_with_its_issue_log(flask_app):
+	status, body = post_import(flask_app, make_upload(), strategy="atomic")
+
+	assert status == 400
+	assert body["issues_url"] == f"/api/import/batch/{body['batch_id']}/issues"
+	assert body["issue_summary"]["total"] == 1
+
+def test_async_partial_import_writes_the_valid_rows(flask_app):
+	status, body = post_import(flask_app, make_upload(), strategy="partial")
+
+	assert status == 201
+	assert body["imported"] == 2
+	stored = flask_app.test_client().get(f"/api/import/batch/{body['batch']['id']}")
+	assert (stored.get_json()["rows_imported"], stored.get_json()["issues"]) == (2, 1)
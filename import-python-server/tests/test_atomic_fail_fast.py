@@ -0,0 +1,83 @@
+import io
+import logging
+from contextlib import contextmanager
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.entities.product import ImportStrategy, PreciseNumber, ProductBatch
+from app.services.exchange import DeferredExchangeRate, ExchangeRate, ExchangeRateCache, StaticExchangeRateSource
+from app.services.import_products import (
+	ImportOptions,
+	chunk_product_records,
+	dry_run_products_csv_file,
+	open_csv_text_stream,
+	parse_products_csv,
+	write_product_chunks_atomic,
+)
+from app.services.issue_report import ImportRejectedError, IssueCollector
+
+VALID_ROW = "Cheese;$1.00;1/1/2030\n"
+INVALID_ROW = "Cheese;1.00;1/1/2030\n"
+
+class FakeConnection:
+	@contextmanager
+	def transaction(self):
+		yield
+
+def make_deferred_exchange_rate(source: StaticExchangeRateSource) -> DeferredExchangeRate:
+	cache = ExchangeRateCache(source, ttl=60, max_stale=3600, snapshot_path=None, logger=logging.getLogger("test"))
+	return DeferredExchangeRate(cache)
+
+def make_exchange_rate() -> ExchangeRate:
+	number = PreciseNumber(amount=100, unit=2)
+	return ExchangeRate(usd=number, eur=number, jpy=number, brl=number, btc=number)
+
+def make_options(**kwargs) -> ImportOptions:
+	return ImportOptions(chunk_size=10, queue_size=1, parallel_threshold=1 << 30, parallel_workers=1, spool_dir="", **kwargs)
+
+def iter_chunks(data: str, strategy: ImportStrategy, exchange):
+	batch = ProductBatch.new("products.csv", strategy)
+	stream = open_csv_text_stream(io.BytesIO(data.encode("utf-8")), strategy)
+	return chunk_product_records(parse_products_csv(stream), batch, exchange, 10)
+
+def test_rejected_atomic_import_never_fetches_the_exchange_rate():
+	source = StaticExchangeRateSource(make_exchange_rate())
+	chunks = list(iter_chunks(INVALID_ROW + VALID_ROW * 50, ImportStrategy.ATOMIC, make_deferred_exchange_rate(source)))
+
+	assert source.fetches == 0
+	assert sum(len(chunk.products) for chunk in chunks) == 0
+	assert sum(len(chunk.issues) for chunk in chunks) == 1
+
+def test_partial_import_fetches_the_exchange_rate_once():
+	source = StaticExchangeRateSource(make_exchange_rate())
+	chunks = list(iter_chunks(INVALID_ROW + VALID_ROW * 50, ImportStrategy.PARTIAL, make_deferred_exchange_rate(source)))
+
+	assert source.fetches == 1
+	assert sum(len(chunk.products) for chunk in chunks) == 50
+
+def test_atomic_writer_stops_reading_after_max_issues():
+	read = []
+	def chunks():
+		for chunk in iter_chunks(INVALID_ROW * 100, ImportStrategy.ATOMIC, make_exchange_rate()):
+			read.append(chunk)
+			yield chunk
+
+	issues = IssueCollector(max_samples=5)
+	batch = ProductBatch.new("products.csv", ImportStrategy.ATOMIC)
+	with pytest.raises(ImportRejectedError) as error:
+		write_product_chunks_atomic(FakeConnection(), batch, chunks(), issues, max_issues=25)
+
+	assert len(read) == 3
+	assert error.value.report.total == 30
+	assert error.value.report.aborted
+
+def test_dry_run_validates_every_row():
+	data = (VALID_ROW * 30 + INVALID_ROW) * 4
+	file = FileStorage(stream=io.BytesIO(data.encode("utf-8")), filename="products.csv")
+
+	result = dry_run_products_csv_file(file, ImportStrategy.ATOMIC, make_options(issue_samples=2))
+
+	assert result.valid_rows == 120
+	assert result.issues.total == 4
+	assert len(result.issues.samples) == 2
+	assert not result.issues.aborted
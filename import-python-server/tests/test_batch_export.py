@@ -0,0 +1,51 @@
+import json
+from contextlib import contextmanager
+
+from app.entities.product import ExportFormat
+from app.services import product_batches
+from app.services.product_batches import iter_batch_products
+from app.services.type_parser import parse_export_format
+
+class FakeCursor:
+	def __init__(self, rows):
+		self.rows = rows
+		self.statements = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		pass
+
+	@contextmanager
+	def copy(self, statement, params):
+		self.statements.append((statement, params))
+		yield iter(memoryview(row) for row in self.rows)
+
+class FakeConnection:
+	def __init__(self, rows):
+		self.cursor_ = FakeCursor(rows)
+
+	def cursor(self):
+		return self.cursor_
+
+def test_batch_products_are_streamed_in_blocks(monkeypatch):
+	monkeypatch.setattr(product_batches, "EXPORT_BLOCK_SIZE", 10)
+	rows = [b"id,name\n"] + [b"%d,Cheese\n" % i for i in range(5)]
+	db = FakeConnection(rows)
+
+	blocks = list(iter_batch_products(db, "batch", ExportFormat.CSV))
+
+	assert b"".join(blocks) == b"".join(rows)
+	assert len(blocks) == 3
+	assert db.cursor_.statements[0][1] == ["batch"]
+
+def test_ndjson_export_undoes_the_copy_text_escapes():
+	db = FakeConnection([b'{"name":"a\\\\\\\\b \\\\"c\\\\""}\n'])
+
+	data = b"".join(iter_batch_products(db, "batch", ExportFormat.NDJSON))
+
+	assert json.loads(data) == {"name": 'a\\b "c"'}
+	assert parse_export_format(None) == ExportFormat.CSV
+	assert parse_export_format("ndjson") == ExportFormat.NDJSON
+	assert parse_export_format("xml") is None
@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from datetime import datetime
+import pytest
+
+from app.entities.product import CurrencyCode
+from app.errors.resource import ResourceError
+from app.services.product_batches import (
+	DELETE_BATCH_PRODUCTS_CHUNK,
+	delete_product_batch_chunked,
+	summarize_product_batch,
+)
+
+BATCH_ID = "01M57E4S1Y68S0R4J0BA34JYX6"
+
+class FakeResult:
+	def __init__(self, row=None, rowcount=0):
+		self.row = row
+		self.rowcount = rowcount
+
+	def fetchone(self):
+		return self.row
+
+class FakeConnection:
+	def __init__(self, results):
+		self.results = results
+		self.transactions = 0
+		self.statements = []
+
+	@contextmanager
+	def transaction(self):
+		self.transactions += 1
+		yield
+
+	def execute(self, statement, params=None, prepare=False):
+		self.statements.append(statement)
+		return self.results.pop(0)
+
+def batch_row(imported: int | None, age: float) -> tuple:
+	return (BATCH_ID, datetime(2030, 1, 1), "partial", "products.csv", None, None, imported, None, age)
+
+def test_batch_is_deleted_one_chunk_per_transaction():
+	chunks = [FakeResult(rowcount=count) for count in (100, 100, 30)]
+	db = FakeConnection([FakeResult(batch_row(230, 10))] + chunks + [FakeResult()])
+
+	assert delete_product_batch_chunked(db, BATCH_ID, 100, 60) == 230
+	assert db.statements.count(DELETE_BATCH_PRODUCTS_CHUNK) == 3
+	assert db.transactions == 5
+
+def test_batch_still_importing_is_not_deleted():
+	db = FakeConnection([FakeResult(batch_row(None, 10))])
+
+	with pytest.raises(ResourceError):
+		delete_product_batch_chunked(db, BATCH_ID, 100, 60)
+	assert len(db.statements) == 1
+
+def test_empty_batch_summary_has_zero_totals():
+	db = FakeConnection([FakeResult((1,)), FakeResult((0, None, None, None, None, None, None, None))])
+
+	summary = summarize_product_batch(db, BATCH_ID).to_dict()
+
+	assert summary["products"] == 0
+	assert summary["price_totals"][CurrencyCode.BTC.value] == {"amount": "0", "unit": 8}
+	assert summary["expiration_min"] is None
@@ -0,0 +1,58 @@
+import io
+import psycopg
+import pytest
+from psycopg.pq import TransactionStatus
+from ulid import ULID
+from werkzeug.datastructures import FileStorage
+
+from app.entities.product import ImportStrategy, ProductBatch
+from app.errors.resource import ResourceError
+from app.extensions.database import get_db
+from app.services.import_products import LOCK_IMPORTING_BATCH, ImportOptions, import_products_csv_file
+from app.services.product_batches import find_imported_batch
+from conftest import make_exchange_rate
+
+STALE_AFTER = 60 * 60
+
+def insert_unfinished_batch(database_url: str, content_hash: str, age: float) -> str:
+	batch_id = str(ULID())
+	with psycopg.connect(database_url, autocommit=True) as db:
+		db.execute(
+			"INSERT INTO product_batchs (id, created, strategy, filename, content_hash) VALUES (%s, now() - make_interval(secs => %s), 'partial', 'products.csv', %s)",
+			[batch_id, age, content_hash],
+		)
+	return batch_id
+
+def test_partial_chunks_are_committed_after_a_replay_lookup(flask_app, database_url):
+	flask_app.config["IMPORT_CHUNK_SIZE"] = 2
+	content_hash = str(ULID())
+	data = "".join(f"Cheese {content_hash} {index};$1.00;1/1/2030\n" for index in range(6)).encode("utf-8")
+	batch = ProductBatch.new("products.csv", ImportStrategy.PARTIAL, content_hash)
+	visible = []
+
+	def count_committed(chunk, written):
+		with psycopg.connect(database_url) as other:
+			visible.append(other.execute("SELECT count(*) FROM products WHERE batch_id = %s", [str(batch.id)]).fetchone()[0])
+
+	with flask_app.app_context():
+		db = get_db()
+		assert find_imported_batch(db, content_hash, ImportStrategy.PARTIAL, None, STALE_AFTER) is None
+		assert db.info.transaction_status == TransactionStatus.IDLE
+		import_products_csv_file(batch, FileStorage(io.BytesIO(data)), make_exchange_rate(), ImportOptions.from_config(flask_app.config), on_chunk=count_committed)
+
+	assert visible == [2, 4, 6]
+
+def test_old_batch_is_not_discarded_while_its_import_holds_the_lock(flask_app, database_url):
+	content_hash = str(ULID())
+	batch_id = insert_unfinished_batch(database_url, content_hash, 2 * STALE_AFTER)
+
+	with flask_app.app_context():
+		db = get_db()
+		with psycopg.connect(database_url, autocommit=True) as importer:
+			importer.execute(LOCK_IMPORTING_BATCH, [batch_id])
+			with pytest.raises(ResourceError):
+				find_imported_batch(db, content_hash, ImportStrategy.PARTIAL, None, STALE_AFTER)
+
+		# the importing connection is gone, so the batch is abandoned
+		assert find_imported_batch(db, content_hash, ImportStrategy.PARTIAL, None, STALE_AFTER) is None
+		assert db.execute("SELECT 1 FROM product_batchs WHERE id = %s", [batch_id]).fetchone() is None
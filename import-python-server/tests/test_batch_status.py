@@ -0,0 +1,27 @@
+import io
+from ulid import ULID
+
+def test_sync_import_status_is_read_from_the_stored_batch(flask_app):
+	client = flask_app.test_client()
+	data = f"Cheese {ULID()};$1.00;1/1/2030\nMilk;1.00;1/1/2030\n".encode("utf-8")
+	created = client.post("/api/import/product", data={"strategy": "partial", "file": (io.BytesIO(data), "products.csv")})
+	batch_id = created.get_json()["batch"]["id"]
+
+	status = client.get(f"/api/import/batch/{batch_id}")
+
+	assert status.status_code == 200
+	assert status.get_json()["state"] == "completed"
+	assert (status.get_json()["rows_imported"], status.get_json()["issues"]) == (1, 1)
+	assert client.get(f"/api/import/batch/{ULID()}").status_code == 404
+	assert client.get("/api/import/batch/unknown").status_code == 404
+
+def test_rejected_atomic_import_links_its_issue_log(flask_app):
+	client = flask_app.test_client()
+	data = f"Cheese {ULID()};$1.00;1/1/2030\nMilk;1.00;1/1/2030\n".encode("utf-8")
+
+	rejected = client.post("/api/import/product", data={"strategy": "atomic", "file": (io.BytesIO(data), "products.csv")})
+
+	assert rejected.status_code == 400
+	issues_url = rejected.get_json()["issues_url"]
+	assert issues_url == f"/api/import/batch/{rejected.get_json()['batch_id']}/issues"
+	assert len(client.get(issues_url).data.splitlines()) == 1
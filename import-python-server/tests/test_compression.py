@@ -0,0 +1,64 @@
+import gzip
+import io
+import zipfile
+import pytest
+import zstandard
+from werkzeug.datastructures import FileStorage
+
+from app.entities.product import ImportStrategy
+from app.errors.validation import ValidationError
+from app.services.compression import Compression, decompressed_upload, upload_compression
+from app.services.import_products import open_csv_text_stream, parse_products_csv, upload_size
+
+CSV = b"name;price;expiration\n" + b"Cheese;$1.00;1/1/2030\n" * 1000
+
+def zip_bytes(*names: str) -> bytes:
+	buffer = io.BytesIO()
+	with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+		for name in names:
+			archive.writestr(name, CSV)
+	return buffer.getvalue()
+
+def read_upload(data: bytes, compression: Compression, max_size: int = 1 << 20) -> bytes:
+	file = decompressed_upload(FileStorage(stream=io.BytesIO(data), filename="products"), compression, max_size)
+	return file.stream.read()
+
+def test_upload_compression_from_name_and_encoding():
+	assert upload_compression("products.CSV") == Compression.NONE
+	assert upload_compression("products.csv.gz") == Compression.GZIP
+	assert upload_compression("products.csv.zst") == Compression.ZSTD
+	assert upload_compression("products.zip") == Compression.ZIP
+	assert upload_compression("products.csv", "gzip") == Compression.GZIP
+	assert upload_compression("products.csv.gz", "gzip") == Compression.GZIP
+	assert upload_compression("products.csv.gz", "zstd") is None
+	assert upload_compression("products.csv", "br") is None
+	assert upload_compression("products.txt") is None
+
+@pytest.mark.parametrize("data, compression", [
+	(gzip.compress(CSV) + gzip.compress(CSV), Compression.GZIP),
+	(zstandard.ZstdCompressor().compress(CSV), Compression.ZSTD),
+	(zip_bytes("products.csv"), Compression.ZIP),
+])
+def test_decompressed_upload_streams_csv(data, compression):
+	expected = CSV * 2 if compression == Compression.GZIP else CSV
+	assert read_upload(data, compression) == expected
+
+def test_decompressed_upload_is_parsed_without_seeking():
+	file = decompressed_upload(FileStorage(stream=io.BytesIO(gzip.compress(CSV))), Compression.GZIP, 1 << 20)
+	assert not file.stream.seekable()
+	assert upload_size(file.stream) is None
+
+	records = list(parse_products_csv(open_csv_text_stream(file.stream, ImportStrategy.PARTIAL)))
+	assert len(records) == CSV.count(b"\n") - 1
+
+def test_decompressed_upload_guards_against_bombs():
+	bomb = gzip.compress(b"\n" * (8 << 20))
+	with pytest.raises(ValidationError) as error:
+		read_upload(bomb, Compression.GZIP, max_size=1 << 20)
+	assert error.value.issues[0].type == "too_large"
+
+def test_decompressed_upload_rejects_invalid_data():
+	with pytest.raises(ValidationError):
+		read_upload(b"not gzip at all", Compression.GZIP)
+	with pytest.raises(ValidationError):
+		read_upload(zip_bytes("a.csv", "b.csv"), Compression.ZIP)
@@ -0,0 +1,22 @@
+import hashlib
+import io
+from werkzeug.datastructures import FileStorage
+
+from app.services.content_hash import HashingFile, get_content_hash
+
+
+def test_hashing_file_hashes_while_written():
+	file = HashingFile(io.BytesIO())
+	file.write(b"name;price;")
+	file.write(b"expiration\n")
+	file.seek(0)
+
+	assert file.read() == b"name;price;expiration\n"
+	assert get_content_hash(FileStorage(stream=file)) == hashlib.sha256(b"name;price;expiration\n").hexdigest()
+
+
+def test_content_hash_of_plain_stream_keeps_position():
+	stream = io.BytesIO(b"Cheese;$1.00;1/1/2030\n")
+
+	assert get_content_hash(FileStorage(stream=stream)) == hashlib.sha256(stream.getvalue()).hexdigest()
+	assert stream.tell() == 0
@@ -0,0 +1,72 @@
+import random
+import numpy as np
+
+from app.entities.product import PreciseNumber, RoundingMode
+from app.services.currency import ConversionScale, CurrencyConverter
+from app.services.exchange import ExchangeRate
+
+def make_exchange_rate() -> ExchangeRate:
+	return ExchangeRate(
+		usd=PreciseNumber(amount=100, unit=2),
+		eur=PreciseNumber(amount=860149999999999, unit=15),
+		jpy=PreciseNumber(amount=155437000000000003, unit=15),
+		brl=PreciseNumber(amount=5336500000000000, unit=15),
+		btc=PreciseNumber(amount=11379000000, unit=15),
+	)
+
+def expected_prices(usd: int, exchange: ExchangeRate, rounding: RoundingMode):
+	amount = PreciseNumber(amount=usd, unit=2)
+	return (
+		amount.multiply(exchange.eur).normalize(2, rounding=rounding).amount,
+		amount.multiply(exchange.jpy).normalize(0, rounding=rounding).amount,
+		amount.multiply(exchange.brl).normalize(2, rounding=rounding).amount,
+		amount.multiply(exchange.btc).normalize(8, rounding=rounding).amount,
+	)
+
+def test_convert_column_matches_precise_number():
+	exchange = make_exchange_rate()
+	rng = random.Random(5)
+	usd = [rng.randint(-10**9, 10**9) for _ in range(2000)] + [0, 1, 49, 50, 99]
+
+	for rounding in (RoundingMode.TRUNCATE, RoundingMode.HALF_UP):
+		converter = CurrencyConverter(exchange, rounding)
+		prices = converter.convert_column(usd)
+		for n, amount in enumerate(usd):
+			expected = expected_prices(amount, exchange, rounding)
+			assert (prices.eur[n], prices.jpy[n], prices.brl[n], prices.btc[n]) == expected
+			assert converter.convert(amount) == expected
+
+def test_convert_column_falls_back_to_exact_arithmetic_on_overflow():
+	exchange = make_exchange_rate()
+	usd = [10**17, 2**63 - 1, 3]
+
+	for rounding in (RoundingMode.TRUNCATE, RoundingMode.HALF_UP):
+		prices = CurrencyConverter(exchange, rounding).convert_column(usd)
+		for n, amount in enumerate(usd):
+			assert (prices.eur[n], prices.jpy[n], prices.brl[n], prices.btc[n]) == expected_prices(amount, exchange, rounding)
+
+def test_convert_column_accepts_amounts_past_int64():
+	exchange = make_exchange_rate()
+	usd = [2**70, 7]
+
+	prices = CurrencyConverter(exchange).convert_column(usd)
+	assert list(prices.usd) == usd
+	assert prices.jpy[0] == expected_prices(2**70, exchange, RoundingMode.TRUNCATE)[1]
+
+def test_convert_column_stays_in_int64_for_exchange_api_rates():
+	prices = CurrencyConverter(make_exchange_rate()).convert_column([16388, 10**9])
+	assert prices.eur.typecode == "q"
+	assert prices.jpy.typecode == "q"
+	assert prices.btc.typecode == "q"
+
+def test_conversion_scale_matches_precise_number_for_random_rates():
+	rng = random.Random(11)
+	for _ in range(500):
+		rate = PreciseNumber(amount=rng.randint(-10**12, 10**18), unit=rng.randint(0, 16))
+		target_unit = rng.randint(0, 9)
+		rounding = rng.choice([RoundingMode.TRUNCATE, RoundingMode.HALF_UP])
+		usd = [rng.randint(-10**9, 10**9) for _ in range(20)]
+
+		converted = ConversionScale.new(rate, 2, target_unit, rounding).convert_column(np.array(usd, dtype=np.int64), max(map(abs, usd)))
+		expected = [PreciseNumber(amount=amount, unit=2).multiply(rate).normalize(target_unit, rounding=rounding).amount for amount in usd]
+		assert list(converted) == expected
@@ -0,0 +1,69 @@
+import logging
+
+from app.entities.product import PreciseNumber
+from app.services.exchange import ExchangeRate, ExchangeRateCache, StaticExchangeRateSource
+
+def make_exchange_rate(eur: int = 92) -> ExchangeRate:
+	return ExchangeRate(
+		usd=PreciseNumber(amount=100, unit=2),
+		eur=PreciseNumber(amount=eur, unit=2),
+		jpy=PreciseNumber(amount=15700, unit=2),
+		brl=PreciseNumber(amount=540, unit=2),
+		btc=PreciseNumber(amount=15, unit=7),
+	)
+
+class FakeClock:
+	def __init__(self) -> None:
+		self.now = 1000.0
+
+	def __call__(self) -> float:
+		return self.now
+
+def make_cache(source, clock, snapshot_path=None) -> ExchangeRateCache:
+	return ExchangeRateCache(
+		source,
+		ttl=60,
+		max_stale=3600,
+		snapshot_path=snapshot_path,
+		logger=logging.getLogger("test"),
+		clock=clock,
+	)
+
+def test_exchange_rate_cache_serves_fresh_rate_without_fetching():
+	source = StaticExchangeRateSource(make_exchange_rate())
+	cache = make_cache(source, FakeClock())
+
+	assert cache.get() == make_exchange_rate()
+	assert cache.get() == make_exchange_rate()
+	assert source.fetches == 1
+
+def test_exchange_rate_cache_fetches_when_too_stale():
+	clock = FakeClock()
+	source = StaticExchangeRateSource(make_exchange_rate())
+	cache = make_cache(source, clock)
+	cache.get()
+
+	source.rate = make_exchange_rate(eur=95)
+	clock.now += 7200
+	assert cache.get() == make_exchange_rate(eur=95)
+	assert source.fetches == 2
+
+def test_exchange_rate_cache_serves_stale_rate_when_upstream_fails():
+	clock = FakeClock()
+	source = StaticExchangeRateSource(make_exchange_rate())
+	cache = make_cache(source, clock)
+	cache.get()
+
+	source.rate = None
+	clock.now += 120
+	assert cache.get() == make_exchange_rate()
+
+def test_exchange_rate_cache_starts_from_snapshot(tmp_path):
+	snapshot_path = str(tmp_path / "rate.json")
+	clock = FakeClock()
+	make_cache(StaticExchangeRateSource(make_exchange_rate()), clock, snapshot_path).get()
+
+	offline = StaticExchangeRateSource(None)
+	cache = make_cache(offline, clock, snapshot_path)
+	assert cache.get() == make_exchange_rate()
+	assert offline.fetches == 0
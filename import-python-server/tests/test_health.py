@@ -0,0 +1,20 @@
+from app.routes.health import pool_stats
+
+class FakePool:
+	def __init__(self, stats):
+		self.stats = stats
+
+	def get_stats(self):
+		return self.stats
+
+def test_pool_stats_reports_average_wait():
+	stats = pool_stats(FakePool({"pool_size": 4, "pool_max": 10, "requests_num": 8, "requests_wait_ms": 20, "requests_errors": 1}))
+
+	assert stats["size"] == 4
+	assert stats["checkouts"] == 8
+	assert stats["average_wait_ms"] == 2.5
+	assert stats["request_errors"] == 1
+	assert stats["connections_lost"] == 0
+
+def test_pool_stats_of_unused_pool():
+	assert pool_stats(FakePool({}))["average_wait_ms"] == 0
@@ -0,0 +1,39 @@
+from ulid import ULID
+
+from app.services.id_allocator import UlidAllocator, encode_ulid
+
+
+def test_allocate_consecutive_ids_within_millisecond():
+	allocator = UlidAllocator(clock=lambda: 1_700_000_000_000_000_000)
+
+	first = allocator.allocate(3)
+	second = allocator.allocate(2)
+
+	assert second == first + 3
+	assert first >> 80 == 1_700_000_000_000
+
+
+def test_allocate_never_goes_back_in_time():
+	times = iter([2_000_000_000, 1_000_000_000])
+	allocator = UlidAllocator(clock=lambda: next(times))
+
+	first = allocator.allocate(1)
+	second = allocator.allocate(1)
+
+	assert second > first
+	assert second >> 80 == 2_000
+
+
+def test_allocate_bytes_sorted_and_unique():
+	allocator = UlidAllocator()
+	ids = allocator.allocate_bytes(1000) + allocator.allocate_bytes(1000)
+	ulids = [ids[n:n + 16] for n in range(0, len(ids), 16)]
+
+	assert ulids == sorted(ulids)
+	assert len(set(ulids)) == 2000
+
+
+def test_encode_ulid_matches_ulid_text():
+	for _ in range(100):
+		ulid = ULID()
+		assert encode_ulid(int.from_bytes(ulid.bytes)) == str(ulid)
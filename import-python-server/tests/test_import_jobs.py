@@ -0,0 +1,59 @@
+from flask import Flask
+
+from app.entities.product import ImportStrategy, PreciseNumber, ProductBatch
+from app.errors.validation import ValidationIssue
+from app.services.exchange import ExchangeRate
+from app.services.import_jobs import ImportJob, ImportJobState, make_stream_import_job_runner
+from app.services.import_products import ProductChunk
+
+def make_exchange_rate() -> ExchangeRate:
+	return ExchangeRate(
+		usd=PreciseNumber(100, 2),
+		eur=PreciseNumber(92, 2),
+		jpy=PreciseNumber(15700, 2),
+		brl=PreciseNumber(540, 2),
+		btc=PreciseNumber(15, 7),
+	)
+
+def make_issue() -> ValidationIssue:
+	return ValidationIssue(message="invalid", path="$.row.1", type="invalid_format")
+
+def test_import_job_records_chunk_progress():
+	job = ImportJob(ProductBatch.new("products.csv", ImportStrategy.PARTIAL))
+	job.start()
+	job.record_chunk(ProductChunk(products=[], issues=[make_issue(), make_issue()]), 0)
+	job.complete(0, 2)
+
+	status = job.to_dict()
+	assert status["state"] == ImportJobState.COMPLETED.value
+	assert status["rows_processed"] == 2
+	assert status["issues"] == 2
+
+def test_failed_atomic_import_job_imports_nothing():
+	job = ImportJob(ProductBatch.new("products.csv", ImportStrategy.ATOMIC))
+	job.start()
+	job.rows_imported = 10
+	job.fail({"status": 400, "error": "VALIDATION"})
+
+	status = job.to_dict()
+	assert status["state"] == ImportJobState.FAILED.value
+	assert status["rows_imported"] == 0
+
+def test_stream_import_job_reports_its_outcome_when_its_hooks_fail():
+	def open_stream():
+		raise OSError("upload is gone")
+
+	def on_finished(error):
+		raise OSError("session is gone")
+
+	def cleanup():
+		raise OSError("spool is gone")
+
+	run = make_stream_import_job_runner(
+		Flask(__name__), open_stream, "products.csv", make_exchange_rate(),
+		cleanup=cleanup, on_finished=on_finished,
+	)
+	job = ImportJob(ProductBatch.new("products.csv", ImportStrategy.PARTIAL))
+	run(job)
+
+	assert job.to_dict()["state"] == ImportJobState.FAILED.value
@@ -0,0 +1,40 @@
+import json
+
+from app.services.issue_report import IssueCollector, IssueReport, ImportRejectedError
+from app.services.product_parser import RowIssue
+
+
+def test_issue_collector_keeps_bounded_samples_and_counts_all():
+	collector = IssueCollector(max_samples=2)
+	collector.add(RowIssue(index, "price", "x") for index in range(5))
+	collector.add([RowIssue(5, None, None)])
+
+	report = collector.report()
+	assert report.total == 6
+	assert report.by_column == {"price": 5, "row": 1}
+	assert report.by_type == {"invalid_format": 5, "invalid_data": 1}
+	assert report.samples == [RowIssue(0, "price", "x").to_validation_issue(), RowIssue(1, "price", "x").to_validation_issue()]
+	assert report.truncated
+	assert IssueReport.from_dict(json.loads(json.dumps(report.to_dict()))) == report
+
+
+def test_issue_collector_logs_every_issue(tmp_path):
+	path = tmp_path / "batch.ndjson"
+	collector = IssueCollector(max_samples=1, log_path=str(path))
+	collector.add(RowIssue(index, "name", "") for index in range(3))
+	collector.close()
+
+	lines = path.read_text().splitlines()
+	assert [json.loads(line)["path"] for line in lines] == ["$.row.0", "$.row.1", "$.row.2"]
+
+
+def test_rejection_error_reports_summary():
+	collector = IssueCollector(max_samples=1)
+	collector.add(RowIssue(index, "expiration", "soon") for index in range(3))
+
+	error = collector.rejection_error("01M57E4S1Y68S0R4J0BA34JYX6")
+	assert isinstance(error, ImportRejectedError)
+	body = error.http_error_object()
+	assert len(body["issues"]) == 1
+	assert body["issue_summary"]["total"] == 3
+	assert body["batch_id"] == "01M57E4S1Y68S0R4J0BA34JYX6"
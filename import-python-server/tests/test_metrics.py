@@ -0,0 +1,47 @@
+from app.services.metrics import Counter, GaugeFunction, Histogram, MetricsRegistry
+from app.extensions.metrics import register_pool_gauges
+
+
+def test_histogram_renders_cumulative_buckets():
+	registry = MetricsRegistry()
+	histogram = registry.register(Histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1.0)))
+
+	histogram.observe(0.05, "parse")
+	histogram.observe(0.5, "parse")
+	histogram.observe(5, "parse")
+
+	lines = registry.render().splitlines()
+	assert lines[:2] == ["# HELP stage_seconds Stage time.", "# TYPE stage_seconds histogram"]
+	assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+	assert 'stage_seconds_bucket{stage="parse",le="1"} 2' in lines
+	assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+	assert 'stage_seconds_sum{stage="parse"} 5.55' in lines
+	assert 'stage_seconds_count{stage="parse"} 3' in lines
+
+
+def test_counter_and_gauge_samples():
+	registry = MetricsRegistry()
+	counter = registry.register(Counter("rows_total", "Rows.", ("strategy",)))
+	registry.register(GaugeFunction("pool_size", "Pool size.", (), lambda: [((), 4)]))
+
+	counter.inc(10, "atomic")
+	counter.inc(5, "atomic")
+	counter.inc(1, 'par"tial')
+
+	lines = registry.render().splitlines()
+	assert 'rows_total{strategy="atomic"} 15' in lines
+	assert 'rows_total{strategy="par\\"tial"} 1' in lines
+	assert "pool_size 4" in lines
+
+def test_pool_statistics_are_typed_by_kind():
+	class FakePool:
+		def get_stats(self):
+			return {"pool_size": 4, "requests_num": 12}
+
+	registry = MetricsRegistry()
+	register_pool_gauges(registry, FakePool())
+
+	lines = registry.render().splitlines()
+	assert "# TYPE db_pool_size gauge" in lines
+	assert "# TYPE db_pool_requests_total counter" in lines
+	assert "db_pool_requests_total 12" in lines
@@ -0,0 +1,99 @@
+import io
+import mmap
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.entities.product import ImportStrategy, PreciseNumber, ProductBatch
+from app.services.exchange import ExchangeRate
+from app.services.import_products import ImportOptions, parse_product_chunks
+from app.services.parallel_parser import can_split_csv, iter_parsed_ranges, split_csv_ranges
+from werkzeug.datastructures import FileStorage
+
+def make_exchange_rate() -> ExchangeRate:
+	return ExchangeRate(
+		usd=PreciseNumber(amount=100, unit=2),
+		eur=PreciseNumber(amount=860149999999999, unit=15),
+		jpy=PreciseNumber(amount=155437000000000003, unit=15),
+		brl=PreciseNumber(amount=5336500000000000, unit=15),
+		btc=PreciseNumber(amount=11379000000, unit=15),
+	)
+
+def make_csv(rows: int) -> bytes:
+	lines = ["name;price;expiration"]
+	for n in range(rows):
+		if n % 97 == 0:
+			lines.append(f'"Multi\nline ""{n}"";x";$1.{n % 100:02d};1/1/2024')
+		elif n % 89 == 0:
+			lines.append(f"Bad {n};{n};1/1/2024")
+		elif n % 83 == 0:
+			lines.append("")
+		else:
+			lines.append(f"Product {n};${n}.99;{n % 12 + 1}/{n % 28 + 1}/2025")
+	return ("\n".join(lines) + "\n").encode("utf-8")
+
+def to_mmap(data: bytes, tmp_path) -> mmap.mmap:
+	path = tmp_path / "upload.csv"
+	path.write_bytes(data)
+	with open(path, "rb") as file:
+		return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def collect(chunks):
+	rows = []
+	issues = []
+	for chunk in chunks:
+		issues.extend(chunk.issues)
+		rows.extend((product.name, product.prices, product.expiration) for product in chunk.products)
+	return rows, issues
+
+def test_split_csv_ranges_keeps_quoted_newlines_in_one_range(tmp_path):
+	data = make_csv(1000)
+	ranges = split_csv_ranges(to_mmap(data, tmp_path), 0, 16)
+
+	assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+	for start, end in ranges:
+		assert data[start:end].count(b'"') % 2 == 0
+
+def test_can_split_csv_rejects_stray_quotes(tmp_path):
+	assert can_split_csv(to_mmap(b'name;price\n"quoted;""field""";1\n', tmp_path))
+	assert not can_split_csv(to_mmap(b'name;price\n5" screen;1\n', tmp_path))
+
+def test_parallel_parsing_matches_serial_parsing(tmp_path):
+	data = make_csv(5000)
+	path = tmp_path / "products.csv"
+	path.write_bytes(data)
+	batch = ProductBatch.new("products.csv", ImportStrategy.PARTIAL)
+	options = ImportOptions(chunk_size=700, queue_size=2, parallel_threshold=0, parallel_workers=3, spool_dir=str(tmp_path))
+
+	serial = collect(parse_product_chunks(batch, FileStorage(io.BytesIO(data)), make_exchange_rate(), options, None))
+	with ThreadPoolExecutor(max_workers=3) as pool, open(path, "rb") as stream:
+		parallel = collect(parse_product_chunks(batch, FileStorage(stream), make_exchange_rate(), options, pool))
+
+	assert parallel == serial
+	assert len(serial[1]) > 0
+
+def test_parsed_rows_in_flight_are_bounded(tmp_path):
+	data = make_csv(2000)
+	path = tmp_path / "products.csv"
+	path.write_bytes(data)
+	batch = ProductBatch.new("products.csv", ImportStrategy.PARTIAL)
+	ranges = split_csv_ranges(to_mmap(data, tmp_path), 0, 20)
+
+	class CountingExecutor:
+		def __init__(self):
+			self.submitted = 0
+			self.most_in_flight = 0
+
+		def submit(self, fn, *args):
+			self.submitted += 1
+			self.most_in_flight = max(self.most_in_flight, self.submitted - consumed)
+			future = Future()
+			future.set_result(fn(*args))
+			return future
+
+	executor = CountingExecutor()
+	consumed = 0
+	# each range holds about 100 rows, 250 rows leave room for two of them
+	for parsed in iter_parsed_ranges(executor, str(path), ranges, ("name", "price", "expiration"), batch, make_exchange_rate(), len(data) / 2000, 250, 16):
+		consumed += 1
+
+	assert consumed == len(ranges)
+	assert executor.most_in_flight == 2
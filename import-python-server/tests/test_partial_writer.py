@@ -0,0 +1,61 @@
+import gzip
+import io
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from psycopg import DataError
+from ulid import ULID
+
+from app.entities.product_columns import ProductColumns
+from app.services import import_products
+from app.services.import_products import ProductChunk, copy_products_isolating_rejects
+from app.services.issue_report import IssueCollector
+
+class FakeConnection:
+	@contextmanager
+	def transaction(self):
+		yield
+
+def make_chunk(names):
+	columns = ProductColumns(ULID(), datetime.now(timezone.utc))
+	columns.extend(
+		b"".join(ULID().bytes for _ in names),
+		names,
+		[date(2030, 1, 1)] * len(names),
+		*([[100] * len(names)] * 5),
+	)
+	return ProductChunk(products=columns, issues=[], row_indexes=[index + 10 for index in range(len(names))])
+
+def test_copy_isolates_rejected_rows(monkeypatch):
+	copied = []
+	def copy_products(db, products):
+		if any(name.startswith("bad") for name in products.names):
+			raise DataError("rejected")
+		copied.extend(products.names)
+	monkeypatch.setattr(import_products, "copy_products", copy_products)
+
+	names = [f"p{index}" for index in range(13)]
+	names[3] = "bad3"
+	names[11] = "bad11"
+	issues = IssueCollector(max_samples=10)
+
+	written = copy_products_isolating_rejects(FakeConnection(), make_chunk(names), issues)
+
+	assert written == 11
+	assert sorted(copied) == sorted(name for name in names if not name.startswith("bad"))
+	assert [issue.path for issue in issues.samples] == ["$.row.13", "$.row.21"]
+	assert issues.by_type == {"rejected": 2}
+
+def test_partial_import_keeps_the_rows_read_before_the_size_cap(flask_app):
+	flask_app.config.update(IMPORT_CHUNK_SIZE=1000, IMPORT_MAX_DECOMPRESSED_SIZE=400 * 1024)
+	prefix = ULID()
+	data = "".join(f"Cheese {prefix} {index};$1.00;1/1/2030\n" for index in range(20000)).encode("utf-8")
+	upload = (io.BytesIO(gzip.compress(data)), "products.csv.gz")
+
+	response = flask_app.test_client().post("/api/import/product", data={"strategy": "partial", "file": upload})
+
+	body = response.get_json()
+	assert response.status_code == 201
+	assert 0 < body["imported"] < 20000
+	assert body["issue_summary"]["aborted"] is True
+	stored = flask_app.test_client().get(f"/api/import/batch/{body['batch']['id']}").get_json()
+	assert (stored["state"], stored["rows_imported"]) == ("completed", body["imported"])
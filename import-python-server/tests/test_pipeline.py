@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+
+from app.services.pipeline import aiter_in_background, chunked, iter_in_background
+
+def test_chunked_keeps_remainder():
+	chunks = list(chunked(range(7), 3))
+	assert chunks == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_iter_in_background_preserves_order():
+	items = list(iter_in_background(range(1000), 2))
+	assert items == list(range(1000))
+
+def test_iter_in_background_reraises_producer_error():
+	def produce():
+		yield 1
+		raise RuntimeError("broken stage")
+
+	consumed = []
+	with pytest.raises(RuntimeError):
+		for item in iter_in_background(produce(), 1):
+			consumed.append(item)
+	assert consumed == [1]
+
+def test_iter_in_background_stops_producer_on_close():
+	produced = []
+	def produce():
+		for n in range(1000):
+			produced.append(n)
+			yield n
+
+	stream = iter_in_background(produce(), 1)
+	assert next(stream) == 0
+	stream.close()
+	assert len(produced) < 10
+
+def test_aiter_in_background_preserves_order_and_reraises():
+	def produce():
+		yield from range(100)
+		raise ValueError("broken row")
+
+	async def consume():
+		items = []
+		with pytest.raises(ValueError):
+			async for item in aiter_in_background(produce(), 2):
+				items.append(item)
+		return items
+
+	assert asyncio.run(consume()) == list(range(100))
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timezone
+from ulid import ULID
+
+from app.entities.product import Product
+from app.entities.product_columns import ProductColumns
+
+def make_columns(btc: int) -> ProductColumns:
+	columns = ProductColumns(ULID(), datetime.now(timezone.utc))
+	ids = [ULID(), ULID()]
+	columns.extend(
+		b"".join(id.bytes for id in ids),
+		["Cheese", "Bread"],
+		[date(2023, 1, 14), date(2024, 2, 29)],
+		[16388, 100],
+		[14096, 86],
+		[2547, 155],
+		[87452, 533],
+		[186, btc],
+	)
+	return columns
+
+def test_product_columns_lazy_view():
+	columns = make_columns(btc=1)
+	products = list(columns)
+
+	assert len(columns) == 2
+	assert all(isinstance(product, Product) for product in products)
+	assert products[1].name == "Bread"
+	assert products[1].expiration == date(2024, 2, 29)
+	assert products[0].prices.usd.amount == 16388
+	assert products[0].batch_id == columns.batch_id
+	assert columns[-1].id.bytes == columns.id_bytes(1)
+
+def test_product_columns_keeps_amounts_past_int64():
+	columns = make_columns(btc=2 ** 64)
+
+	assert columns.btc[0] == 186
+	assert columns[1].prices.btc.amount == 2 ** 64
+
+def test_product_columns_slice():
+	columns = make_columns(btc=2 ** 64)
+	tail = columns.slice(1, 2)
+
+	assert len(tail) == 1
+	assert tail[0] == columns[1]
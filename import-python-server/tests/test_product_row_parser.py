@@ -0,0 +1,91 @@
+import csv
+import io
+import random
+
+from app.entities.product import ImportStrategy
+from app.services.import_products import open_csv_text_stream, parse_products_csv
+from app.services.product_parser import FieldCaches, FieldCacheStats, ProductRowParser, RowIssue, parse_product_fields
+from app.services.type_parser import parse_csv_price, parse_csv_date, parse_price_cents, parse_date_text
+
+PRICE_CHARS = "$0123456789.٣²x -"
+DATE_CHARS = "0123456789/٣²x -"
+
+def random_text(rng: random.Random, alphabet: str, size: int) -> str:
+	return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, size)))
+
+def test_parse_price_cents_matches_price_pattern():
+	rng = random.Random(3)
+	samples = ["$0.00", "$00.10", "$1.5", "$12.345", "$٣.٣٣", "$1.²3", "$.99", "$0.0", "$-1.00"]
+	samples += [random_text(rng, PRICE_CHARS, 8) for _ in range(20000)]
+	samples += [f"${rng.randint(0, 10**6)}.{rng.randint(0, 99):02d}" for _ in range(1000)]
+
+	for text in samples:
+		expected = parse_csv_price(text)
+		assert parse_price_cents(text.strip()) == (None if expected is None else expected.amount), text
+
+def test_parse_date_text_matches_date_pattern():
+	rng = random.Random(4)
+	samples = ["1/14/2023", "02/29/2024", "2/29/2023", "13/1/2020", "1/1/99", "1/1/099", "٣/1/2020", "1//2020"]
+	samples += [random_text(rng, DATE_CHARS, 10) for _ in range(20000)]
+
+	for text in samples:
+		assert parse_date_text(text.strip()) == parse_csv_date(text), text
+
+def parse_with_dict_reader(data: str):
+	reader = csv.DictReader(io.StringIO(data), delimiter=";")
+	reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+	return [
+		parse_product_fields(row, row_index)
+		for row_index, row in enumerate(reader, start=1)
+		if any(row.values())
+	]
+
+def test_parse_products_csv_reports_same_records_as_dict_reader():
+	data = "\n".join([
+		" Expiration ;NAME;price;name",
+		"1/14/2023;ignored;$163.88;Cheese",
+		"",
+		";;;",
+		";;;;",
+		"2/30/2023;x;$1.00;Bread",
+		"1/1/2020;x;1.00;Milk",
+		"1/1/2020;x",
+		"1/1/2020;x;$1.00;   ",
+		"٣/1/2020;x;$1.00;Unicode",
+	]) + "\n"
+
+	stream = open_csv_text_stream(io.BytesIO(data.encode("utf-8")), ImportStrategy.PARTIAL)
+	records = [
+		record.to_validation_issue() if isinstance(record, RowIssue) else record
+		for record in parse_products_csv(stream)
+	]
+	assert records == parse_with_dict_reader(data)
+
+class PipeReader(io.RawIOBase):
+	def __init__(self, data: bytes) -> None:
+		self.data = io.BytesIO(data)
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		return self.data.readinto(buffer)
+
+def test_parse_products_csv_reads_non_seekable_streams_once():
+	data = "Cheese;$1.00;1/1/2030\nMilk;x;1/1/2030\nBread;$2.00;2/1/2030\n"
+
+	stream = open_csv_text_stream(PipeReader(data.encode("utf-8")), ImportStrategy.PARTIAL)
+	records = list(parse_products_csv(stream))
+	assert [record.row_index for record in records] == [1, 2, 3]
+	assert [record.name for record in records if not isinstance(record, RowIssue)] == ["Cheese", "Bread"]
+
+def test_field_caches_memoize_repeated_cells_within_their_size():
+	caches = FieldCaches(2)
+	parser = ProductRowParser(["name", "price", "expiration"], caches)
+	rows = [["A", "$1.00", "1/1/2030"], ["B", "$1.00", "1/1/2030"], ["C", "$2.00", " 2/1/2030"], ["D", "$3.00", "1/1/2030"]]
+	records = [parser.parse_next(row) for row in rows]
+
+	assert [record.usd for record in records] == [100, 100, 200, 300]
+	assert records[0].expiration is records[1].expiration
+	assert caches.stats() == {"price": FieldCacheStats(1, 3), "expiration": FieldCacheStats(2, 2)}
+	assert caches.price.cache_info().currsize == 2
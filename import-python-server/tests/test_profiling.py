@@ -0,0 +1,60 @@
+import io
+import os
+import pstats
+import threading
+import time
+import pytest
+from ulid import ULID
+
+from app.services.profiling import ProfileMode, RequestProfiler
+
+def busy(seconds: float):
+	deadline = time.monotonic() + seconds
+	while time.monotonic() < deadline:
+		sum(range(1000))
+
+def test_profiles_one_request_at_a_time_with_peak_memory(tmp_path):
+	profiler = RequestProfiler(str(tmp_path), interval=0.001)
+
+	with profiler.profile(ProfileMode.CPROFILE) as profile:
+		with profiler.profile(ProfileMode.CPROFILE) as concurrent:
+			assert concurrent is None
+		data = bytearray(1 << 20)
+		busy(0.01)
+	del data
+
+	assert profile.process_peak_memory >= 1 << 20
+	assert profile.path == os.path.join(str(tmp_path), f"{profile.id}.pstats")
+	assert any(function[2] == "busy" for function in pstats.Stats(profile.path).stats)
+	assert profile.http_headers()["X-Import-Profile-Id"] == profile.id
+
+def test_sampled_profile_covers_threads_started_by_the_request(tmp_path):
+	profiler = RequestProfiler(str(tmp_path), interval=0.001)
+
+	with profiler.profile(ProfileMode.SAMPLE) as profile:
+		thread = threading.Thread(target=busy, args=(0.05,), name="worker")
+		thread.start()
+		thread.join()
+
+	with open(profile.path) as file:
+		stacks = [line.rsplit(" ", 1)[0].split(";") for line in file]
+	assert any(stack[0] == "worker" and any(frame.startswith("busy (test_profiling.py:") for frame in stack) for stack in stacks)
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+	return {**app_config, "IMPORT_PROFILE_DIR": str(tmp_path / "profiles")}
+
+def test_call_profile_of_an_import_covers_its_parsing(flask_app):
+	data = "".join(f"Cheese {ULID()};$1.00;1/1/2030\n" for _ in range(100)).encode("utf-8")
+
+	response = flask_app.test_client().post(
+		"/api/import/product",
+		data={"strategy": "partial", "file": (io.BytesIO(data), "products.csv")},
+		headers={"X-Import-Profile": "cprofile"},
+	)
+
+	assert response.status_code == 201
+	path = os.path.join(flask_app.config["IMPORT_PROFILE_DIR"], f"{response.headers['X-Import-Profile-Id']}.pstats")
+	functions = {function[2] for function in pstats.Stats(path).stats}
+	assert {"parse_products_csv", "chunk_product_records", "write_product_chunks_partial"} <= functions
+	assert int(response.headers["X-Import-Profile-Process-Peak-Memory"]) > 0
@@ -0,0 +1,77 @@
+import hashlib
+import time
+import psycopg
+from ulid import ULID
+
+def upload(client, strategy: str, data: bytes) -> str:
+	created = client.post("/api/import/upload", json={"strategy": strategy, "filename": "products.csv"})
+	upload_id = created.get_json()["upload"]["id"]
+	put_chunk(client, upload_id, 0, data)
+	return upload_id
+
+def put_chunk(client, upload_id: str, index: int, data: bytes):
+	client.put(f"/api/import/upload/{upload_id}/chunk/{index}", data=data, headers={"X-Chunk-SHA256": hashlib.sha256(data).hexdigest()})
+
+def wait_for_import(client, upload_id: str) -> dict:
+	deadline = time.monotonic() + 10
+	while time.monotonic() < deadline:
+		status = client.get(f"/api/import/batch/{upload_id}").get_json()
+		if status["state"] in ("completed", "failed"):
+			return status
+		time.sleep(0.05)
+	raise AssertionError("import did not finish")
+
+def test_upload_is_parsed_as_chunks_arrive_and_written_once_finalized(flask_app, database_url):
+	client = flask_app.test_client()
+	name = str(ULID())
+	prefix_start, prefix_end = name[:13], name[13:]
+	upload_id = upload(client, "partial", f"Cheese {name};$1.00;1/1/2030\nMilk {prefix_start}".encode("utf-8"))
+
+	# started by the first chunk, waiting for the next one
+	assert client.get(f"/api/import/upload/{upload_id}").get_json()["state"] in ("queued", "running")
+	put_chunk(client, upload_id, 1, f"{prefix_end};$2.00;1/1/2030\n".encode("utf-8"))
+	with psycopg.connect(database_url) as db:
+		assert db.execute("SELECT 1 FROM product_batchs WHERE id = %s", [upload_id]).fetchone() is None
+
+	assert client.post(f"/api/import/upload/{upload_id}/finalize", json={"chunks": 2}).status_code == 202
+	assert wait_for_import(client, upload_id)["rows_imported"] == 2
+	assert client.get(f"/api/import/upload/{upload_id}").status_code == 404
+
+def test_upload_waiting_too_long_for_a_chunk_is_retried_once_finalized(flask_app):
+	flask_app.config["IMPORT_UPLOAD_IDLE_TIMEOUT"] = 0.1
+	client = flask_app.test_client()
+	upload_id = upload(client, "partial", f"Cheese {ULID()};$1.00;1/1/2030\n".encode("utf-8"))
+	assert wait_for_import(client, upload_id)["state"] == "failed"
+
+	put_chunk(client, upload_id, 1, f"Milk {ULID()};$2.00;1/1/2030\n".encode("utf-8"))
+	client.post(f"/api/import/upload/{upload_id}/finalize", json={"chunks": 2})
+
+	assert wait_for_import(client, upload_id)["rows_imported"] == 2
+
+def test_failed_upload_import_keeps_its_session_until_retried(flask_app):
+	client = flask_app.test_client()
+	upload_id = upload(client, "atomic", f"Cheese {ULID()};$1.00;1/1/2030\nMilk;1.00;1/1/2030\n".encode("utf-8"))
+
+	client.post(f"/api/import/upload/{upload_id}/finalize", json={"chunks": 1})
+	assert wait_for_import(client, upload_id)["state"] == "failed"
+	assert wait_for_import(client, upload_id)["error"]["error"] == "VALIDATION"
+
+	session = client.get(f"/api/import/upload/{upload_id}").get_json()
+	assert session["state"] == "failed"
+	assert session["upload"]["import_error"]["error"] == "VALIDATION"
+
+	retried = client.post(f"/api/import/upload/{upload_id}/finalize", json={"chunks": 1})
+	assert retried.status_code == 202
+	assert wait_for_import(client, upload_id)["state"] == "failed"
+
+def test_partial_upload_keeps_the_rows_before_a_malformed_chunk(flask_app):
+	flask_app.config["IMPORT_CHUNK_SIZE"] = 1
+	client = flask_app.test_client()
+	upload_id = upload(client, "partial", f"Cheese {ULID()};$1.00;1/1/2030\n".encode("utf-8"))
+	put_chunk(client, upload_id, 1, b'"unterminated;$2.00;1/1/2030\n' + b"x" * 200000)
+	client.post(f"/api/import/upload/{upload_id}/finalize", json={"chunks": 2})
+
+	status = wait_for_import(client, upload_id)
+
+	assert (status["state"], status["rows_imported"]) == ("completed", 1)
+	assert client.get(f"/api/import/upload/{upload_id}").status_code == 404
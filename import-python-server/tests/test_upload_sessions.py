@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+import threading
+import pytest
+
+from app.entities.product import ImportStrategy
+from app.errors.validation import ValidationError
+from app.errors.resource import ResourceError
+from app.services.upload_sessions import UploadSessionStore
+
+
+def sha256(data: bytes) -> str:
+	return hashlib.sha256(data).hexdigest()
+
+
+def test_reader_waits_for_chunks_in_order(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	session_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+	chunks = [b"name;price;", b"expiration\nCheese;$1.00;", b"1/1/2030\n"]
+
+	def upload():
+		for index in (1, 0, 2):
+			store.put_chunk(session_id, index, chunks[index], sha256(chunks[index]))
+		store.finalize(session_id, 3)
+
+	uploader = threading.Thread(target=upload)
+	with store.open_stream(session_id, idle_timeout=5) as stream:
+		uploader.start()
+		assert stream.read() == b"".join(chunks)
+		stream.seek(0)
+		assert stream.read(4) == b"name"
+	uploader.join()
+
+
+def test_chunks_are_verified(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	session_id = str(store.create("products.csv", ImportStrategy.ATOMIC).id)
+
+	with pytest.raises(ValidationError):
+		store.put_chunk(session_id, 0, b"name", sha256(b"other"))
+
+	assert store.put_chunk(session_id, 0, b"name", sha256(b"name")) is True
+	assert store.put_chunk(session_id, 0, b"name", sha256(b"name")) is False
+	with pytest.raises(ResourceError):
+		store.put_chunk(session_id, 0, b"other", sha256(b"other"))
+
+	with pytest.raises(ValidationError):
+		store.finalize(session_id, 2)
+
+
+def test_session_is_resumed_from_disk(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	session_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+	store.put_chunk(session_id, 0, b"name;price;expiration\n", sha256(b"name;price;expiration\n"))
+
+	restarted = UploadSessionStore(str(tmp_path), max_size=1024)
+	session = restarted.get(session_id)
+
+	assert session is not None
+	assert session.filename == "products.csv"
+	assert sorted(session.chunks) == [0]
+	assert restarted.finalize(session_id, 1).chunk_count == 1
+	with restarted.open_stream(session_id, idle_timeout=1) as stream:
+		assert stream.read() == b"name;price;expiration\n"
+
+
+def test_reader_times_out_waiting_for_a_chunk(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	session_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+
+	with store.open_stream(session_id, idle_timeout=0.05) as stream:
+		with pytest.raises(ValidationError):
+			stream.read()
+
+
+def test_sessions_are_shared_by_stores_of_the_same_directory(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	other = UploadSessionStore(str(tmp_path), max_size=1024)
+	session_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+	assert other.get(session_id).chunks == {}
+
+	store.put_chunk(session_id, 0, b"name", sha256(b"name"))
+
+	assert sorted(other.get(session_id).chunks) == [0]
+	assert other.put_chunk(session_id, 0, b"name", sha256(b"name")) is False
+
+
+def test_import_is_claimed_by_one_store_at_a_time(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	other = UploadSessionStore(str(tmp_path), max_size=1024)
+	session_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+
+	claim = store.claim_import(session_id)
+	assert claim is not None
+	assert other.claim_import(session_id) is None
+
+	claim.release()
+	assert other.claim_import(session_id) is not None
+
+
+def test_prune_keeps_recent_and_claimed_sessions(tmp_path):
+	store = UploadSessionStore(str(tmp_path), max_size=1024)
+	old_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+	claimed_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+	recent_id = str(store.create("products.csv", ImportStrategy.PARTIAL).id)
+	for session_id in (old_id, claimed_id):
+		os.utime(os.path.join(store.session_dir(session_id), "session.json"), (0, 0))
+	claim = store.claim_import(claimed_id)
+
+	store.prune(60)
+
+	assert store.get(old_id) is None
+	assert store.get(claimed_id) is not None
+	assert store.get(recent_id) is not None
+	claim.release()